@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
@@ -7,9 +8,13 @@ from app.core.deps import current_user
 from app.core.response import error, ok, trace_id_from_request
 from app.models.user import User
 from app.schemas.agent import AgentQaRequest
-from app.services.agent_service import run_agent_qa, stream_agent_qa
-from app.services.role_service import get_role_prompt, list_roles
-from app.services.chat_service import ChatError
+from app.services.agent_service import (
+    resume_agent_stream,
+    run_agent_qa,
+    stream_agent_qa,
+)
+from app.services.role_service import get_role, list_roles
+from app.services.chat_service import ChatError, get_message
 
 router = APIRouter()
 
@@ -31,10 +36,13 @@ def get_agent_role_api(
 ):
     trace_id = trace_id_from_request(request)
     try:
-        prompt = get_role_prompt(role_id)
+        role = get_role(role_id)
     except FileNotFoundError:
         return error(7101, "Role not found", trace_id, status_code=404)
-    return ok({"id": role_id, "prompt": prompt}, trace_id)
+    return ok(
+        {"id": role_id, "prompt": role.prompt, "prompt_hash": role.prompt_hash},
+        trace_id,
+    )
 
 
 @router.post("/agent/qa")
@@ -63,7 +71,7 @@ def agent_qa_api(
 
 
 @router.post("/agent/qa/stream")
-def agent_qa_stream_api(
+async def agent_qa_stream_api(
     payload: AgentQaRequest,
     user: User = Depends(current_user),
     db: Session = Depends(get_db),
@@ -80,3 +88,27 @@ def agent_qa_stream_api(
         runtime_profile_id=payload.runtime_profile_id,
     )
     return StreamingResponse(generator, media_type="text/event-stream")
+
+
+@router.get("/agent/qa/stream/resume")
+async def agent_qa_stream_resume_api(
+    session_id: str,
+    message_id: str,
+    request: Request,
+    offset: int = 0,
+    user: User = Depends(current_user),
+    db: Session = Depends(get_db),
+):
+    trace_id = trace_id_from_request(request)
+    try:
+        await run_in_threadpool(get_message, db, session_id, user.id, message_id)
+    except ChatError as exc:
+        return error(exc.code, exc.message, trace_id, status_code=404)
+    generator = resume_agent_stream(
+        db,
+        user_id=user.id,
+        session_id=session_id,
+        message_id=message_id,
+        offset=offset,
+    )
+    return StreamingResponse(generator, media_type="text/event-stream")
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, File, Form, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
@@ -29,14 +30,17 @@ from app.services.chat_service import (
     delete_session,
     export_session_markdown,
     export_session_payload,
+    get_message_sources,
     list_messages,
     list_sessions,
+    message_to_dict,
     session_to_dict,
     ensure_session_chat_kb,
     update_session,
 )
 from app.services.desensitization_service import DesensitizationError, create_rule
-from app.services.file_text_extract import extract_text_from_file
+from app.services.extraction_cache import extract_text_cached
+from app.services.extraction_worker import ExtractionError
 from app.services.knowledge_base_service import KbError, ingest_text_to_kb
 
 router = APIRouter()
@@ -62,6 +66,7 @@ def create_session_api(
         show_reasoning=payload.show_reasoning,
         context_message_limit=payload.context_message_limit,
         default_enabled_mcp_ids=payload.default_enabled_mcp_ids,
+        stream_flush_ms=payload.stream_flush_ms,
     )
     return ok(session_to_dict(row), trace_id)
 
@@ -121,6 +126,7 @@ def update_session_api(
             context_message_limit=payload.context_message_limit,
             archived=payload.archived,
             default_enabled_mcp_ids=payload.default_enabled_mcp_ids,
+            stream_flush_ms=payload.stream_flush_ms,
         )
     except ChatError as exc:
         return error(exc.code, exc.message, trace_id, status_code=404)
@@ -280,21 +286,25 @@ def list_message_api(
         rows = list_messages(db, session_id=session_id, user_id=user.id)
     except ChatError as exc:
         return error(exc.code, exc.message, trace_id, status_code=404)
-    return ok(
-        {
-            "items": [
-                {
-                    "id": row.id,
-                    "role": row.role,
-                    "content": row.content,
-                    "reasoning_content": row.reasoning_content,
-                    "created_at": row.created_at.isoformat(),
-                }
-                for row in rows
-            ]
-        },
-        trace_id,
-    )
+    return ok({"items": [message_to_dict(row) for row in rows]}, trace_id)
+
+
+@router.get("/chat/sessions/{session_id}/messages/{message_id}/sources")
+def get_message_sources_api(
+    session_id: str,
+    message_id: str,
+    request: Request,
+    user: User = Depends(current_user),
+    db: Session = Depends(get_db),
+):
+    trace_id = trace_id_from_request(request)
+    try:
+        data = get_message_sources(
+            db, session_id=session_id, user_id=user.id, message_id=message_id
+        )
+    except ChatError as exc:
+        return error(exc.code, exc.message, trace_id, status_code=404)
+    return ok(data, trace_id)
 
 
 @router.delete("/chat/sessions/{session_id}/messages/{message_id}")
@@ -336,6 +346,50 @@ def bulk_delete_message_api(
     return ok({"deleted": deleted}, trace_id)
 
 
+def _store_attachment(
+    db: Session,
+    user: User,
+    session_id: str,
+    file_name: str,
+    content_type: str | None,
+    file_bytes: bytes,
+    kb_mode: str,
+    kb_id: str | None,
+):
+    """Sanitize, store and optionally ingest an attachment (blocking)."""
+    row = add_attachment(
+        db,
+        session_id=session_id,
+        user_id=user.id,
+        file_name=file_name,
+        content_type=content_type,
+        file_bytes=file_bytes,
+    )
+    if kb_mode not in {"chat_default", "kb"}:
+        return row, None
+    target_kb_id = kb_id
+    if kb_mode == "chat_default":
+        target_kb_id = ensure_session_chat_kb(
+            db, user_id=user.id, session_id=session_id
+        )
+    if not target_kb_id:
+        raise ChatError(4002, "Knowledge base target missing")
+    try:
+        content, _ = extract_text_cached(file_name, file_bytes)
+    except ExtractionError as exc:
+        raise ChatError(4002, f"Attachment parse failed: {exc.message}") from exc
+    ingest_text_to_kb(
+        db,
+        kb_id=target_kb_id,
+        user_id=user.id,
+        title=file_name,
+        content=content,
+        source_type="chat_attachment",
+        source_path=row.raw_path,
+    )
+    return row, target_kb_id
+
+
 @router.post("/chat/sessions/{session_id}/attachments")
 async def create_attachment_api(
     session_id: str,
@@ -348,36 +402,19 @@ async def create_attachment_api(
 ):
     trace_id = trace_id_from_request(request)
     file_bytes = await file.read()
-    stored_kb_id: str | None = None
     try:
-        row = add_attachment(
+        # Extraction waits on the sandbox worker; keep it off the event loop.
+        row, stored_kb_id = await run_in_threadpool(
+            _store_attachment,
             db,
-            session_id=session_id,
-            user_id=user.id,
-            file_name=file.filename or "attachment.txt",
-            content_type=file.content_type,
-            file_bytes=file_bytes,
+            user,
+            session_id,
+            file.filename or "attachment.txt",
+            file.content_type,
+            file_bytes,
+            kb_mode,
+            kb_id,
         )
-        if kb_mode in {"chat_default", "kb"}:
-            target_kb_id = kb_id
-            if kb_mode == "chat_default":
-                target_kb_id = ensure_session_chat_kb(
-                    db, user_id=user.id, session_id=session_id
-                )
-            if not target_kb_id:
-                raise ChatError(4002, "Knowledge base target missing")
-            ingest_text_to_kb(
-                db,
-                kb_id=target_kb_id,
-                user_id=user.id,
-                title=file.filename or "attachment.txt",
-                content=extract_text_from_file(
-                    file.filename or "attachment.txt", file_bytes
-                ),
-                source_type="chat_attachment",
-                source_path=row.raw_path,
-            )
-            stored_kb_id = target_kb_id
     except ChatError as exc:
         status_code = 422 if exc.code == 5002 else 400
         return error(exc.code, exc.message, trace_id, status_code=status_code)
@@ -1,6 +1,7 @@
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, File, Request, UploadFile
+from fastapi import APIRouter, Depends, File, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
@@ -11,14 +12,22 @@ from app.models.chat_session import ChatSession
 from app.models.kb_document import KbDocument
 from app.models.knowledge_base import KnowledgeBase
 from app.models.user import User
-from app.services.file_text_extract import extract_text_from_file
+from app.services.extraction_cache import extract_text_cached
+from app.services.extraction_worker import ExtractionError
 
 router = APIRouter()
 
+EXTRACT_CACHE_HEADER = "X-Extract-Cache"
+
+
+def _mark_cache(response: Response, hit: bool) -> None:
+    response.headers[EXTRACT_CACHE_HEADER] = "hit" if hit else "miss"
+
 
 @router.post("/file-preview/extract")
 async def extract_preview_api(
     request: Request,
+    response: Response,
     file: UploadFile = File(...),
     user: User = Depends(current_user),
     db: Session = Depends(get_db),
@@ -27,7 +36,11 @@ async def extract_preview_api(
     trace_id = trace_id_from_request(request)
     file_bytes = await file.read()
     file_name = file.filename or "file"
-    text = extract_text_from_file(file_name, file_bytes)
+    try:
+        text, hit = await run_in_threadpool(extract_text_cached, file_name, file_bytes)
+    except ExtractionError as exc:
+        return error(exc.code, exc.message, trace_id, status_code=422)
+    _mark_cache(response, hit)
     return ok({"file_name": file_name, "text": text}, trace_id)
 
 
@@ -35,6 +48,7 @@ async def extract_preview_api(
 def preview_kb_document_api(
     doc_id: str,
     request: Request,
+    response: Response,
     source: str | None = None,
     user: User = Depends(current_user),
     db: Session = Depends(get_db),
@@ -57,7 +71,11 @@ def preview_kb_document_api(
     file_path = Path(path)
     if not file_path.exists():
         return error(7006, "Document preview not available", trace_id, status_code=404)
-    text = extract_text_from_file(file_path.name, file_path.read_bytes())
+    try:
+        text, hit = extract_text_cached(file_path.name, file_path.read_bytes())
+    except ExtractionError as exc:
+        return error(exc.code, exc.message, trace_id, status_code=422)
+    _mark_cache(response, hit)
     return ok({"file_name": file_path.name, "text": text}, trace_id)
 
 
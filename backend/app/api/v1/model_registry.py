@@ -3,6 +3,7 @@ import json
 from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.deps import current_user
 from app.core.response import error, ok, trace_id_from_request
@@ -17,6 +18,7 @@ from app.schemas.model_registry import (
     RuntimeProfileCreateRequest,
     RuntimeProfileUpdateRequest,
 )
+from app.services import llm_metrics
 from app.services.model_registry_service import (
     ModelRegistryError,
     create_provider,
@@ -48,13 +50,14 @@ def _provider_to_dict(row: ModelProvider) -> dict:
     }
 
 
-def _catalog_to_dict(row: ModelCatalog) -> dict:
+def _catalog_to_dict(row: ModelCatalog, metrics: dict | None = None) -> dict:
     return {
         "id": row.id,
         "provider_id": row.provider_id,
         "model_name": row.model_name,
         "model_type": row.model_type,
         "capabilities": json.loads(row.capabilities_json),
+        "metrics": llm_metrics.summary(metrics) if metrics else None,
         "updated_at": row.updated_at.isoformat(),
     }
 
@@ -67,6 +70,7 @@ def _runtime_profile_to_dict(row: LlmRuntimeProfile) -> dict:
         "embedding_model_id": row.embedding_model_id,
         "reranker_model_id": row.reranker_model_id,
         "params": json.loads(row.params_json),
+        "fallback_profile_ids": json.loads(row.fallback_profile_ids_json or "[]"),
         "is_default": row.is_default,
         "updated_at": row.updated_at.isoformat(),
     }
@@ -192,7 +196,35 @@ def list_catalog_api(
     rows = list_catalog(
         db, user_id=user.id, provider_id=provider_id, model_type=model_type
     )
-    return ok({"items": [_catalog_to_dict(row) for row in rows]}, trace_id)
+    metrics = {
+        item["model_id"]: item
+        for item in llm_metrics.snapshot({row.id for row in rows})
+    }
+    return ok(
+        {"items": [_catalog_to_dict(row, metrics.get(row.id)) for row in rows]},
+        trace_id,
+    )
+
+
+@router.get("/model-catalog/metrics")
+def list_catalog_metrics_api(
+    request: Request,
+    provider_id: str | None = None,
+    db: Session = Depends(get_db),
+    user: User = Depends(current_user),
+):
+    trace_id = trace_id_from_request(request)
+    rows = list_catalog(db, user_id=user.id, provider_id=provider_id, model_type="llm")
+    items = llm_metrics.snapshot({row.id for row in rows})
+    items.sort(key=lambda item: (item["provider_name"], item["model_name"]))
+    return ok(
+        {
+            "window_seconds": settings.llm_metrics_window_seconds,
+            "latency_buckets_ms": list(llm_metrics.LATENCY_BUCKETS_MS),
+            "items": items,
+        },
+        trace_id,
+    )
 
 
 @router.post("/runtime-profiles")
@@ -212,6 +244,7 @@ def create_runtime_profile_api(
             embedding_model_id=payload.embedding_model_id,
             reranker_model_id=payload.reranker_model_id,
             params=payload.params,
+            fallback_profile_ids=payload.fallback_profile_ids,
             is_default=payload.is_default,
         )
     except ModelRegistryError as exc:
@@ -238,6 +271,7 @@ def update_runtime_profile_api(
             embedding_model_id=payload.embedding_model_id,
             reranker_model_id=payload.reranker_model_id,
             params=payload.params,
+            fallback_profile_ids=payload.fallback_profile_ids,
             is_default=payload.is_default,
         )
     except ModelRegistryError as exc:
@@ -19,11 +19,59 @@ class Settings(BaseSettings):
     data_root: str = "./data"
     raw_vault_dir: str = "raw_vault"
     sanitized_workspace_dir: str = "sanitized_workspace"
+    extract_cache_dir: str = "extract_cache"
+    extract_cache_max_bytes: int = 256 * 1024 * 1024
+    extract_sandbox_enabled: bool = True
+    extract_workers: int = 2
+    extract_worker_max_jobs: int = 50
+    extract_timeout_seconds: float = 60.0
+    extract_max_rss_mb: int = 1024
     chat_context_message_limit: int = 12
     mcp_max_parallel_tools: int = 3
+    agent_context_budget_ms: int = 8000
+    agent_context_workers: int = 8
+    agent_context_token_budget: int = 12000
+    agent_kb_mmr_lambda: float = 0.7
+    agent_kb_duplicate_similarity: float = 0.9
+    attachment_passage_chars: int = 800
+    attachment_index_max_sessions: int = 256
+    agent_hedge_delay_ms: int = 0
+    agent_provider_workers: int = 32
+    agent_coalesce_enabled: bool = True
+    runtime_cache_ttl_seconds: float = 300.0
+    response_cache_enabled: bool = False
+    response_cache_ttl_seconds: float = 3600.0
+    response_cache_max_entries: int = 512
+    response_cache_similarity_threshold: float = 0.0
+    stream_checkpoint_interval_ms: int = 1000
+    stream_checkpoint_chars: int = 400
+    stream_resume_poll_ms: int = 500
+    stream_flush_ms: int = 30
+    stream_flush_chars: int = 256
+    stream_heartbeat_seconds: float = 3.0
+    chat_summary_enabled: bool = True
+    chat_summary_trigger_messages: int = 60
+    chat_summary_max_chars: int = 4000
     mcp_tool_timeout_ms: int = 8000
     mcp_total_budget_ms: int = 15000
+    llm_connect_timeout_seconds: float = 10.0
+    llm_read_timeout_seconds: float = 60.0
+    llm_stream_read_timeout_seconds: float = 120.0
+    llm_provider_timeouts: dict[str, float] = {}
+    llm_http_max_connections: int = 50
+    llm_http_max_keepalive_connections: int = 20
+    llm_http_keepalive_expiry_seconds: float = 60.0
+    llm_http2_enabled: bool = True
+    llm_provider_max_concurrency: int = 8
+    llm_provider_concurrency: dict[str, int] = {}
+    llm_provider_default_tpm: int = 0
+    llm_provider_tpm: dict[str, int] = {}
+    llm_scheduler_queue_timeout_seconds: float = 30.0
+    llm_metrics_enabled: bool = True
+    llm_metrics_window_seconds: float = 3600.0
+    llm_metrics_max_samples: int = 500
     role_library_dir: str = "./app/roles"
+    role_library_refresh_seconds: float = 2.0
     default_chat_role_id: str | None = "私人医疗架构师"
 
     model_config = SettingsConfigDict(
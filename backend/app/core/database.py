@@ -1,9 +1,8 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from app.core.config import settings
 
-
 connect_args = (
     {"check_same_thread": False} if settings.db_url.startswith("sqlite") else {}
 )
@@ -18,3 +17,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def fork_session(db: Session) -> Session:
+    """Open an independent session on the same bind, for use from another thread."""
+    return Session(bind=db.get_bind(), autoflush=False)
@@ -22,5 +22,9 @@ def sanitized_workspace_root() -> Path:
     return _ensure(data_root() / settings.sanitized_workspace_dir)
 
 
+def extract_cache_root() -> Path:
+    return _ensure(raw_vault_root() / settings.extract_cache_dir)
+
+
 def role_library_root() -> Path:
     return _ensure(Path(settings.role_library_dir).resolve())
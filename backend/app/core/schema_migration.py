@@ -4,10 +4,12 @@ from collections.abc import Iterable
 
 from sqlalchemy.engine import Engine
 
-
 _SQLITE_COMPAT_COLUMNS: dict[str, dict[str, str]] = {
     "model_providers": {"user_id": "VARCHAR(36)"},
-    "llm_runtime_profiles": {"user_id": "VARCHAR(36)"},
+    "llm_runtime_profiles": {
+        "user_id": "VARCHAR(36)",
+        "fallback_profile_ids_json": "TEXT",
+    },
     "mcp_servers": {"user_id": "VARCHAR(36)"},
     "agent_mcp_bindings": {"user_id": "VARCHAR(36)"},
     "desensitization_rules": {"user_id": "VARCHAR(36)", "tag": "VARCHAR(40)"},
@@ -33,8 +35,10 @@ _SQLITE_COMPAT_COLUMNS: dict[str, dict[str, str]] = {
         "reasoning_enabled": "BOOLEAN",
         "reasoning_budget": "INTEGER",
         "show_reasoning": "BOOLEAN",
+        "stream_flush_ms": "INTEGER",
         "context_message_limit": "INTEGER",
         "chat_kb_id": "VARCHAR(36)",
+        "summary_until_at": "DATETIME",
     },
     "chat_attachments": {
         "content_type": "VARCHAR(120)",
@@ -42,9 +46,14 @@ _SQLITE_COMPAT_COLUMNS: dict[str, dict[str, str]] = {
     },
     "chat_messages": {
         "reasoning_content": "TEXT",
+        "status": "VARCHAR(20)",
     },
 }
 
+_SQLITE_COMPAT_INDEXES: dict[str, dict[str, str]] = {
+    "chat_messages": {"ix_chat_messages_session_created": "session_id, created_at"},
+}
+
 
 def _existing_columns(conn, table_name: str) -> set[str]:
     rows = conn.exec_driver_sql(f"PRAGMA table_info({table_name})").all()
@@ -70,6 +79,10 @@ def _add_missing_columns(
             conn.exec_driver_sql(
                 "UPDATE chat_sessions SET context_message_limit = 20 WHERE context_message_limit IS NULL"
             )
+        if table_name == "chat_messages" and column_name == "status":
+            conn.exec_driver_sql(
+                "UPDATE chat_messages SET status = 'done' WHERE status IS NULL"
+            )
         if table_name == "chat_attachments" and column_name == "is_image":
             conn.exec_driver_sql(
                 "UPDATE chat_attachments SET is_image = 0 WHERE is_image IS NULL"
@@ -112,3 +125,10 @@ def run_startup_migrations(engine: Engine, db_url: str) -> None:
             missing = [column for column in column_types if column not in existing]
             if missing:
                 _add_missing_columns(conn, table_name, missing, column_types)
+        for table_name, indexes in _SQLITE_COMPAT_INDEXES.items():
+            if not _existing_columns(conn, table_name):
+                continue
+            for index_name, columns in indexes.items():
+                conn.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})"
+                )
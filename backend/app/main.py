@@ -4,9 +4,13 @@ from fastapi import FastAPI, Request
 
 from app.api.v1.router import api_router
 from app.core.config import settings
-from app.core.database import Base, engine
+from app.core.database import Base, SessionLocal, engine
 from app.core.paths import raw_vault_root, sanitized_workspace_root
 from app.core.schema_migration import run_startup_migrations
+from app.services.chat_service import mark_interrupted_streams
+from app.services.extraction_worker import shutdown_extraction_pool
+from app.services.llm_client import close_llm_clients
+from app.services.role_service import reload_roles
 import app.models  # noqa: F401
 
 app = FastAPI(title="Family Health Backend")
@@ -24,8 +28,17 @@ async def add_trace_id(request: Request, call_next):
 def on_startup():
     Base.metadata.create_all(bind=engine)
     run_startup_migrations(engine, settings.db_url)
+    with SessionLocal() as db:
+        mark_interrupted_streams(db)
     raw_vault_root()
     sanitized_workspace_root()
+    reload_roles()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_extraction_pool()
+    await close_llm_clients()
 
 
 @app.get("/health")
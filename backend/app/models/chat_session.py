@@ -19,6 +19,7 @@ class ChatSession(Base):
     reasoning_enabled: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     reasoning_budget: Mapped[int | None] = mapped_column(Integer, nullable=True)
     show_reasoning: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+    stream_flush_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
     context_message_limit: Mapped[int] = mapped_column(
         Integer, nullable=False, default=20
     )
@@ -32,6 +33,9 @@ class ChatSession(Base):
         DateTime(timezone=True), nullable=True
     )
     summary: Mapped[str | None] = mapped_column(Text, nullable=True)
+    summary_until_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
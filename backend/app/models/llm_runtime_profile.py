@@ -18,6 +18,9 @@ class LlmRuntimeProfile(Base):
     embedding_model_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
     reranker_model_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
     params_json: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    fallback_profile_ids_json: Mapped[str] = mapped_column(
+        Text, nullable=False, default="[]"
+    )
     is_default: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -24,6 +24,7 @@ class RuntimeProfileCreateRequest(BaseModel):
     embedding_model_id: str | None = None
     reranker_model_id: str | None = None
     params: dict = Field(default_factory=dict)
+    fallback_profile_ids: list[str] = Field(default_factory=list)
     is_default: bool = False
 
 
@@ -33,4 +34,5 @@ class RuntimeProfileUpdateRequest(BaseModel):
     embedding_model_id: str | None = None
     reranker_model_id: str | None = None
     params: dict | None = None
+    fallback_profile_ids: list[str] | None = None
     is_default: bool | None = None
@@ -1,32 +1,78 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from collections.abc import Generator
+import time
+from collections.abc import AsyncGenerator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import aclosing
+from functools import partial
 
 import httpx
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_
 
 from app.core.config import settings
 from app.core.crypto import decrypt_text
+from app.core.database import fork_session
 from app.models.chat_message import ChatMessage
 from app.models.llm_runtime_profile import LlmRuntimeProfile
 from app.models.model_catalog import ModelCatalog
 from app.models.model_provider import ModelProvider
+from app.services import (
+    llm_metrics,
+    provider_scheduler,
+    response_cache,
+    runtime_cache,
+    single_flight,
+    sse_writer,
+)
 from app.services.chat_service import (
     ChatError,
     add_message,
+    checkpoint_message,
+    delete_message,
     get_attachment_meta,
-    get_attachment_texts,
+    get_attachment_passages,
+    get_message,
     get_session_default_mcp_ids,
     get_session_for_user,
 )
+from app.services.context_packer import (
+    estimate_tokens,
+    pack_context,
+    select_diverse_hits,
+)
+from app.services.conversation_summary_service import (
+    history_limit,
+    schedule_summary_refresh,
+)
 from app.services.knowledge_base_service import KbError, retrieve_from_kb
+from app.services.llm_client import (
+    get_async_client,
+    get_sync_client,
+    provider_timeout,
+)
 from app.services.mcp_service import get_effective_server_ids, route_tools
+from app.services.response_cache import CachedAnswer
 from app.services.role_service import get_role_prompt
+from app.services.runtime_cache import RuntimeDescriptor
 
+_REPLAY_CHUNK_CHARS = 48
+_TOOL_OUTPUT_MAX_CHARS = 2000
 
-def _trim_history(messages: list[dict], limit: int | None) -> list[dict]:
-    safe_limit = limit or settings.chat_context_message_limit
-    return messages[-safe_limit:]
+
+def _context_token_budget(
+    db, user_id: str, runtime_profile_id: str | None, session
+) -> int:
+    try:
+        runtime = _resolve_runtime(db, user_id, runtime_profile_id, session)
+    except ChatError:
+        return settings.agent_context_token_budget
+    value = runtime.params.get("context_token_budget")
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+        return value
+    return settings.agent_context_token_budget
 
 
 def _load_params(profile: LlmRuntimeProfile) -> dict:
@@ -37,6 +83,16 @@ def _load_params(profile: LlmRuntimeProfile) -> dict:
     return data if isinstance(data, dict) else {}
 
 
+def _load_fallback_ids(profile: LlmRuntimeProfile) -> tuple[str, ...]:
+    try:
+        data = json.loads(profile.fallback_profile_ids_json or "[]")
+    except json.JSONDecodeError:
+        return ()
+    if not isinstance(data, list):
+        return ()
+    return tuple(str(item) for item in data if item)
+
+
 def _resolve_runtime_profile(
     db, user_id: str, runtime_profile_id: str | None, session
 ) -> LlmRuntimeProfile:
@@ -80,6 +136,32 @@ def _resolve_model_provider(
     return model, provider
 
 
+def _resolve_runtime(
+    db, user_id: str, runtime_profile_id: str | None, session
+) -> RuntimeDescriptor:
+    chosen_id = runtime_profile_id or session.runtime_profile_id
+    cached = runtime_cache.get(user_id, chosen_id)
+    if cached is not None:
+        return cached
+    snapshot = runtime_cache.generation(user_id)
+    profile = _resolve_runtime_profile(db, user_id, runtime_profile_id, session)
+    model, provider = _resolve_model_provider(db, user_id, profile)
+    descriptor = RuntimeDescriptor(
+        profile_id=profile.id,
+        model_id=model.id,
+        model_name=model.model_name,
+        supports_vision=_model_supports_vision(model),
+        provider_id=provider.id,
+        provider_name=provider.provider_name,
+        base_url=provider.base_url,
+        api_key=decrypt_text(provider.api_key_encrypted),
+        params=_load_params(profile),
+        fallback_profile_ids=_load_fallback_ids(profile),
+    )
+    runtime_cache.put(user_id, chosen_id, descriptor, snapshot)
+    return descriptor
+
+
 def _build_context_suffix(
     attachment_texts: list[str],
     mcp_results: list[dict],
@@ -89,10 +171,7 @@ def _build_context_suffix(
     if attachment_texts:
         clipped: list[str] = []
         for idx, text in enumerate(attachment_texts, start=1):
-            normalized = text.strip()
-            if len(normalized) > 1600:
-                normalized = normalized[:1600] + "\n...[truncated]"
-            clipped.append(f"[Attachment {idx}]\n{normalized}")
+            clipped.append(f"[Attachment {idx}]\n{text.strip()}")
         blocks.append("Sanitized attachment context:\n" + "\n\n".join(clipped))
     if mcp_results:
         blocks.append(
@@ -103,8 +182,6 @@ def _build_context_suffix(
         kb_lines: list[str] = []
         for idx, hit in enumerate(kb_hits, start=1):
             text = str(hit.get("text") or hit.get("chunk_text") or "").strip()
-            if len(text) > 800:
-                text = text[:800] + "\n...[truncated]"
             kb_label = ""
             if hit.get("kb_id"):
                 kb_label = f" kb={hit.get('kb_id')}"
@@ -138,6 +215,13 @@ def _effective_system_prompt(session, request_background_prompt: str | None) ->
     return ""
 
 
+def _with_summary(system_prompt: str, summary: str | None) -> str:
+    if not summary or not summary.strip():
+        return system_prompt
+    block = "Summary of earlier conversation:\n" + summary.strip()
+    return f"{system_prompt}\n\n{block}" if system_prompt else block
+
+
 def _reasoning_settings(session) -> tuple[bool | None, int | None, bool]:
     return (
         session.reasoning_enabled,
@@ -206,13 +290,16 @@ def _openai_nonstream(
     api_key: str,
     payload: dict,
     include_reasoning: bool,
+    timeout: httpx.Timeout,
+    extensions: dict | None = None,
 ) -> tuple[str, str]:
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    with httpx.Client(timeout=60) as client:
-        resp = client.post(url, json=payload, headers=headers)
+    resp = get_sync_client(url).post(
+        url, json=payload, headers=headers, timeout=timeout, extensions=extensions
+    )
     if resp.status_code >= 400:
         raise ChatError(
             7006, f"LLM request failed: HTTP {resp.status_code} {resp.text[:200]}"
@@ -277,11 +364,14 @@ def _gemini_nonstream(
     model_name: str,
     payload: dict,
     include_reasoning: bool,
+    timeout: httpx.Timeout,
+    extensions: dict | None = None,
 ) -> tuple[str, str]:
     root = base_url.rstrip("/")
     url = f"{root}/{model_name}:generateContent?key={api_key}"
-    with httpx.Client(timeout=60) as client:
-        resp = client.post(url, json=payload)
+    resp = get_sync_client(url).post(
+        url, json=payload, timeout=timeout, extensions=extensions
+    )
     if resp.status_code >= 400:
         raise ChatError(
             7006, f"Gemini request failed: HTTP {resp.status_code} {resp.text[:200]}"
@@ -311,6 +401,567 @@ def _gemini_nonstream(
     return answer, reasoning
 
 
+def _flight_key(
+    runtime: RuntimeDescriptor, payload: dict, include_reasoning: bool, stream: bool
+) -> str:
+    # Endpoint + credential + exact payload: requests with the same key are
+    # indistinguishable to the provider, whichever user or session sent them.
+    return single_flight.key_for(
+        runtime.base_url,
+        runtime.model_name,
+        runtime.api_key,
+        payload,
+        include_reasoning,
+        stream,
+    )
+
+
+def _metrics_probe(runtime: RuntimeDescriptor, stream: bool) -> llm_metrics.Probe:
+    return llm_metrics.Probe(
+        runtime.model_id,
+        runtime.provider_id,
+        runtime.provider_name,
+        runtime.model_name,
+        stream=stream,
+    )
+
+
+def _prompt_tokens(system_prompt: str, messages: list[dict]) -> int:
+    return estimate_tokens(system_prompt) + sum(
+        estimate_tokens(str(item.get("content") or "")) for item in messages
+    )
+
+
+def _call_provider(
+    runtime: RuntimeDescriptor,
+    system_prompt: str,
+    messages: list[dict],
+    reasoning_enabled: bool | None,
+    reasoning_budget: int | None,
+    include_reasoning: bool,
+    priority: int = provider_scheduler.PRIORITY_INTERACTIVE,
+    stats: dict | None = None,
+) -> tuple[str, str]:
+    params = dict(runtime.params)
+    timeout = provider_timeout(runtime.provider_name)
+    if "gemini" in runtime.provider_name.lower():
+        payload = _gemini_payload(
+            system_prompt=system_prompt,
+            messages=messages,
+            params=params,
+            reasoning_enabled=reasoning_enabled,
+            reasoning_budget=reasoning_budget,
+            include_reasoning=include_reasoning,
+        )
+        call = partial(
+            _gemini_nonstream,
+            base_url=runtime.base_url,
+            api_key=runtime.api_key,
+            model_name=runtime.model_name,
+            payload=payload,
+            include_reasoning=include_reasoning,
+            timeout=timeout,
+        )
+    else:
+        payload = _openai_payload(
+            model_name=runtime.model_name,
+            system_prompt=system_prompt,
+            messages=messages,
+            params=params,
+            reasoning_enabled=reasoning_enabled,
+            reasoning_budget=reasoning_budget,
+            provider_name=runtime.provider_name,
+        )
+        call = partial(
+            _openai_nonstream,
+            url=runtime.base_url,
+            api_key=runtime.api_key,
+            payload=payload,
+            include_reasoning=include_reasoning,
+            timeout=timeout,
+        )
+    prompt_tokens = _prompt_tokens(system_prompt, messages)
+
+    def _scheduled() -> tuple[str, str, int]:
+        with provider_scheduler.slot(
+            runtime.provider_id, runtime.provider_name, prompt_tokens, priority
+        ) as ticket:
+            probe = _metrics_probe(runtime, stream=False)
+            try:
+                answer, reasoning = call(extensions=probe.extensions())
+            except BaseException as exc:
+                probe.finish(exc)
+                raise
+            ticket.output_tokens = estimate_tokens(answer) + estimate_tokens(reasoning)
+            probe.token(ticket.output_tokens)
+            probe.finish()
+        return answer, reasoning, ticket.wait_ms
+
+    # Coalesce before queueing so duplicates do not hold provider slots.
+    if settings.agent_coalesce_enabled:
+        key = _flight_key(runtime, payload, include_reasoning, stream=False)
+        answer, reasoning, wait_ms = single_flight.run(key, _scheduled)
+    else:
+        answer, reasoning, wait_ms = _scheduled()
+    if stats is not None:
+        stats["queue_wait_ms"] = wait_ms
+    return answer, reasoning
+
+
+def _parse_gemini_sse(obj: dict, include_reasoning: bool) -> list[tuple[str, str]]:
+    candidates = obj.get("candidates") or []
+    if not candidates:
+        return []
+    events: list[tuple[str, str]] = []
+    for part in candidates[0].get("content", {}).get("parts") or []:
+        text = str(part.get("text") or "")
+        if not text:
+            continue
+        if part.get("thought") and include_reasoning:
+            events.append(("reasoning", text))
+        elif not part.get("thought"):
+            events.append(("message", text))
+    return events
+
+
+def _parse_openai_sse(obj: dict, include_reasoning: bool) -> list[tuple[str, str]]:
+    choices = obj.get("choices") or []
+    if not choices:
+        return []
+    delta = choices[0].get("delta") or {}
+    events: list[tuple[str, str]] = []
+    if delta.get("content"):
+        events.append(("message", delta["content"]))
+    if delta.get("reasoning_content") and include_reasoning:
+        events.append(("reasoning", delta["reasoning_content"]))
+    return events
+
+
+async def _aiter_provider_stream(
+    runtime: RuntimeDescriptor,
+    system_prompt: str,
+    messages: list[dict],
+    reasoning_enabled: bool | None,
+    reasoning_budget: int | None,
+    include_reasoning: bool,
+    priority: int = provider_scheduler.PRIORITY_INTERACTIVE,
+    stats: dict | None = None,
+) -> AsyncGenerator[tuple[str, str], None]:
+    """Yield ``("message" | "reasoning", delta)`` pairs from the provider stream.
+
+    ``stats["queue_wait_ms"]`` is set once a provider slot is granted; a
+    request coalesced onto another one's stream does not queue itself.
+    """
+    params = dict(runtime.params)
+    headers: dict[str, str] = {}
+    if "gemini" in runtime.provider_name.lower():
+        payload = _gemini_payload(
+            system_prompt=system_prompt,
+            messages=messages,
+            params=params,
+            reasoning_enabled=reasoning_enabled,
+            reasoning_budget=reasoning_budget,
+            include_reasoning=include_reasoning,
+        )
+        root = runtime.base_url.rstrip("/")
+        url = f"{root}/{runtime.model_name}:streamGenerateContent?alt=sse&key={runtime.api_key}"
+        label, parse = "Gemini stream failed", _parse_gemini_sse
+    else:
+        payload = _openai_payload(
+            model_name=runtime.model_name,
+            system_prompt=system_prompt,
+            messages=messages,
+            params=params,
+            reasoning_enabled=reasoning_enabled,
+            reasoning_budget=reasoning_budget,
+            provider_name=runtime.provider_name,
+        )
+        payload["stream"] = True
+        url = runtime.base_url
+        headers = {
+            "Authorization": f"Bearer {runtime.api_key}",
+            "Content-Type": "application/json",
+        }
+        label, parse = "LLM stream failed", _parse_openai_sse
+
+    timeout = provider_timeout(runtime.provider_name, stream=True)
+    prompt_tokens = _prompt_tokens(system_prompt, messages)
+
+    async def _open() -> AsyncGenerator[tuple[str, str], None]:
+        async with provider_scheduler.slot_async(
+            runtime.provider_id, runtime.provider_name, prompt_tokens, priority
+        ) as ticket:
+            if stats is not None:
+                stats["queue_wait_ms"] = ticket.wait_ms
+            probe = _metrics_probe(runtime, stream=True)
+            failure: BaseException | None = None
+            try:
+                async with aclosing(
+                    _aiter_sse(
+                        url,
+                        payload,
+                        headers,
+                        timeout,
+                        label,
+                        parse,
+                        include_reasoning,
+                        probe.extensions(is_async=True),
+                    )
+                ) as upstream:
+                    async for event in upstream:
+                        tokens = estimate_tokens(event[1])
+                        ticket.output_tokens += tokens
+                        probe.token(tokens)
+                        yield event
+            except BaseException as exc:
+                failure = exc
+                raise
+            finally:
+                probe.finish(failure)
+
+    if settings.agent_coalesce_enabled:
+        # Identical concurrent requests fan out from one upstream stream.
+        key = _flight_key(runtime, payload, include_reasoning, stream=True)
+        events = single_flight.subscribe(key, _open)
+    else:
+        events = _open()
+    async with aclosing(events) as stream:
+        async for event in stream:
+            yield event
+
+
+async def _aiter_sse(
+    url: str,
+    payload: dict,
+    headers: dict[str, str],
+    timeout: httpx.Timeout,
+    label: str,
+    parse,
+    include_reasoning: bool,
+    extensions: dict | None = None,
+) -> AsyncGenerator[tuple[str, str], None]:
+    # Cancelling the consumer (client disconnect) exits this block and closes
+    # the upstream response, so the provider stops generating.
+    async with get_async_client(url).stream(
+        "POST",
+        url,
+        json=payload,
+        headers=headers,
+        timeout=timeout,
+        extensions=extensions,
+    ) as resp:
+        if resp.status_code >= 400:
+            raise ChatError(7006, f"{label}: HTTP {resp.status_code}")
+        async for line in resp.aiter_lines():
+            if not line or not line.startswith("data:"):
+                continue
+            raw = line[5:].strip()
+            if not raw or raw == "[DONE]":
+                continue
+            for event in parse(json.loads(raw), include_reasoning):
+                yield event
+
+
+async def _replay_cached(
+    cached: CachedAnswer, include_reasoning: bool
+) -> AsyncGenerator[tuple[str, str], None]:
+    if include_reasoning and cached.reasoning:
+        yield "reasoning", cached.reasoning
+    answer = cached.answer
+    for start in range(0, len(answer), _REPLAY_CHUNK_CHARS):
+        yield "message", answer[start : start + _REPLAY_CHUNK_CHARS]
+
+
+# Errors that make a candidate lose the race; anything else is a bug and propagates.
+_FAILOVER_ERRORS = (ChatError, httpx.HTTPError, httpx.StreamError, ValueError)
+
+# Separate from the context pool: a hedge loser on the sync client cannot be
+# aborted and keeps its thread until the provider answers or times out.
+_provider_pool = ThreadPoolExecutor(
+    max_workers=max(settings.agent_provider_workers, 1),
+    thread_name_prefix="agent-provider",
+)
+
+
+def _runtime_candidates(
+    db, user_id: str, runtime: RuntimeDescriptor, session, attachment_meta: list[dict]
+) -> list[RuntimeDescriptor]:
+    """The primary runtime followed by its usable fallbacks, in declared order."""
+    candidates = [runtime]
+    for profile_id in runtime.fallback_profile_ids:
+        try:
+            fallback = _resolve_runtime(db, user_id, profile_id, session)
+            _ensure_vision_support(fallback, attachment_meta)
+        except ChatError:
+            continue
+        if all(item.profile_id != fallback.profile_id for item in candidates):
+            candidates.append(fallback)
+    return candidates
+
+
+def _hedge_delay(runtime: RuntimeDescriptor) -> float | None:
+    """Seconds to wait for the first token before racing the next candidate."""
+    value = runtime.params.get("hedge_delay_ms")
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        value = settings.agent_hedge_delay_ms
+    return value / 1000 if value > 0 else None
+
+
+def _provider_route(
+    runtime: RuntimeDescriptor, attempts: int, hedged: bool, queue_wait_ms: int = 0
+) -> dict[str, object]:
+    return {
+        "profile_id": runtime.profile_id,
+        "provider_name": runtime.provider_name,
+        "model_name": runtime.model_name,
+        "attempts": attempts,
+        "hedged": hedged,
+        "queue_wait_ms": queue_wait_ms,
+    }
+
+
+def _call_with_failover(
+    candidates: list[RuntimeDescriptor],
+    system_prompt: str,
+    messages: list[dict],
+    reasoning_enabled: bool | None,
+    reasoning_budget: int | None,
+    include_reasoning: bool,
+    priority: int = provider_scheduler.PRIORITY_INTERACTIVE,
+) -> tuple[str, str, dict[str, object]]:
+    """Call candidates in order, hedging after a delay; the first success wins.
+
+    Losing requests that are already in flight cannot be aborted on the sync
+    client; they finish on the worker thread and their result is discarded.
+    """
+    args = (
+        system_prompt,
+        messages,
+        reasoning_enabled,
+        reasoning_budget,
+        include_reasoning,
+    )
+    if len(candidates) == 1:
+        stats: dict = {}
+        answer, reasoning = _call_provider(candidates[0], *args, priority, stats)
+        return (
+            answer,
+            reasoning,
+            _provider_route(candidates[0], 1, False, stats.get("queue_wait_ms", 0)),
+        )
+
+    delay = _hedge_delay(candidates[0])
+    pending: dict[Future, int] = {}
+    stats_by_index: list[dict] = [{} for _ in candidates]
+    launched = 0
+    hedged = False
+    last_error: Exception | None = None
+
+    def _launch() -> None:
+        nonlocal launched
+        future = _provider_pool.submit(
+            _call_provider,
+            candidates[launched],
+            *args,
+            priority,
+            stats_by_index[launched],
+        )
+        pending[future] = launched
+        launched += 1
+
+    _launch()
+    while pending:
+        can_hedge = delay is not None and launched < len(candidates)
+        done, _ = wait(
+            pending, timeout=delay if can_hedge else None, return_when=FIRST_COMPLETED
+        )
+        if not done:
+            hedged = True
+            _launch()
+            continue
+        for future in done:
+            index = pending.pop(future)
+            try:
+                answer, reasoning = future.result()
+            except _FAILOVER_ERRORS as exc:
+                last_error = exc
+                continue
+            for other in pending:
+                other.cancel()
+            return (
+                answer,
+                reasoning,
+                _provider_route(
+                    candidates[index],
+                    launched,
+                    hedged,
+                    stats_by_index[index].get("queue_wait_ms", 0),
+                ),
+            )
+        if not pending and launched < len(candidates):
+            _launch()
+    raise last_error
+
+
+async def _aiter_failover_stream(
+    candidates: list[RuntimeDescriptor],
+    route: dict,
+    system_prompt: str,
+    messages: list[dict],
+    reasoning_enabled: bool | None,
+    reasoning_budget: int | None,
+    include_reasoning: bool,
+) -> AsyncGenerator[tuple[str, str], None]:
+    """Stream from the first candidate to produce output and cancel the others.
+
+    Once a candidate has emitted anything it is committed to; a later failure
+    is raised rather than switching providers mid-answer. ``route`` is filled
+    in with the winner.
+    """
+    args = (
+        system_prompt,
+        messages,
+        reasoning_enabled,
+        reasoning_budget,
+        include_reasoning,
+    )
+    priority = provider_scheduler.PRIORITY_INTERACTIVE
+    if len(candidates) == 1:
+        route.update(_provider_route(candidates[0], 1, False))
+        async with aclosing(
+            _aiter_provider_stream(candidates[0], *args, priority, route)
+        ) as stream:
+            async for event in stream:
+                yield event
+        return
+
+    delay = _hedge_delay(candidates[0])
+    queue: asyncio.Queue = asyncio.Queue()
+    tasks: list[asyncio.Task] = []
+    stats_by_index: list[dict] = [{} for _ in candidates]
+    failed: set[int] = set()
+    winner: int | None = None
+    hedged = False
+
+    async def _pump(index: int) -> None:
+        try:
+            async with aclosing(
+                _aiter_provider_stream(
+                    candidates[index], *args, priority, stats_by_index[index]
+                )
+            ) as stream:
+                async for event in stream:
+                    await queue.put((index, "event", event))
+        except _FAILOVER_ERRORS as exc:
+            await queue.put((index, "error", exc))
+            return
+        except Exception as exc:  # noqa: BLE001
+            # Not a provider failure; hand it to the consumer instead of
+            # dying silently and leaving it waiting on the queue.
+            await queue.put((index, "fatal", exc))
+            return
+        await queue.put((index, "end", None))
+
+    def _launch() -> None:
+        tasks.append(asyncio.create_task(_pump(len(tasks))))
+
+    def _claim(index: int) -> None:
+        nonlocal winner
+        winner = index
+        route.update(
+            _provider_route(
+                candidates[index],
+                len(tasks),
+                hedged,
+                stats_by_index[index].get("queue_wait_ms", 0),
+            )
+        )
+        for other, task in enumerate(tasks):
+            if other != index:
+                task.cancel()
+
+    try:
+        _launch()
+        while True:
+            can_hedge = (
+                winner is None and delay is not None and len(tasks) < len(candidates)
+            )
+            try:
+                index, kind, value = await asyncio.wait_for(
+                    queue.get(), delay if can_hedge else None
+                )
+            except TimeoutError:
+                hedged = True
+                _launch()
+                continue
+            if winner is not None and index != winner:
+                continue
+            if kind == "fatal":
+                raise value
+            if kind == "error":
+                if winner is not None:
+                    raise value
+                failed.add(index)
+                if len(failed) == len(tasks):
+                    if len(tasks) == len(candidates):
+                        raise value
+                    _launch()
+                continue
+            if winner is None:
+                _claim(index)
+            if kind == "end":
+                return
+            yield value
+    finally:
+        # Cancelling closes the losers' upstream responses.
+        for task in tasks:
+            task.cancel()
+
+
+def _ensure_vision_support(runtime: RuntimeDescriptor, attachment_meta: list[dict]):
+    if (
+        any(item.get("is_image") for item in attachment_meta)
+        and not runtime.supports_vision
+    ):
+        raise ChatError(
+            7010,
+            "Current model is not multimodal; image upload is disabled for this chat",
+        )
+
+
+def _response_cache_ref(
+    user_id: str, runtime: RuntimeDescriptor, ctx: dict
+) -> response_cache.CacheRef | None:
+    reasoning = list(_reasoning_settings(ctx["session"]))
+    standalone = len(ctx["trimmed"]) == 1 and not ctx["attachment_texts"]
+    return response_cache.make_ref(
+        scope=user_id,
+        model_key=f"{runtime.provider_id}:{runtime.model_name}",
+        system_prompt=ctx["system_prompt"],
+        messages=ctx["trimmed"],
+        params={**runtime.params, "_reasoning": reasoning},
+        standalone_query=ctx["normalized_query"] if standalone else None,
+        context=ctx["context_suffix"],
+    )
+
+
+def complete_text(
+    db,
+    user_id: str,
+    session,
+    system_prompt: str,
+    messages: list[dict],
+    priority: int = provider_scheduler.PRIORITY_INTERACTIVE,
+) -> str:
+    """One-shot, non-streaming completion with the session's runtime profile."""
+    runtime = _resolve_runtime(db, user_id, None, session)
+    candidates = _runtime_candidates(db, user_id, runtime, session, [])
+    answer, _, _ = _call_with_failover(
+        candidates, system_prompt, messages, False, None, False, priority
+    )
+    return answer
+
+
 def _fallback_answer(query: str, attachment_count: int, mcp_count: int) -> str:
     normalized = query.strip() or "(attachment-only mode)"
     return (
@@ -320,6 +971,142 @@ def _fallback_answer(query: str, attachment_count: int, mcp_count: int) -> str:
     )
 
 
+_context_pool = ThreadPoolExecutor(
+    max_workers=max(settings.agent_context_workers, 1),
+    thread_name_prefix="agent-context",
+)
+
+
+def _citations(kb_hits: list[dict], attachment_passages: list[dict]) -> list[dict]:
+    """Compact references to the sources that made it into the prompt."""
+    out: list[dict] = []
+    for hit in kb_hits:
+        score = hit.get("score")
+        record = {
+            "type": "kb",
+            "kb_id": hit.get("kb_id"),
+            "document_id": hit.get("document_id"),
+            "chunk_id": hit.get("chunk_id"),
+            "chunk_order": hit.get("chunk_order"),
+            "score": score.get("total") if isinstance(score, dict) else score,
+        }
+        out.append({key: value for key, value in record.items() if value is not None})
+    for item in attachment_passages:
+        out.append(
+            {
+                "type": "attachment",
+                "attachment_id": item["attachment_id"],
+                "spans": item["spans"],
+            }
+        )
+    return out
+
+
+def _tool_call_summaries(mcp_results: list[dict]) -> list[dict]:
+    out: list[dict] = []
+    for item in mcp_results:
+        output = str(item.get("output", ""))
+        out.append(
+            {
+                "server_id": item.get("server_id"),
+                "server_name": item.get("server_name"),
+                "output_chars": len(output),
+                "output": output[:_TOOL_OUTPUT_MAX_CHARS],
+            }
+        )
+    return out
+
+
+def _load_attachments_stage(
+    db,
+    session_id: str,
+    user_id: str,
+    attachments_ids: list[str],
+    query: str,
+    token_budget: int,
+) -> tuple[list[dict], list[dict]]:
+    with fork_session(db) as stage_db:
+        meta = get_attachment_meta(stage_db, session_id, user_id, attachments_ids)
+        passages = get_attachment_passages(
+            stage_db, session_id, user_id, attachments_ids, query, token_budget
+        )
+    return meta, passages
+
+
+def _stage_deadline() -> float:
+    return time.monotonic() + settings.agent_context_budget_ms / 1000
+
+
+def _run_stage(started: dict[str, float], name: str, fn, *args):
+    # The budget runs from when a worker picks the stage up, not from submit.
+    started[name] = time.monotonic()
+    return fn(*args)
+
+
+def _route_tools_stage(
+    db, user_id: str, enabled_server_ids: list[str], query: str
+) -> dict:
+    if not enabled_server_ids:
+        return {"results": [], "warnings": []}
+    deadline = _stage_deadline()
+    with fork_session(db) as stage_db:
+        return route_tools(
+            stage_db,
+            user_id=user_id,
+            enabled_server_ids=enabled_server_ids,
+            query=query,
+            deadline=deadline,
+        )
+
+
+def _retrieve_kb_stage(db, kb_id: str, user_id: str, query: str) -> list[dict]:
+    deadline = _stage_deadline()
+    with fork_session(db) as stage_db:
+        hits = retrieve_from_kb(
+            stage_db,
+            kb_id=kb_id,
+            user_id=user_id,
+            query=query,
+            top_k=None,
+            deadline=deadline,
+        )
+    for hit in hits:
+        hit["kb_id"] = kb_id
+    return hits
+
+
+def _wait_stages(
+    stages: dict[str, Future], started: dict[str, float], submitted_at: float
+) -> tuple[set[Future], list[str]]:
+    """Wait for context stages, each within its own budget.
+
+    A running stage gets ``FH_AGENT_CONTEXT_BUDGET_MS`` from its start; a stage
+    still queued for a worker gets the same budget from submission and is
+    then cancelled. Returns the finished futures and the timed-out names.
+    """
+    budget = settings.agent_context_budget_ms / 1000
+    pending = set(stages.values())
+    timed_out: list[str] = []
+    while pending:
+        limits = {
+            name: started.get(name, submitted_at) + budget
+            for name, future in stages.items()
+            if future in pending
+        }
+        timeout = max(min(limits.values()) - time.monotonic(), 0)
+        _, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for name, future in stages.items():
+            if future not in pending:
+                continue
+            if started.get(name, submitted_at) + budget <= now:
+                future.cancel()
+                pending.discard(future)
+                timed_out.append(name)
+    done = {future for name, future in stages.items() if name not in timed_out}
+    return done, timed_out
+
+
 def _prepare_context(
     db,
     user,
@@ -344,25 +1131,6 @@ def _prepare_context(
         content=normalized_query or "(attachment-only mode)",
     )
 
-    history = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.session_id == session_id)
-        .order_by(ChatMessage.created_at.asc())
-        .all()
-    )
-    trimmed = _trim_history(
-        [{"role": _role_name(m.role), "content": m.content} for m in history],
-        limit=getattr(session, "context_message_limit", None),
-    )
-
-    attachment_texts: list[str] = []
-    attachment_meta: list[dict] = []
-    if attachments_ids:
-        attachment_meta = get_attachment_meta(db, session_id, user.id, attachments_ids)
-        attachment_texts = get_attachment_texts(
-            db, session_id, user.id, attachments_ids
-        )
-
     if runtime_profile_id:
         session.runtime_profile_id = runtime_profile_id
         db.commit()
@@ -377,36 +1145,142 @@ def _prepare_context(
         session_default_ids=session_default_ids,
         request_override_ids=enabled_mcp_ids,
     )
-    mcp_out = route_tools(
-        db, user_id=user.id, enabled_server_ids=effective_mcp_ids, query=query
+
+    # Attachments, MCP routing and KB retrieval are independent; run them
+    # concurrently under one deadline while history loads on this thread.
+    kb_query = normalized_query or "(attachment-only mode)"
+    token_budget = _context_token_budget(db, user.id, runtime_profile_id, session)
+    stages: dict[str, Future] = {}
+    started: dict[str, float] = {}
+    if attachments_ids:
+        stages["attachments"] = _context_pool.submit(
+            _run_stage,
+            started,
+            "attachments",
+            _load_attachments_stage,
+            db,
+            session_id,
+            user.id,
+            attachments_ids,
+            normalized_query,
+            token_budget,
+        )
+    stages["mcp"] = _context_pool.submit(
+        _run_stage,
+        started,
+        "mcp",
+        _route_tools_stage,
+        db,
+        user.id,
+        effective_mcp_ids,
+        query,
+    )
+    kb_order = [kb_id for kb_id in dict.fromkeys(kb_ids or []) if kb_id]
+    for kb_id in kb_order:
+        stages[f"kb:{kb_id}"] = _context_pool.submit(
+            _run_stage,
+            started,
+            f"kb:{kb_id}",
+            _retrieve_kb_stage,
+            db,
+            kb_id,
+            user.id,
+            kb_query,
+        )
+    submitted_at = time.monotonic()
+
+    history_query = db.query(ChatMessage.role, ChatMessage.content).filter(
+        ChatMessage.session_id == session_id,
+        ChatMessage.status != "streaming",
+        # Streams closed before the first delta leave empty assistant rows;
+        # providers such as Gemini reject empty turns.
+        or_(ChatMessage.role != "assistant", func.trim(ChatMessage.content) != ""),
     )
+    if session.summary_until_at is not None:
+        history_query = history_query.filter(
+            ChatMessage.created_at > session.summary_until_at
+        )
+    recent = (
+        history_query.order_by(ChatMessage.created_at.desc())
+        .limit(history_limit(session))
+        .all()
+    )
+    trimmed = [
+        {"role": _role_name(role), "content": content}
+        for role, content in reversed(recent)
+    ]
+
+    done, timed_out = _wait_stages(stages, started, submitted_at)
+    stage_warnings = [f"Context stage timed out: {name}" for name in timed_out]
+
+    attachment_passages: list[dict] = []
+    attachment_meta: list[dict] = []
+    attachments_future = stages.get("attachments")
+    if attachments_future in done:
+        attachment_meta, attachment_passages = attachments_future.result()
+    attachment_texts = [item["text"] for item in attachment_passages]
+
+    mcp_out: dict = {"results": [], "warnings": []}
+    if stages["mcp"] in done:
+        mcp_out = stages["mcp"].result()
+
     kb_hits: list[dict] = []
     kb_warnings: list[str] = []
-    if kb_ids:
-        for kb_id in kb_ids:
-            if not kb_id:
+    for kb_id in kb_order:
+        future = stages[f"kb:{kb_id}"]
+        if future not in done:
+            continue
+        try:
+            kb_hits.extend(future.result())
+        except KbError as exc:
+            if exc.code == 7003:
+                kb_warnings.append(f"Knowledge base not ready: {kb_id}")
                 continue
-            try:
-                hits = retrieve_from_kb(
-                    db,
-                    kb_id=kb_id,
-                    user_id=user.id,
-                    query=normalized_query or "(attachment-only mode)",
-                    top_k=None,
-                )
-                for hit in hits:
-                    hit["kb_id"] = kb_id
-                kb_hits.extend(hits)
-            except KbError as exc:
-                if exc.code == 7003:
-                    kb_warnings.append(f"Knowledge base not ready: {kb_id}")
-                    continue
-                raise ChatError(exc.code, exc.message) from exc
-        kb_hits.sort(
-            key=lambda item: (item.get("score", {}) or {}).get("total", 0), reverse=True
-        )
+            if exc.code == 7009:
+                stage_warnings.append(f"Context stage timed out: kb:{kb_id}")
+                continue
+            raise ChatError(exc.code, exc.message) from exc
+    kb_hits.sort(
+        key=lambda item: (item.get("score", {}) or {}).get("total", 0), reverse=True
+    )
+    # Overlapping chunks and the same document in several KBs would otherwise
+    # fill the prompt with near-identical text.
+    kb_hits, kb_selection = select_diverse_hits(
+        kb_hits,
+        budget=token_budget,
+        mmr_lambda=settings.agent_kb_mmr_lambda,
+        duplicate_threshold=settings.agent_kb_duplicate_similarity,
+    )
 
-    suffix = _build_context_suffix(attachment_texts, mcp_out["results"], kb_hits)
+    system_prompt = _with_summary(
+        _effective_system_prompt(session, background_prompt), session.summary
+    )
+    packed = pack_context(
+        system_prompt=system_prompt,
+        history=trimmed,
+        mcp_results=mcp_out["results"],
+        kb_hits=kb_hits,
+        attachment_texts=attachment_texts,
+        budget=token_budget,
+    )
+    trimmed = packed["history"]
+    kb_hits = packed["kb_hits"]
+    dropped_attachments = {
+        item["index"]
+        for item in packed["report"]["dropped"]
+        if item["kind"] == "attachment"
+    }
+    citations = _citations(
+        kb_hits,
+        [
+            item
+            for idx, item in enumerate(attachment_passages)
+            if idx not in dropped_attachments
+        ],
+    )
+    suffix = _build_context_suffix(
+        packed["attachment_texts"], packed["mcp_results"], kb_hits
+    )
     if trimmed and trimmed[-1]["role"] == "user":
         trimmed[-1] = {"role": "user", "content": trimmed[-1]["content"] + suffix}
 
@@ -414,14 +1288,20 @@ def _prepare_context(
         "session": session,
         "normalized_query": normalized_query,
         "trimmed": trimmed,
+        "context_suffix": suffix,
         "attachment_texts": attachment_texts,
         "mcp_out": mcp_out,
         "kb_hits": kb_hits,
         "kb_warnings": kb_warnings,
+        "stage_warnings": stage_warnings,
         "effective_mcp_ids": effective_mcp_ids,
-        "system_prompt": _effective_system_prompt(session, background_prompt),
+        "system_prompt": system_prompt,
         "runtime_profile_id": runtime_profile_id,
         "attachment_meta": attachment_meta,
+        "context_budget": packed["report"],
+        "kb_selection": kb_selection,
+        "citations": citations,
+        "tool_calls": _tool_call_summaries(mcp_out["results"]),
     }
 
 
@@ -453,50 +1333,31 @@ def run_agent_qa(
     )
 
     reasoning_text = ""
+    cache_status = "off"
+    route = None
     try:
-        profile = _resolve_runtime_profile(db, user.id, runtime_profile_id, session)
-        model, provider = _resolve_model_provider(db, user.id, profile)
-        if any(
-            item.get("is_image") for item in ctx["attachment_meta"]
-        ) and not _model_supports_vision(model):
-            raise ChatError(
-                7010,
-                "Current model is not multimodal; image upload is disabled for this chat",
-            )
-        params = _load_params(profile)
-        provider_name = provider.provider_name.lower()
-        if "gemini" in provider_name:
-            payload = _gemini_payload(
-                system_prompt=ctx["system_prompt"],
-                messages=ctx["trimmed"],
-                params=params,
-                reasoning_enabled=reasoning_enabled,
-                reasoning_budget=reasoning_budget,
-                include_reasoning=include_reasoning,
-            )
-            answer, reasoning_text = _gemini_nonstream(
-                base_url=provider.base_url,
-                api_key=decrypt_text(provider.api_key_encrypted),
-                model_name=model.model_name,
-                payload=payload,
-                include_reasoning=include_reasoning,
-            )
+        runtime = _resolve_runtime(db, user.id, runtime_profile_id, session)
+        _ensure_vision_support(runtime, ctx["attachment_meta"])
+        cache_ref = _response_cache_ref(user.id, runtime, ctx)
+        cached = response_cache.lookup(cache_ref) if cache_ref else None
+        if cached is not None:
+            answer, reasoning_text = cached.answer, cached.reasoning
+            cache_status = "hit"
         else:
-            payload = _openai_payload(
-                model_name=model.model_name,
-                system_prompt=ctx["system_prompt"],
-                messages=ctx["trimmed"],
-                params=params,
-                reasoning_enabled=reasoning_enabled,
-                reasoning_budget=reasoning_budget,
-                provider_name=provider.provider_name,
+            candidates = _runtime_candidates(
+                db, user.id, runtime, session, ctx["attachment_meta"]
             )
-            answer, reasoning_text = _openai_nonstream(
-                url=provider.base_url,
-                api_key=decrypt_text(provider.api_key_encrypted),
-                payload=payload,
-                include_reasoning=include_reasoning,
+            answer, reasoning_text, route = _call_with_failover(
+                candidates,
+                ctx["system_prompt"],
+                ctx["trimmed"],
+                reasoning_enabled,
+                reasoning_budget,
+                include_reasoning,
             )
+            if cache_ref is not None:
+                response_cache.store(cache_ref, answer, reasoning_text)
+                cache_status = "miss"
     except ChatError as exc:
         if exc.code in {7001, 7002, 7003, 7004, 7005}:
             answer = _fallback_answer(
@@ -514,7 +1375,10 @@ def run_agent_qa(
         role="assistant",
         content=answer,
         reasoning_content=reasoning_text if include_reasoning else None,
+        citations=ctx["citations"],
+        tool_calls=ctx["tool_calls"],
     )
+    schedule_summary_refresh(db, session_id)
 
     return {
         "session_id": session_id,
@@ -525,18 +1389,36 @@ def run_agent_qa(
             "history_messages": len(ctx["trimmed"]),
             "attachment_chunks": len(ctx["attachment_texts"]),
             "kb_hits": len(ctx["kb_hits"]),
+            "kb_selection": ctx["kb_selection"],
             "enabled_mcp_ids": ctx["effective_mcp_ids"],
+            "context_budget": ctx["context_budget"],
+            "response_cache": cache_status,
+            "provider_route": route,
+            "queue_wait_ms": route["queue_wait_ms"] if route else 0,
         },
+        "citations": ctx["citations"],
         "mcp_results": ctx["mcp_out"]["results"],
-        "tool_warnings": ctx["mcp_out"]["warnings"] + ctx.get("kb_warnings", []),
+        "tool_warnings": ctx["mcp_out"]["warnings"]
+        + ctx.get("kb_warnings", [])
+        + ctx.get("stage_warnings", []),
     }
 
 
-def _sse_event(payload: dict) -> str:
-    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+def _release_session(db) -> None:
+    """Commit and hand the connection back to the pool; the session stays reusable."""
+    db.commit()
+    db.close()
+
 
+def _stream_flush_window(session) -> float:
+    """Seconds deltas are coalesced for; 0 streams every token on its own."""
+    flush_ms = session.stream_flush_ms
+    if flush_ms is None:
+        flush_ms = settings.stream_flush_ms
+    return max(flush_ms, 0) / 1000
 
-def stream_agent_qa(
+
+def _open_stream(
     db,
     user,
     session_id: str,
@@ -546,7 +1428,9 @@ def stream_agent_qa(
     attachments_ids: list[str] | None,
     enabled_mcp_ids: list[str] | None,
     runtime_profile_id: str | None,
-) -> Generator[str, None, None]:
+) -> dict:
+    """DB-bound part of a streamed turn; returns plain values and frees the session."""
+    user_id = user.id
     ctx = _prepare_context(
         db,
         user,
@@ -558,138 +1442,298 @@ def stream_agent_qa(
         enabled_mcp_ids,
         runtime_profile_id,
     )
-    session = ctx["session"]
-    reasoning_enabled, reasoning_budget, include_reasoning = _reasoning_settings(
-        session
-    )
+    plan = {
+        "ctx": ctx,
+        "user_id": user_id,
+        "reasoning": _reasoning_settings(ctx["session"]),
+        "flush_window": _stream_flush_window(ctx["session"]),
+        "runtime": None,
+        "candidates": [],
+        "cache_ref": None,
+        "cached": None,
+        "error": None,
+    }
+    try:
+        runtime = _resolve_runtime(db, user_id, runtime_profile_id, ctx["session"])
+        _ensure_vision_support(runtime, ctx["attachment_meta"])
+        plan["runtime"] = runtime
+        plan["cache_ref"] = _response_cache_ref(user_id, runtime, ctx)
+        if plan["cache_ref"] is not None:
+            plan["cached"] = response_cache.lookup(plan["cache_ref"])
+        if plan["cached"] is None:
+            plan["candidates"] = _runtime_candidates(
+                db, user_id, runtime, ctx["session"], ctx["attachment_meta"]
+            )
+    except ChatError as exc:
+        if exc.code not in {7001, 7002, 7003, 7004, 7005}:
+            plan["error"] = exc.message
+    if not plan["error"]:
+        # Create the answer row up front so partial output survives disconnects.
+        plan["assistant_message_id"] = add_message(
+            db,
+            session_id=session_id,
+            user_id=user_id,
+            role="assistant",
+            content="",
+            status="streaming",
+            citations=ctx["citations"],
+            tool_calls=ctx["tool_calls"],
+        ).id
+
+    # Do not hold a pooled connection (or a SQLite lock) for the whole
+    # upstream response.
+    _release_session(db)
+    return plan
+
+
+def _abandon_stream_plan(db, plan: dict) -> None:
+    """The client left while the context was prepared; close the answer row."""
+    message_id = plan.get("assistant_message_id")
+    if message_id:
+        _context_pool.submit(
+            _checkpoint_assistant, db, message_id, "", None, "interrupted"
+        )
+
+
+def _checkpoint_assistant(
+    db, message_id: str, content: str, reasoning_content: str | None, status: str
+) -> None:
+    with fork_session(db) as write_db:
+        checkpoint_message(write_db, message_id, content, reasoning_content, status)
+
+
+def _fail_assistant(
+    db,
+    session_id: str,
+    user_id: str,
+    message_id: str,
+    content: str,
+    reasoning_content: str | None,
+) -> None:
+    with fork_session(db) as write_db:
+        if content.strip():
+            checkpoint_message(
+                write_db, message_id, content, reasoning_content, "failed"
+            )
+        else:
+            delete_message(write_db, session_id, user_id, message_id)
+
+
+def _finalize_assistant(
+    db,
+    session_id: str,
+    message_id: str,
+    content: str,
+    reasoning_content: str | None,
+) -> None:
+    with fork_session(db) as write_db:
+        checkpoint_message(write_db, message_id, content, reasoning_content, "done")
+        schedule_summary_refresh(write_db, session_id)
+
 
+async def stream_agent_qa(
+    db,
+    user,
+    session_id: str,
+    query: str,
+    kb_ids: list[str] | None,
+    background_prompt: str | None,
+    attachments_ids: list[str] | None,
+    enabled_mcp_ids: list[str] | None,
+    runtime_profile_id: str | None,
+) -> AsyncGenerator[str, None]:
+    # Retrieval and tool stages can take seconds; keep the connection visibly
+    # alive with SSE comments until the plan is ready.
+    prepare = run_in_threadpool(
+        _open_stream,
+        db,
+        user,
+        session_id,
+        query,
+        kb_ids,
+        background_prompt,
+        attachments_ids,
+        enabled_mcp_ids,
+        runtime_profile_id,
+    )
+    plan: dict = {}
+    async with aclosing(
+        sse_writer.with_heartbeats(
+            prepare,
+            settings.stream_heartbeat_seconds,
+            on_abandon=partial(_abandon_stream_plan, db),
+        )
+    ) as preparing:
+        async for item in preparing:
+            if isinstance(item, tuple):
+                (plan,) = item
+            else:
+                yield item
+    if plan["error"]:
+        yield sse_writer.event({"type": "error", "message": plan["error"]})
+        return
+
+    ctx = plan["ctx"]
+    reasoning_enabled, reasoning_budget, include_reasoning = plan["reasoning"]
+    runtime, cache_ref, cached = plan["runtime"], plan["cache_ref"], plan["cached"]
+    message_id = plan["assistant_message_id"]
     answer_buf: list[str] = []
     reasoning_buf: list[str] = []
+    route: dict = {}
 
-    try:
-        profile = _resolve_runtime_profile(db, user.id, runtime_profile_id, session)
-        model, provider = _resolve_model_provider(db, user.id, profile)
-        if any(
-            item.get("is_image") for item in ctx["attachment_meta"]
-        ) and not _model_supports_vision(model):
-            raise ChatError(
-                7010,
-                "Current model is not multimodal; image upload is disabled for this chat",
-            )
-        params = _load_params(profile)
-        provider_name = provider.provider_name.lower()
-
-        if "gemini" in provider_name:
-            payload = _gemini_payload(
-                system_prompt=ctx["system_prompt"],
-                messages=ctx["trimmed"],
-                params=params,
-                reasoning_enabled=reasoning_enabled,
-                reasoning_budget=reasoning_budget,
-                include_reasoning=include_reasoning,
-            )
-            root = provider.base_url.rstrip("/")
-            url = f"{root}/{model.model_name}:streamGenerateContent?alt=sse&key={decrypt_text(provider.api_key_encrypted)}"
-            with httpx.Client(timeout=120) as client:
-                with client.stream("POST", url, json=payload) as resp:
-                    if resp.status_code >= 400:
-                        raise ChatError(
-                            7006, f"Gemini stream failed: HTTP {resp.status_code}"
-                        )
-                    for line in resp.iter_lines():
-                        if not line or not line.startswith("data:"):
-                            continue
-                        raw = line[5:].strip()
-                        if not raw or raw == "[DONE]":
-                            continue
-                        obj = json.loads(raw)
-                        candidates = obj.get("candidates") or []
-                        if not candidates:
-                            continue
-                        parts = candidates[0].get("content", {}).get("parts") or []
-                        for part in parts:
-                            text = str(part.get("text") or "")
-                            if not text:
-                                continue
-                            if part.get("thought") and include_reasoning:
-                                reasoning_buf.append(text)
-                                yield _sse_event({"type": "reasoning", "delta": text})
-                            elif not part.get("thought"):
-                                answer_buf.append(text)
-                                yield _sse_event({"type": "message", "delta": text})
+    def _reasoning_value() -> str | None:
+        return "".join(reasoning_buf) if include_reasoning else None
+
+    yield sse_writer.event({"type": "start", "assistant_message_id": message_id})
+
+    if runtime is None:
+        fallback = _fallback_answer(
+            ctx["normalized_query"],
+            len(ctx["attachment_texts"]),
+            len(ctx["mcp_out"]["results"]),
+        )
+        answer_buf.append(fallback)
+        yield sse_writer.event({"type": "message", "delta": fallback})
+    else:
+        if cached is not None:
+            events = _replay_cached(cached, include_reasoning)
         else:
-            payload = _openai_payload(
-                model_name=model.model_name,
-                system_prompt=ctx["system_prompt"],
-                messages=ctx["trimmed"],
-                params=params,
-                reasoning_enabled=reasoning_enabled,
-                reasoning_budget=reasoning_budget,
-                provider_name=provider.provider_name,
+            events = _aiter_failover_stream(
+                plan["candidates"],
+                route,
+                ctx["system_prompt"],
+                ctx["trimmed"],
+                reasoning_enabled,
+                reasoning_budget,
+                include_reasoning,
             )
-            payload["stream"] = True
-            headers = {
-                "Authorization": f"Bearer {decrypt_text(provider.api_key_encrypted)}",
-                "Content-Type": "application/json",
-            }
-            with httpx.Client(timeout=120) as client:
-                with client.stream(
-                    "POST", provider.base_url, json=payload, headers=headers
-                ) as resp:
-                    if resp.status_code >= 400:
-                        raise ChatError(
-                            7006, f"LLM stream failed: HTTP {resp.status_code}"
+        interval = settings.stream_checkpoint_interval_ms / 1000
+        last_flush = time.monotonic()
+        unflushed = 0
+        try:
+            async with (
+                aclosing(events) as upstream,
+                aclosing(
+                    sse_writer.coalesce(
+                        upstream, plan["flush_window"], settings.stream_flush_chars
+                    )
+                ) as stream,
+            ):
+                async for kind, delta in stream:
+                    (answer_buf if kind == "message" else reasoning_buf).append(delta)
+                    yield sse_writer.event({"type": kind, "delta": delta})
+                    unflushed += len(delta)
+                    now = time.monotonic()
+                    if (
+                        unflushed >= settings.stream_checkpoint_chars
+                        or now - last_flush >= interval
+                    ):
+                        await run_in_threadpool(
+                            _checkpoint_assistant,
+                            db,
+                            message_id,
+                            "".join(answer_buf),
+                            _reasoning_value(),
+                            "streaming",
                         )
-                    for line in resp.iter_lines():
-                        if not line or not line.startswith("data:"):
-                            continue
-                        raw = line[5:].strip()
-                        if not raw or raw == "[DONE]":
-                            continue
-                        obj = json.loads(raw)
-                        choices = obj.get("choices") or []
-                        if not choices:
-                            continue
-                        delta = choices[0].get("delta") or {}
-                        text = delta.get("content") or ""
-                        reasoning = delta.get("reasoning_content") or ""
-                        if text:
-                            answer_buf.append(text)
-                            yield _sse_event({"type": "message", "delta": text})
-                        if reasoning and include_reasoning:
-                            reasoning_buf.append(reasoning)
-                            yield _sse_event({"type": "reasoning", "delta": reasoning})
-    except ChatError as exc:
-        if exc.code in {7001, 7002, 7003, 7004, 7005}:
-            fallback = _fallback_answer(
-                ctx["normalized_query"],
-                len(ctx["attachment_texts"]),
-                len(ctx["mcp_out"]["results"]),
+                        last_flush, unflushed = now, 0
+        except Exception as exc:  # noqa: BLE001
+            # Failover is exhausted or the provider broke mid-answer; keep
+            # what was streamed and tell the client instead of dropping the
+            # connection with the row still marked streaming.
+            await run_in_threadpool(
+                _fail_assistant,
+                db,
+                session_id,
+                plan["user_id"],
+                message_id,
+                "".join(answer_buf),
+                _reasoning_value(),
             )
-            answer_buf.append(fallback)
-            yield _sse_event({"type": "message", "delta": fallback})
-        else:
-            yield _sse_event({"type": "error", "message": exc.message})
+            message = (
+                exc.message
+                if isinstance(exc, ChatError)
+                else f"Model stream failed: {type(exc).__name__}"
+            )
+            yield sse_writer.event({"type": "error", "message": message})
             return
+        except (GeneratorExit, asyncio.CancelledError):
+            # The client went away; awaiting here would be cancelled too, so
+            # hand the final write to a worker thread.
+            _context_pool.submit(
+                _checkpoint_assistant,
+                db,
+                message_id,
+                "".join(answer_buf),
+                _reasoning_value(),
+                "interrupted",
+            )
+            raise
+        if cached is None and cache_ref is not None:
+            response_cache.store(
+                cache_ref, "".join(answer_buf).strip(), "".join(reasoning_buf)
+            )
 
     final_answer = "".join(answer_buf).strip()
     if not final_answer:
         final_answer = "(empty model output)"
+    reasoning_text = "".join(reasoning_buf) if include_reasoning else ""
 
-    assistant_msg = add_message(
+    await run_in_threadpool(
+        _finalize_assistant,
         db,
-        session_id=session_id,
-        user_id=user.id,
-        role="assistant",
-        content=final_answer,
-        reasoning_content="".join(reasoning_buf) if include_reasoning else None,
+        session_id,
+        message_id,
+        final_answer,
+        _reasoning_value(),
     )
 
-    yield _sse_event(
+    yield sse_writer.event(
         {
             "type": "done",
-            "assistant_message_id": assistant_msg.id,
+            "assistant_message_id": message_id,
             "assistant_answer": final_answer,
-            "reasoning_content": "".join(reasoning_buf) if include_reasoning else "",
+            "reasoning_content": reasoning_text,
+            "citations": ctx["citations"],
+            "provider_route": route or None,
+            "queue_wait_ms": route.get("queue_wait_ms", 0),
         }
     )
+
+
+def _load_stream_state(db, session_id: str, user_id: str, message_id: str) -> dict:
+    with fork_session(db) as read_db:
+        row = get_message(read_db, session_id, user_id, message_id)
+        return {
+            "content": row.content,
+            "reasoning_content": row.reasoning_content or "",
+            "status": row.status,
+        }
+
+
+async def resume_agent_stream(
+    db, user_id: str, session_id: str, message_id: str, offset: int = 0
+) -> AsyncGenerator[str, None]:
+    """Replay an answer from ``offset`` and follow its checkpoints until it ends."""
+    sent = max(offset, 0)
+    poll = settings.stream_resume_poll_ms / 1000
+    while True:
+        state = await run_in_threadpool(
+            _load_stream_state, db, session_id, user_id, message_id
+        )
+        content = state["content"]
+        if len(content) > sent:
+            yield sse_writer.event({"type": "message", "delta": content[sent:]})
+            sent = len(content)
+        if state["status"] != "streaming":
+            yield sse_writer.event(
+                {
+                    "type": "done",
+                    "assistant_message_id": message_id,
+                    "assistant_answer": content,
+                    "reasoning_content": state["reasoning_content"],
+                    "status": state["status"],
+                }
+            )
+            return
+        await asyncio.sleep(poll)
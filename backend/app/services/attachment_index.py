@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.context_packer import estimate_tokens
+from app.services.text_similarity import cosine, term_vector
+
+_PASSAGE_SEPARATOR = "\n...\n"
+
+
+@dataclass(frozen=True)
+class Passage:
+    start: int  # byte offsets into the sanitized file
+    end: int
+    tokens: int
+    vector: dict[str, float]
+
+
+@dataclass(frozen=True)
+class AttachmentIndex:
+    path: str
+    mtime_ns: int
+    size: int
+    passages: tuple[Passage, ...]
+
+
+# session_id -> attachment_id -> index. Rebuilt lazily from the sanitized
+# file after a restart or when the file changes, so nothing is persisted.
+_sessions: OrderedDict[str, dict[str, AttachmentIndex]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _split(text: str, max_chars: int) -> list[tuple[int, int, str]]:
+    """Cut ``text`` into line-aligned passages of about ``max_chars``.
+
+    Returns ``(start_byte, end_byte, passage)`` with UTF-8 byte offsets.
+    """
+    passages: list[tuple[int, int, str]] = []
+    pieces: list[str] = []
+    start = offset = 0
+    size = 0
+
+    def _flush() -> None:
+        nonlocal pieces, size, start
+        if pieces:
+            body = "".join(pieces)
+            if body.strip():
+                passages.append((start, offset, body))
+        pieces, size, start = [], 0, offset
+
+    for line in text.splitlines(keepends=True):
+        while line:
+            room = max_chars - size
+            if len(line) > room and size:
+                _flush()
+                continue
+            head, line = line[:max_chars], line[max_chars:]
+            pieces.append(head)
+            size += len(head)
+            offset += len(head.encode("utf-8"))
+            # Prefer paragraph breaks once a passage is half full.
+            at_break = not head.strip() and size >= max_chars // 2
+            if size >= max_chars or at_break:
+                _flush()
+    _flush()
+    return passages
+
+
+def _build(path: Path) -> AttachmentIndex:
+    stat = path.stat()
+    text = path.read_bytes().decode("utf-8", errors="replace")
+    passages = tuple(
+        Passage(
+            start=start,
+            end=end,
+            tokens=estimate_tokens(body),
+            vector=term_vector(body),
+        )
+        for start, end, body in _split(text, max(settings.attachment_passage_chars, 1))
+    )
+    return AttachmentIndex(
+        path=str(path),
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        passages=passages,
+    )
+
+
+def _store(session_id: str, attachment_id: str, index: AttachmentIndex) -> None:
+    with _lock:
+        _sessions.setdefault(session_id, {})[attachment_id] = index
+        _sessions.move_to_end(session_id)
+        while len(_sessions) > max(settings.attachment_index_max_sessions, 1):
+            _sessions.popitem(last=False)
+
+
+def index_attachment(session_id: str, attachment_id: str, path: str | Path) -> None:
+    """Chunk and index a freshly sanitized attachment."""
+    _store(session_id, attachment_id, _build(Path(path)))
+
+
+def _get(session_id: str, attachment_id: str, path: Path) -> AttachmentIndex:
+    stat = path.stat()
+    with _lock:
+        index = _sessions.get(session_id, {}).get(attachment_id)
+        if index is not None:
+            _sessions.move_to_end(session_id)
+    if (
+        index is not None
+        and index.path == str(path)
+        and (index.mtime_ns, index.size) == (stat.st_mtime_ns, stat.st_size)
+    ):
+        return index
+    index = _build(path)
+    _store(session_id, attachment_id, index)
+    return index
+
+
+def read_spans(path: str | Path, spans: list[tuple[int, int]]) -> list[str]:
+    """Read byte ranges of a sanitized file without loading the whole file."""
+    parts: list[str] = []
+    with Path(path).open("rb") as handle:
+        for start, end in spans:
+            handle.seek(start)
+            raw = handle.read(max(end - start, 0))
+            parts.append(raw.decode("utf-8", errors="replace").strip())
+    return parts
+
+
+def select_passage_spans(
+    session_id: str,
+    attachments: list[tuple[str, str]],
+    query: str,
+    token_budget: int,
+) -> list[dict]:
+    """Most relevant passages per attachment, read from disk within a budget.
+
+    ``attachments`` is ``(attachment_id, sanitized_path)`` in display order.
+    Each attachment first gets its best passage, then the remaining budget
+    goes to the matching passages overall. Passages are returned most
+    relevant first so any later truncation drops the weakest ones. Without a
+    usable query the document openings fill the budget instead.
+
+    Returns ``{"attachment_id", "text", "spans"}`` per attachment that got any
+    passage, ``spans`` being the ``[start, end]`` byte ranges that were read.
+    """
+    query_vector = term_vector(query)
+    indexes = [
+        (attachment_id, Path(path), _get(session_id, attachment_id, Path(path)))
+        for attachment_id, path in attachments
+    ]
+    ranked: list[tuple[float, int, int]] = []
+    for att_pos, (_, _, index) in enumerate(indexes):
+        for pos, passage in enumerate(index.passages):
+            score = cosine(query_vector, passage.vector) if query_vector else 0.0
+            ranked.append((score, pos, att_pos))
+    ranked.sort(key=lambda item: (-item[0], item[1], item[2]))
+
+    chosen: dict[int, list[int]] = {pos: [] for pos in range(len(indexes))}
+    remaining = token_budget
+
+    def _take(att_pos: int, pos: int) -> None:
+        nonlocal remaining
+        tokens = indexes[att_pos][2].passages[pos].tokens
+        if pos not in chosen[att_pos] and tokens <= remaining:
+            chosen[att_pos].append(pos)
+            remaining -= tokens
+
+    best: dict[int, int] = {}
+    for _, pos, att_pos in ranked:
+        best.setdefault(att_pos, pos)
+    for att_pos, pos in sorted(best.items()):
+        _take(att_pos, pos)
+    for score, pos, att_pos in ranked:
+        if query_vector and score <= 0:
+            break
+        _take(att_pos, pos)
+
+    selected: list[dict] = []
+    for att_pos, (attachment_id, path, index) in enumerate(indexes):
+        spans = [
+            (index.passages[pos].start, index.passages[pos].end)
+            for pos in chosen[att_pos]
+        ]
+        parts = read_spans(path, spans) if spans else []
+        kept = [(span, part) for span, part in zip(spans, parts) if part]
+        if kept:
+            selected.append(
+                {
+                    "attachment_id": attachment_id,
+                    "text": _PASSAGE_SEPARATOR.join(part for _, part in kept),
+                    "spans": [list(span) for span, _ in kept],
+                }
+            )
+    return selected
+
+
+def drop_session(session_id: str) -> None:
+    with _lock:
+        _sessions.pop(session_id, None)
+
+
+def clear() -> None:
+    with _lock:
+        _sessions.clear()
@@ -15,7 +15,10 @@ from app.core.paths import raw_vault_root, sanitized_workspace_root
 from app.models.chat_attachment import ChatAttachment
 from app.models.chat_message import ChatMessage
 from app.models.chat_session import ChatSession
+from app.models.kb_chunk import KbChunk
+from app.models.kb_document import KbDocument
 from app.models.llm_runtime_profile import LlmRuntimeProfile
+from app.services import attachment_index
 from app.services.knowledge_base_service import (
     GLOBAL_RETRIEVAL_DEFAULTS,
     KbError,
@@ -23,7 +26,9 @@ from app.services.knowledge_base_service import (
     get_kb_global_defaults,
 )
 from app.services.desensitization_service import DesensitizationError, sanitize_text
-from app.services.file_text_extract import extract_text_from_file, safe_storage_name
+from app.services.extraction_cache import extract_text_cached
+from app.services.extraction_worker import ExtractionError
+from app.services.file_text_extract import safe_storage_name
 
 
 class ChatError(Exception):
@@ -146,6 +151,7 @@ def session_to_dict(row: ChatSession) -> dict:
         "reasoning_enabled": row.reasoning_enabled,
         "reasoning_budget": row.reasoning_budget,
         "show_reasoning": row.show_reasoning,
+        "stream_flush_ms": row.stream_flush_ms,
         "context_message_limit": row.context_message_limit,
         "default_enabled_mcp_ids": _load_mcp_ids(row.default_enabled_mcp_ids_json),
         "updated_at": row.updated_at.isoformat(),
@@ -164,6 +170,7 @@ def create_session(
     show_reasoning: bool,
     context_message_limit: int,
     default_enabled_mcp_ids: list[str],
+    stream_flush_ms: int | None = None,
 ) -> ChatSession:
     resolved_role_id = role_id or (settings.default_chat_role_id or None)
     row = ChatSession(
@@ -176,6 +183,7 @@ def create_session(
         reasoning_enabled=reasoning_enabled,
         reasoning_budget=reasoning_budget,
         show_reasoning=show_reasoning,
+        stream_flush_ms=stream_flush_ms,
         context_message_limit=context_message_limit,
         default_enabled_mcp_ids_json=_dump_mcp_ids(default_enabled_mcp_ids),
     )
@@ -250,6 +258,7 @@ def update_session(
     context_message_limit: int | None,
     archived: bool | None,
     default_enabled_mcp_ids: list[str] | None,
+    stream_flush_ms: int | None = None,
 ) -> ChatSession:
     row = _session_for_user(db, session_id, user_id)
     if title is not None:
@@ -266,6 +275,8 @@ def update_session(
         row.reasoning_budget = reasoning_budget
     if show_reasoning is not None:
         row.show_reasoning = show_reasoning
+    if stream_flush_ms is not None:
+        row.stream_flush_ms = stream_flush_ms
     if context_message_limit is not None:
         row.context_message_limit = context_message_limit
     if archived is not None:
@@ -283,6 +294,7 @@ def delete_session(db: Session, session_id: str, user_id: str) -> None:
     row.deleted_at = _now()
     row.updated_at = _now()
     db.commit()
+    attachment_index.drop_session(session_id)
 
 
 def add_message(
@@ -292,6 +304,9 @@ def add_message(
     role: str,
     content: str,
     reasoning_content: str | None = None,
+    status: str = "done",
+    citations: list[dict] | None = None,
+    tool_calls: list[dict] | None = None,
 ) -> ChatMessage:
     _session_for_user(db, session_id, user_id)
     msg = ChatMessage(
@@ -300,6 +315,13 @@ def add_message(
         role=role,
         content=content,
         reasoning_content=reasoning_content,
+        citations_json=(
+            json.dumps(citations, ensure_ascii=False) if citations else None
+        ),
+        tool_calls_json=(
+            json.dumps(tool_calls, ensure_ascii=False) if tool_calls else None
+        ),
+        status=status,
     )
     db.add(msg)
     session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
@@ -320,6 +342,158 @@ def list_messages(db: Session, session_id: str, user_id: str) -> list[ChatMessag
     )
 
 
+def _load_json_list(raw: str | None) -> list[dict]:
+    try:
+        data = json.loads(raw or "[]")
+    except json.JSONDecodeError:
+        return []
+    return (
+        [item for item in data if isinstance(item, dict)]
+        if isinstance(data, list)
+        else []
+    )
+
+
+def message_to_dict(row: ChatMessage) -> dict:
+    """Message for listings; sources stay compact until expanded."""
+    return {
+        "id": row.id,
+        "role": row.role,
+        "content": row.content,
+        "reasoning_content": row.reasoning_content,
+        "status": row.status,
+        "citations": _load_json_list(row.citations_json),
+        "tool_calls": [
+            {key: value for key, value in item.items() if key != "output"}
+            for item in _load_json_list(row.tool_calls_json)
+        ],
+        "created_at": row.created_at.isoformat(),
+    }
+
+
+def get_message_sources(
+    db: Session, session_id: str, user_id: str, message_id: str
+) -> dict:
+    """Expand a message's stored citations with the cited text.
+
+    KB chunks are loaded by id and attachment passages are read back from
+    their byte offsets; nothing is re-retrieved. Sources deleted since the
+    answer was written are returned with ``available`` false.
+    """
+    row = get_message(db, session_id, user_id, message_id)
+    citations = _load_json_list(row.citations_json)
+
+    chunk_ids = [item["chunk_id"] for item in citations if item.get("chunk_id")]
+    chunks = {
+        chunk.id: chunk
+        for chunk in (
+            db.query(KbChunk).filter(KbChunk.id.in_(chunk_ids)).all()
+            if chunk_ids
+            else []
+        )
+    }
+    document_ids = {chunk.document_id for chunk in chunks.values()}
+    documents = {
+        doc.id: doc
+        for doc in (
+            db.query(KbDocument).filter(KbDocument.id.in_(document_ids)).all()
+            if document_ids
+            else []
+        )
+    }
+    attachment_ids = [
+        item["attachment_id"] for item in citations if item.get("attachment_id")
+    ]
+    attachments = {
+        att.id: att
+        for att in (
+            db.query(ChatAttachment)
+            .filter(
+                ChatAttachment.session_id == session_id,
+                ChatAttachment.id.in_(attachment_ids),
+            )
+            .all()
+            if attachment_ids
+            else []
+        )
+    }
+
+    expanded: list[dict] = []
+    for item in citations:
+        out = dict(item)
+        if item.get("type") == "kb":
+            chunk = chunks.get(item.get("chunk_id"))
+            doc = documents.get(chunk.document_id) if chunk else None
+            out["available"] = chunk is not None
+            out["text"] = chunk.chunk_text if chunk else None
+            out["source"] = {
+                "masked_path": doc.masked_path if doc else None,
+                "source_type": doc.source_type if doc else None,
+            }
+        elif item.get("type") == "attachment":
+            att = attachments.get(item.get("attachment_id"))
+            path = Path(att.sanitized_path) if att and att.sanitized_path else None
+            out["available"] = bool(path and path.exists())
+            out["file_name"] = att.file_name if att else None
+            out["passages"] = (
+                attachment_index.read_spans(
+                    path, [tuple(span) for span in item.get("spans") or []]
+                )
+                if out["available"]
+                else []
+            )
+        expanded.append(out)
+    return {
+        "message_id": row.id,
+        "citations": expanded,
+        "tool_calls": _load_json_list(row.tool_calls_json),
+    }
+
+
+def get_message(
+    db: Session, session_id: str, user_id: str, message_id: str
+) -> ChatMessage:
+    _session_for_user(db, session_id, user_id)
+    row = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.id == message_id, ChatMessage.session_id == session_id)
+        .first()
+    )
+    if not row:
+        raise ChatError(4007, "Message not found")
+    return row
+
+
+def checkpoint_message(
+    db: Session,
+    message_id: str,
+    content: str,
+    reasoning_content: str | None,
+    status: str,
+) -> None:
+    """Persist the partial (or final) text of a streamed assistant message."""
+    db.query(ChatMessage).filter(ChatMessage.id == message_id).update(
+        {
+            ChatMessage.content: content,
+            ChatMessage.reasoning_content: reasoning_content,
+            ChatMessage.status: status,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def mark_interrupted_streams(db: Session) -> int:
+    """Close out answers left ``streaming`` by a previous process."""
+    count = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.status == "streaming")
+        .update({ChatMessage.status: "interrupted"}, synchronize_session=False)
+    )
+    db.commit()
+    return count
+
+
 def delete_message(db: Session, session_id: str, user_id: str, message_id: str) -> None:
     _session_for_user(db, session_id, user_id)
     row = (
@@ -394,7 +568,7 @@ def add_attachment(
     _write_file(raw_path, file_bytes)
 
     try:
-        raw_text = extract_text_from_file(file_name, file_bytes)
+        raw_text, _ = extract_text_cached(file_name, file_bytes)
         sanitized_text, _ = sanitize_text(
             db,
             user_scope=user_id,
@@ -411,6 +585,11 @@ def add_attachment(
         row.error_message = exc.message
         db.commit()
         raise ChatError(exc.code, exc.message) from exc
+    except ExtractionError as exc:
+        row.parse_status = "error"
+        row.error_message = exc.message
+        db.commit()
+        raise ChatError(4002, f"Attachment parse failed: {exc.message}") from exc
     except Exception as exc:  # noqa: BLE001
         row.parse_status = "error"
         row.error_message = f"Attachment parse failed: {type(exc).__name__}"
@@ -419,15 +598,16 @@ def add_attachment(
 
     db.commit()
     db.refresh(row)
+    attachment_index.index_attachment(session_id, row.id, sanitized_path)
     return row
 
 
-def get_attachment_texts(
+def _sanitized_attachments(
     db: Session,
     session_id: str,
     user_id: str,
     attachment_ids: list[str],
-) -> list[str]:
+) -> list[ChatAttachment]:
     _session_for_user(db, session_id, user_id)
     rows = (
         db.query(ChatAttachment)
@@ -440,15 +620,30 @@ def get_attachment_texts(
     if len(rows) != len(set(attachment_ids)):
         raise ChatError(4003, "Attachment not found")
 
-    texts: list[str] = []
     for row in rows:
         if row.parse_status != "done" or not row.sanitized_path:
             raise ChatError(4004, "Attachment is not sanitized and cannot be used")
-        path = Path(row.sanitized_path)
-        if not path.exists():
+        if not Path(row.sanitized_path).exists():
             raise ChatError(4004, "Attachment sanitized text missing")
-        texts.append(path.read_text(encoding="utf-8"))
-    return texts
+    return rows
+
+
+def get_attachment_passages(
+    db: Session,
+    session_id: str,
+    user_id: str,
+    attachment_ids: list[str],
+    query: str,
+    token_budget: int,
+) -> list[dict]:
+    """Relevant sanitized passages of each attachment instead of whole files."""
+    rows = _sanitized_attachments(db, session_id, user_id, attachment_ids)
+    return attachment_index.select_passage_spans(
+        session_id,
+        [(row.id, row.sanitized_path) for row in rows],
+        query,
+        token_budget,
+    )
 
 
 def get_attachment_meta(
@@ -502,6 +697,7 @@ def copy_session(
         show_reasoning=source.show_reasoning,
         context_message_limit=source.context_message_limit,
         default_enabled_mcp_ids=_load_mcp_ids(source.default_enabled_mcp_ids_json),
+        stream_flush_ms=source.stream_flush_ms,
     )
     messages = (
         db.query(ChatMessage)
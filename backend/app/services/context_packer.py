@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import math
+import re
+
+from app.services.text_similarity import jaccard, shingles
+
+_CJK_RE = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]"
+)
+_TRUNCATED_MARK = "\n...[truncated]"
+_MIN_PARTIAL_TOKENS = 48
+
+# Guaranteed share of the budget left after the system prompt and current turn.
+# Whatever a kind does not use is handed out again in priority order.
+_KIND_SHARES = {
+    "history": 0.35,
+    "tool": 0.05,
+    "kb": 0.3,
+    "attachment": 0.3,
+}
+_KIND_PRIORITY = ["history", "tool", "kb", "attachment"]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local estimate: one token per CJK char, ~4 chars per token otherwise."""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    budget = max_tokens - estimate_tokens(_TRUNCATED_MARK)
+    if budget <= 0:
+        return ""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low].rstrip() + _TRUNCATED_MARK
+
+
+def _dedupe_history(history: list[dict]) -> list[dict]:
+    out: list[dict] = []
+    for item in history:
+        if (
+            out
+            and item["role"] == "user"
+            and out[-1]["role"] == "user"
+            and out[-1]["content"] == item["content"]
+        ):
+            continue
+        out.append(item)
+    return out
+
+
+def _hit_text(hit: dict) -> str:
+    return str(hit.get("text") or hit.get("chunk_text") or "").strip()
+
+
+def _hit_score(hit: dict) -> float:
+    score = hit.get("score")
+    if isinstance(score, dict):
+        score = score.get("total", 0)
+    return float(score or 0)
+
+
+def select_diverse_hits(
+    kb_hits: list[dict],
+    budget: int,
+    mmr_lambda: float,
+    duplicate_threshold: float,
+) -> tuple[list[dict], dict]:
+    """Order KB hits by maximal marginal relevance and drop near-duplicates.
+
+    Each step picks the hit maximising ``mmr_lambda * relevance -
+    (1 - mmr_lambda) * max_similarity`` to what is already chosen, where relevance is
+    the retrieval total scaled to the best hit and similarity is the Jaccard
+    overlap of character shingles. Hits at least ``duplicate_threshold``
+    similar to a chosen one are skipped, and selection stops once the hits
+    fill ``budget`` tokens.
+    """
+    texts = [_hit_text(hit) for hit in kb_hits]
+    signatures = [shingles(text) for text in texts]
+    top = max((_hit_score(hit) for hit in kb_hits), default=0.0)
+    relevance = [_hit_score(hit) / top if top > 0 else 0.0 for hit in kb_hits]
+    closest = [0.0] * len(kb_hits)
+
+    pending = list(range(len(kb_hits)))
+    chosen: list[int] = []
+    duplicates = 0
+    used = 0
+    while pending and used < budget:
+        best = max(
+            pending,
+            key=lambda idx: (
+                mmr_lambda * relevance[idx] - (1 - mmr_lambda) * closest[idx],
+                -idx,
+            ),
+        )
+        pending.remove(best)
+        if closest[best] >= duplicate_threshold:
+            duplicates += 1
+            continue
+        chosen.append(best)
+        used += estimate_tokens(texts[best])
+        for idx in pending:
+            closest[idx] = max(closest[idx], jaccard(signatures[best], signatures[idx]))
+
+    report = {
+        "candidates": len(kb_hits),
+        "selected": len(chosen),
+        "duplicates": duplicates,
+    }
+    return [kb_hits[idx] for idx in chosen], report
+
+
+def pack_context(
+    system_prompt: str,
+    history: list[dict],
+    mcp_results: list[dict],
+    kb_hits: list[dict],
+    attachment_texts: list[str],
+    budget: int,
+) -> dict:
+    """Fit prompt parts into a token budget by priority and report what was dropped.
+
+    ``history`` ends with the current user turn, which is always kept along
+    with the system prompt. Older turns are kept newest-first and contiguous;
+    tool outputs, KB hits and attachments may be truncated to fit.
+    """
+    history = _dedupe_history(history)
+    current, older = history[-1:], history[:-1]
+    used = estimate_tokens(system_prompt) + sum(
+        estimate_tokens(item["content"]) for item in current
+    )
+    remaining = max(budget - used, 0)
+
+    candidates: dict[str, list[tuple[int, str]]] = {
+        "history": [
+            (idx, older[idx]["content"]) for idx in range(len(older) - 1, -1, -1)
+        ],
+        "tool": [
+            (idx, str(item.get("output", ""))) for idx, item in enumerate(mcp_results)
+        ],
+        "kb": [(idx, _hit_text(hit)) for idx, hit in enumerate(kb_hits)],
+        "attachment": [
+            (idx, text.strip()) for idx, text in enumerate(attachment_texts)
+        ],
+    }
+    kept: dict[str, dict[int, str]] = {kind: {} for kind in _KIND_PRIORITY}
+    history_closed = False
+
+    def _take(kind: str, limit: int) -> int:
+        nonlocal history_closed
+        spent = 0
+        for idx, text in candidates[kind]:
+            have = kept[kind].get(idx)
+            if have == text:
+                continue
+            if kind == "history" and history_closed:
+                break
+            have_cost = estimate_tokens(have) if have else 0
+            extra = estimate_tokens(text) - have_cost
+            if extra <= limit - spent:
+                kept[kind][idx] = text
+                spent += extra
+                continue
+            if kind == "history":
+                # Never leave a gap in the conversation.
+                history_closed = True
+                break
+            target = have_cost + limit - spent
+            if target < _MIN_PARTIAL_TOKENS:
+                continue
+            partial = _truncate_to_tokens(text, target)
+            grown = estimate_tokens(partial) - have_cost
+            if partial and grown > 0:
+                kept[kind][idx] = partial
+                spent += grown
+        return spent
+
+    # First honour each kind's share (truncating if needed), then hand the
+    # leftover out in priority order, growing truncated items where possible.
+    base = remaining
+    for kind in _KIND_PRIORITY:
+        share = min(int(base * _KIND_SHARES[kind]), remaining)
+        remaining -= _take(kind, share)
+    history_closed = False
+    for kind in _KIND_PRIORITY:
+        remaining -= _take(kind, remaining)
+
+    dropped: list[dict] = []
+    truncated: list[dict] = []
+    for kind in _KIND_PRIORITY:
+        for idx, text in candidates[kind]:
+            item = {"kind": kind, "index": idx, "tokens": estimate_tokens(text)}
+            if idx not in kept[kind]:
+                dropped.append(item)
+            elif kept[kind][idx] != text:
+                truncated.append(item)
+
+    history_start = min(kept["history"], default=len(older))
+    return {
+        "history": older[history_start:] + current,
+        "mcp_results": [
+            {**mcp_results[idx], "output": kept["tool"][idx]}
+            for idx in sorted(kept["tool"])
+        ],
+        "kb_hits": [
+            {**kb_hits[idx], "text": kept["kb"][idx]} for idx in sorted(kept["kb"])
+        ],
+        "attachment_texts": [
+            kept["attachment"][idx] for idx in sorted(kept["attachment"])
+        ],
+        "report": {
+            "budget": budget,
+            "used": used + base - remaining,
+            "dropped": dropped,
+            "truncated": truncated,
+        },
+    }
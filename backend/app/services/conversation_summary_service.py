@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import fork_session
+from app.models.chat_message import ChatMessage
+from app.models.chat_session import ChatSession
+from app.services.provider_scheduler import PRIORITY_BACKGROUND
+
+Summarizer = Callable[[Session, ChatSession, str, list[ChatMessage]], str]
+
+_SUMMARY_PROMPT = (
+    "You maintain a running summary of a family health conversation. "
+    "Merge the previous summary with the new turns into a concise summary that "
+    "keeps symptoms, measurements, medications, decisions and open questions. "
+    "Reply with the summary only, in the conversation's language."
+)
+_SNIPPET_CHARS = 160
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+_inflight: set[str] = set()
+_inflight_lock = threading.Lock()
+
+
+def _role_label(role: str) -> str:
+    return "Assistant" if role == "assistant" else "User"
+
+
+def _clip_summary(text: str) -> str:
+    limit = settings.chat_summary_max_chars
+    text = text.strip()
+    if len(text) <= limit:
+        return text
+    # Keep the most recent part; older facts were already condensed once.
+    return "...\n" + text[-limit:].lstrip()
+
+
+def extractive_summary(
+    db: Session, session: ChatSession, previous: str, messages: list[ChatMessage]
+) -> str:
+    """Local fallback: previous summary plus the first line of every turn."""
+    lines = [previous] if previous else []
+    for msg in messages:
+        snippet = (msg.content.strip().splitlines() or [""])[0]
+        if len(snippet) > _SNIPPET_CHARS:
+            snippet = snippet[:_SNIPPET_CHARS] + "..."
+        if snippet:
+            lines.append(f"- {_role_label(msg.role)}: {snippet}")
+    return _clip_summary("\n".join(lines))
+
+
+def llm_summary(
+    db: Session, session: ChatSession, previous: str, messages: list[ChatMessage]
+) -> str:
+    """Summarize with the session's runtime model, falling back to extraction."""
+    from app.services.agent_service import complete_text
+
+    transcript = "\n".join(
+        f"{_role_label(msg.role)}: {msg.content.strip()}" for msg in messages
+    )
+    content = f"Previous summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"
+    try:
+        summary = complete_text(
+            db,
+            session.user_id,
+            session,
+            _SUMMARY_PROMPT,
+            [{"role": "user", "content": content}],
+            priority=PRIORITY_BACKGROUND,
+        )
+    except Exception:
+        logger.warning(
+            "LLM summary failed for %s; using extractive summary",
+            session.id,
+            exc_info=True,
+        )
+        return extractive_summary(db, session, previous, messages)
+    return _clip_summary(summary)
+
+
+def _window(session: ChatSession) -> int:
+    return session.context_message_limit or settings.chat_context_message_limit
+
+
+def history_limit(session: ChatSession) -> int:
+    """How many unsummarized messages a prompt may include.
+
+    A refresh only runs once history outgrows the window by
+    ``chat_summary_trigger_messages``, so the prompt reads that far back too;
+    otherwise turns that slid out of the window would be in neither the
+    summary nor the prompt until the next refresh.
+    """
+    if not settings.chat_summary_enabled:
+        return _window(session)
+    return _window(session) + max(settings.chat_summary_trigger_messages, 0)
+
+
+def _unsummarized_query(db: Session, session: ChatSession):
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session.id)
+    if session.summary_until_at is not None:
+        query = query.filter(ChatMessage.created_at > session.summary_until_at)
+    return query
+
+
+def refresh_session_summary(
+    db: Session, session_id: str, summarize: Summarizer | None = None
+) -> bool:
+    """Fold messages older than the context window into ``ChatSession.summary``."""
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    if not session:
+        return False
+    summarize = summarize or llm_summary
+    batch = max(settings.chat_summary_trigger_messages, 1)
+    changed = False
+    while True:
+        pending = _unsummarized_query(db, session).count()
+        if pending <= _window(session):
+            return changed
+        rows = (
+            _unsummarized_query(db, session)
+            .order_by(ChatMessage.created_at.asc())
+            .limit(min(batch, pending - _window(session)))
+            .all()
+        )
+        session.summary = summarize(db, session, session.summary or "", rows)
+        session.summary_until_at = rows[-1].created_at
+        db.commit()
+        changed = True
+
+
+def _run_refresh(db: Session, session_id: str) -> None:
+    try:
+        with db:
+            refresh_session_summary(db, session_id)
+    except Exception:
+        logger.exception("Conversation summary refresh failed for %s", session_id)
+    finally:
+        with _inflight_lock:
+            _inflight.discard(session_id)
+
+
+def schedule_summary_refresh(db: Session, session_id: str) -> bool:
+    """Queue a background refresh once unsummarized history outgrows the window."""
+    if not settings.chat_summary_enabled:
+        return False
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    if not session:
+        return False
+    pending = _unsummarized_query(db, session).count()
+    if pending < _window(session) + settings.chat_summary_trigger_messages:
+        return False
+    with _inflight_lock:
+        if session.id in _inflight:
+            return False
+        _inflight.add(session.id)
+    _executor.submit(_run_refresh, fork_session(db), session.id)
+    return True
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from uuid import uuid4
+
+from app.core.config import settings
+from app.core.paths import extract_cache_root
+from app.services.extraction_worker import extract_text_sandboxed
+from app.services.file_text_extract import EXTRACTOR_VERSION
+
+_evict_lock = threading.Lock()
+# Running size of the cache directory, so a store only rescans it when the
+# budget is exceeded. Rebuilt by a full scan on first use or a root change.
+_usage_root: Path | None = None
+_usage_bytes = 0
+
+# Eviction trims below the budget so the next stores do not rescan at once.
+_EVICT_TARGET_RATIO = 0.9
+
+
+def _cache_key(file_name: str, file_bytes: bytes) -> str:
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    suffix = Path(file_name).suffix.lower().lstrip(".") or "bin"
+    return f"{digest}.{suffix}.v{EXTRACTOR_VERSION}"
+
+
+def _cache_path(key: str) -> Path:
+    return extract_cache_root() / key[:2] / f"{key}.txt"
+
+
+def _scan(root: Path) -> tuple[list[tuple[float, int, Path]], int]:
+    entries: list[tuple[float, int, Path]] = []
+    total = 0
+    for path in root.glob("*/*.txt"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    return entries, total
+
+
+def _evict(root: Path, max_bytes: int) -> int:
+    """Drop least recently used entries; returns the remaining cache size."""
+    entries, total = _scan(root)
+    if total <= max_bytes:
+        return total
+    target = int(max_bytes * _EVICT_TARGET_RATIO)
+    # Hits refresh mtime, so oldest mtime is least recently used.
+    entries.sort(key=lambda item: item[0])
+    for _, size, path in entries:
+        if total <= target:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+    return total
+
+
+def _account(root: Path, added: int) -> None:
+    global _usage_root, _usage_bytes
+    max_bytes = settings.extract_cache_max_bytes
+    with _evict_lock:
+        if _usage_root != root:
+            _usage_root, _usage_bytes = root, _scan(root)[1]
+        else:
+            _usage_bytes += added
+        if _usage_bytes > max_bytes:
+            _usage_bytes = _evict(root, max_bytes)
+
+
+def _store(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    try:
+        tmp_path.write_text(text, encoding="utf-8")
+        replaced = path.stat().st_size if path.exists() else 0
+        os.replace(tmp_path, path)
+        added = path.stat().st_size - replaced
+    except (OSError, UnicodeEncodeError):
+        tmp_path.unlink(missing_ok=True)
+        return
+    _account(extract_cache_root(), added)
+
+
+def extract_text_cached(file_name: str, file_bytes: bytes) -> tuple[str, bool]:
+    """Return (text, cache_hit) for the given file, reusing prior extractions."""
+    path = _cache_path(_cache_key(file_name, file_bytes))
+    try:
+        text = path.read_text(encoding="utf-8")
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    else:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text, True
+
+    text = extract_text_sandboxed(file_name, file_bytes)
+    _store(path, text)
+    return text, False
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import ctypes
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections.abc import Callable
+from multiprocessing import get_context
+
+from app.core.config import settings
+from app.services.file_text_extract import extract_text_from_file
+
+logger = logging.getLogger(__name__)
+
+_ctx = get_context("spawn")
+_POLL_SECONDS = 0.05
+
+
+class ExtractionError(Exception):
+    def __init__(self, code: int, message: str, kind: str):
+        self.code = code
+        self.message = message
+        self.kind = kind
+        super().__init__(message)
+
+
+def _worker_main(conn, extract: Callable[[str, bytes], str]) -> None:
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        file_name, file_bytes = job
+        try:
+            conn.send(("ok", extract(file_name, file_bytes)))
+        except MemoryError:
+            conn.send(("memory", "MemoryError"))
+        except Exception as exc:  # noqa: BLE001
+            conn.send(("error", type(exc).__name__))
+
+
+if sys.platform == "win32":
+    from ctypes import wintypes
+
+    class _ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    _PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+    _kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    _kernel32.K32GetProcessMemoryInfo.argtypes = (
+        wintypes.HANDLE,
+        ctypes.POINTER(_ProcessMemoryCounters),
+        wintypes.DWORD,
+    )
+    _kernel32.K32GetProcessMemoryInfo.restype = wintypes.BOOL
+
+    def _rss_bytes(pid: int) -> int | None:
+        handle = _kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            counters = _ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            if not _kernel32.K32GetProcessMemoryInfo(
+                handle, ctypes.byref(counters), counters.cb
+            ):
+                return None
+            return counters.WorkingSetSize
+        finally:
+            _kernel32.CloseHandle(handle)
+
+else:
+
+    def _rss_bytes(pid: int) -> int | None:
+        try:
+            with open(f"/proc/{pid}/statm", encoding="ascii") as fh:
+                resident_pages = int(fh.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            return None
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class _Worker:
+    def __init__(self, extract: Callable[[str, bytes], str]) -> None:
+        self.conn, child_conn = _ctx.Pipe()
+        self.process = _ctx.Process(
+            target=_worker_main, args=(child_conn, extract), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ExtractionWorkerPool:
+    """Reusable extraction subprocesses with per-job wall-clock and RSS limits.
+
+    ``extract`` runs inside the workers, so it must be a module-level function
+    that a spawned process can import.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_jobs_per_worker: int,
+        timeout_seconds: float,
+        max_rss_bytes: int,
+        extract: Callable[[str, bytes], str] = extract_text_from_file,
+    ) -> None:
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+        self._idle: queue.LifoQueue[_Worker] = queue.LifoQueue()
+        self._max_jobs = max(max_jobs_per_worker, 1)
+        self._timeout = timeout_seconds
+        self._max_rss = max_rss_bytes
+        self._extract = extract
+        self._closed = False
+        if max_rss_bytes and _rss_bytes(os.getpid()) is None:
+            logger.warning(
+                "Extraction memory limit is not enforced: resident memory "
+                "cannot be read on this platform"
+            )
+
+    def _checkout(self) -> _Worker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return _Worker(self._extract)
+            if worker.process.is_alive():
+                return worker
+            worker.kill()
+
+    def _checkin(self, worker: _Worker) -> None:
+        if self._closed or worker.jobs >= self._max_jobs:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+    def _wait_result(self, worker: _Worker) -> tuple[str, str]:
+        deadline = time.monotonic() + self._timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ExtractionError(
+                    9001,
+                    f"Text extraction exceeded {self._timeout:g}s and was aborted",
+                    "timeout",
+                )
+            if worker.conn.poll(min(_POLL_SECONDS, remaining)):
+                try:
+                    return worker.conn.recv()
+                except EOFError as exc:
+                    raise ExtractionError(
+                        9003, "Text extraction worker crashed", "crashed"
+                    ) from exc
+            if not worker.process.is_alive():
+                raise ExtractionError(9003, "Text extraction worker crashed", "crashed")
+            rss = _rss_bytes(worker.process.pid)
+            if self._max_rss and rss is not None and rss > self._max_rss:
+                raise ExtractionError(
+                    9002, "Text extraction exceeded the memory limit", "memory"
+                )
+
+    def run(self, file_name: str, file_bytes: bytes) -> str:
+        with self._slots:
+            worker = self._checkout()
+            try:
+                worker.jobs += 1
+                worker.conn.send((file_name, file_bytes))
+                status, payload = self._wait_result(worker)
+            except (BrokenPipeError, OSError) as exc:
+                worker.kill()
+                raise ExtractionError(
+                    9003, "Text extraction worker crashed", "crashed"
+                ) from exc
+            except BaseException:
+                worker.kill()
+                raise
+            self._checkin(worker)
+
+        if status == "ok":
+            return payload
+        if status == "memory":
+            raise ExtractionError(
+                9002, "Text extraction exceeded the memory limit", "memory"
+            )
+        raise ExtractionError(9004, f"Text extraction failed: {payload}", "error")
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                return
+
+
+_pool: ExtractionWorkerPool | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ExtractionWorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionWorkerPool(
+                size=settings.extract_workers,
+                max_jobs_per_worker=settings.extract_worker_max_jobs,
+                timeout_seconds=settings.extract_timeout_seconds,
+                max_rss_bytes=settings.extract_max_rss_mb * 1024 * 1024,
+            )
+        return _pool
+
+
+def extract_text_sandboxed(file_name: str, file_bytes: bytes) -> str:
+    if not settings.extract_sandbox_enabled:
+        return extract_text_from_file(file_name, file_bytes)
+    return _get_pool().run(file_name, file_bytes)
+
+
+def shutdown_extraction_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
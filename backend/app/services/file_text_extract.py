@@ -1,28 +1,136 @@
 from __future__ import annotations
 
+import codecs
 import re
 import zipfile
+from collections.abc import Iterator
 from io import BytesIO
 from pathlib import Path
+from xml.etree.ElementTree import iterparse
 
 import openpyxl
 import xlrd
 from pptx import Presentation
 from pypdf import PdfReader
 
+# Bump whenever extraction output changes so cached texts are not reused.
+EXTRACTOR_VERSION = "3"
+
+
+_BOM_ENCODINGS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_FALLBACK_ENCODINGS = ("utf-8", "gb18030", "latin-1")
+_DETECT_SAMPLE_BYTES = 64 * 1024
+_DETECT_STEP_BYTES = 4096
+_DECODE_CHUNK_BYTES = 256 * 1024
+
+
+def _sample_decodes(sample: bytes, encoding: str, final: bool) -> bool:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    view = memoryview(sample)
+    try:
+        for start in range(0, len(view), _DETECT_STEP_BYTES):
+            decoder.decode(view[start : start + _DETECT_STEP_BYTES])
+        decoder.decode(b"", final=final)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_text_encoding(file_bytes: bytes) -> str:
+    """Guess the encoding from a BOM or a bounded sample of the payload."""
+    for bom, encoding in _BOM_ENCODINGS:
+        if file_bytes.startswith(bom):
+            return encoding
+    sample = file_bytes[:_DETECT_SAMPLE_BYTES]
+    final = len(file_bytes) <= _DETECT_SAMPLE_BYTES
+    for encoding in _FALLBACK_ENCODINGS:
+        if _sample_decodes(sample, encoding, final):
+            return encoding
+    return "latin-1"
+
+
+def iter_decoded_text(
+    file_bytes: bytes, chunk_size: int = _DECODE_CHUNK_BYTES
+) -> Iterator[str]:
+    """Decode in one streaming pass; bytes invalid past the sample are replaced."""
+    encoding = detect_text_encoding(file_bytes)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    view = memoryview(file_bytes)
+    for start in range(0, len(view), chunk_size):
+        text = decoder.decode(view[start : start + chunk_size])
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
 
 def decode_text_with_fallback(file_bytes: bytes) -> str:
-    for encoding in ("utf-8", "utf-8-sig", "gb18030", "latin-1"):
+    detected = detect_text_encoding(file_bytes)
+    candidates = [detected] + [enc for enc in _FALLBACK_ENCODINGS if enc != detected]
+    for encoding in candidates:
         try:
-            return file_bytes.decode(encoding)
+            return codecs.decode(file_bytes, encoding)
         except UnicodeDecodeError:
             continue
     return file_bytes.decode("utf-8", errors="ignore")
 
 
-def _strip_xml_tags(text: str) -> str:
-    cleaned = re.sub(r"<[^>]+>", " ", text)
-    return re.sub(r"\s+", " ", cleaned).strip()
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def iter_docx_paragraphs(file_bytes: bytes) -> Iterator[str]:
+    """Stream paragraph texts out of word/document.xml without loading the tree."""
+    paragraph = f"{_WORD_NS}p"
+    with zipfile.ZipFile(BytesIO(file_bytes)) as zf, zf.open(
+        "word/document.xml"
+    ) as stream:
+        open_elems: list = []
+        open_paragraphs: list[list[str]] = []
+        for event, elem in iterparse(stream, events=("start", "end")):
+            if event == "start":
+                open_elems.append(elem)
+                if elem.tag == paragraph:
+                    open_paragraphs.append([])
+                continue
+            open_elems.pop()
+            if not open_paragraphs:
+                continue
+            tag = elem.tag
+            if tag == f"{_WORD_NS}t":
+                open_paragraphs[-1].append(elem.text or "")
+            elif tag == f"{_WORD_NS}tab":
+                open_paragraphs[-1].append("\t")
+            elif tag in {f"{_WORD_NS}br", f"{_WORD_NS}cr"}:
+                open_paragraphs[-1].append("\n")
+            elif tag == paragraph:
+                text = re.sub(r"[ \t]+", " ", "".join(open_paragraphs.pop()))
+                if text.strip():
+                    yield text.strip()
+                # Drop finished paragraphs so memory stays flat on large files.
+                if open_elems:
+                    open_elems[-1].remove(elem)
+
+
+def iter_xlsx_rows(file_bytes: bytes) -> Iterator[str]:
+    """Stream tab-joined rows from a workbook opened in read-only mode."""
+    workbook = openpyxl.load_workbook(
+        BytesIO(file_bytes), read_only=True, data_only=True
+    )
+    try:
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                cells = [str(cell) for cell in row if cell is not None]
+                if cells:
+                    yield "\t".join(cells)
+    finally:
+        workbook.close()
 
 
 def extract_text_from_file(file_name: str, file_bytes: bytes) -> str:
@@ -48,9 +156,7 @@ def extract_text_from_file(file_name: str, file_bytes: bytes) -> str:
         return "\n".join(chunks).strip()
 
     if suffix == ".docx":
-        with zipfile.ZipFile(BytesIO(file_bytes)) as zf:
-            xml_payload = zf.read("word/document.xml").decode("utf-8", errors="ignore")
-            return _strip_xml_tags(xml_payload)
+        return "\n".join(iter_docx_paragraphs(file_bytes)).strip()
 
     if suffix == ".pptx":
         presentation = Presentation(BytesIO(file_bytes))
@@ -65,14 +171,7 @@ def extract_text_from_file(file_name: str, file_bytes: bytes) -> str:
         return "\n".join(chunks).strip()
 
     if suffix == ".xlsx":
-        workbook = openpyxl.load_workbook(BytesIO(file_bytes), data_only=True)
-        rows: list[str] = []
-        for sheet in workbook.worksheets:
-            for row in sheet.iter_rows(values_only=True):
-                cells = [str(cell) for cell in row if cell is not None]
-                if cells:
-                    rows.append("\t".join(cells))
-        return "\n".join(rows).strip()
+        return "\n".join(iter_xlsx_rows(file_bytes)).strip()
 
     if suffix == ".xls":
         workbook = xlrd.open_workbook(file_contents=file_bytes)
@@ -3,6 +3,7 @@ from __future__ import annotations
 import json
 import math
 import re
+import time
 from pathlib import Path
 from uuid import uuid4
 
@@ -14,7 +15,9 @@ from app.models.kb_document import KbDocument
 from app.models.knowledge_base import KnowledgeBase
 from app.models.llm_runtime_profile import LlmRuntimeProfile
 from app.services.desensitization_service import DesensitizationError, sanitize_text
-from app.services.file_text_extract import extract_text_from_file, safe_storage_name
+from app.services.extraction_cache import extract_text_cached
+from app.services.extraction_worker import ExtractionError
+from app.services.file_text_extract import safe_storage_name
 
 
 class KbError(Exception):
@@ -31,6 +34,9 @@ GLOBAL_RETRIEVAL_DEFAULTS = {
     "rerank_weight": 0.2,
 }
 
+# How many chunks are scored between deadline checks.
+_DEADLINE_CHECK_ROWS = 256
+
 
 def _strategy_params(row: KnowledgeBase) -> dict[str, float | int | str | bool]:
     if not row.strategy_params_json:
@@ -483,7 +489,7 @@ def upload_kb_document(
     source_path.parent.mkdir(parents=True, exist_ok=True)
     source_path.write_bytes(file_bytes)
     try:
-        content = extract_text_from_file(safe_name, file_bytes)
+        content, _ = extract_text_cached(safe_name, file_bytes)
         doc_id, chunk_count, status = _create_doc_and_chunks(
             db,
             kb=kb,
@@ -512,6 +518,8 @@ def upload_kb_document(
         db.commit()
         if isinstance(exc, DesensitizationError):
             raise KbError(7007, exc.message) from exc
+        if isinstance(exc, ExtractionError):
+            raise KbError(7007, f"Upload parse failed: {exc.message}") from exc
         raise KbError(7007, f"Upload parse failed: {type(exc).__name__}") from exc
 
 
@@ -578,7 +586,13 @@ def retrieve_from_kb(
     keyword_weight: float | None = None,
     semantic_weight: float | None = None,
     rerank_weight: float | None = None,
+    deadline: float | None = None,
 ) -> list[dict]:
+    """Score the KB's chunks against ``query``.
+
+    ``deadline`` is a ``time.monotonic()`` value; scoring past it raises
+    ``KbError(7009)`` so callers with a time budget are not held up.
+    """
     kb = _ensure_kb(db, kb_id, user_id=user_id)
     if kb.status not in {"ready", "building", "failed"}:
         raise KbError(7003, "Knowledge base not ready")
@@ -594,7 +608,13 @@ def retrieve_from_kb(
     query_tokens = _tokenize(query)
 
     scored: list[tuple[float, KbChunk, dict]] = []
-    for row in rows:
+    for index, row in enumerate(rows):
+        if (
+            deadline is not None
+            and index % _DEADLINE_CHECK_ROWS == 0
+            and time.monotonic() > deadline
+        ):
+            raise KbError(7009, "Knowledge base retrieval exceeded its deadline")
         text_tokens = _tokenize(row.chunk_text)
         kw_score = _keyword_score(query_tokens, row.chunk_text)
         sem_score = _semantic_score(query_tokens, text_tokens)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_sync_clients: dict[str, httpx.Client] = {}
+# AsyncClient connections are bound to the loop that opened them.
+_async_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]
+] = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.llm_http_max_connections,
+        max_keepalive_connections=settings.llm_http_max_keepalive_connections,
+        keepalive_expiry=settings.llm_http_keepalive_expiry_seconds,
+    )
+
+
+def _use_http2() -> bool:
+    return settings.llm_http2_enabled and _HTTP2_AVAILABLE
+
+
+def provider_timeout(provider_name: str, stream: bool = False) -> httpx.Timeout:
+    read = (
+        settings.llm_stream_read_timeout_seconds
+        if stream
+        else settings.llm_read_timeout_seconds
+    )
+    lower_name = provider_name.lower()
+    for key, value in settings.llm_provider_timeouts.items():
+        if key.lower() in lower_name:
+            read = value
+            break
+    return httpx.Timeout(read, connect=settings.llm_connect_timeout_seconds)
+
+
+def get_sync_client(url: str) -> httpx.Client:
+    """Return the process-wide keep-alive client for the URL's origin."""
+    origin = _origin(url)
+    with _lock:
+        client = _sync_clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.Client(
+                limits=_limits(),
+                http2=_use_http2(),
+                timeout=provider_timeout(""),
+            )
+            _sync_clients[origin] = client
+        return client
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """Return the keep-alive AsyncClient for the URL's origin on the running loop."""
+    loop = asyncio.get_running_loop()
+    origin = _origin(url)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=_limits(),
+                http2=_use_http2(),
+                timeout=provider_timeout(""),
+            )
+            clients[origin] = client
+        return client
+
+
+async def close_llm_clients() -> None:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        sync_clients = list(_sync_clients.values())
+        _sync_clients.clear()
+        async_clients = list(_async_clients.pop(loop, {}).values())
+    for client in sync_clients:
+        client.close()
+    for client in async_clients:
+        await client.aclose()
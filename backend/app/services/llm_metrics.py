@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+import httpx
+
+from app.core.config import settings
+from app.services.chat_service import ChatError
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open.
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+_HTTP_STATUS_RE = re.compile(r"HTTP (\d{3})")
+
+
+@dataclass(frozen=True)
+class Sample:
+    at: float
+    stream: bool
+    total_ms: float
+    connect_ms: float | None
+    ttft_ms: float | None
+    output_tokens: int
+    tokens_per_second: float | None
+    error_class: str | None
+
+
+@dataclass
+class _Series:
+    provider_id: str
+    provider_name: str
+    model_name: str
+    samples: deque = field(default_factory=deque)
+
+
+_series: dict[str, _Series] = {}
+_lock = threading.Lock()
+
+
+def classify_error(exc: BaseException) -> str:
+    if isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, httpx.TransportError):
+        return "connect"
+    if isinstance(exc, ChatError):
+        match = _HTTP_STATUS_RE.search(exc.message)
+        if match:
+            return f"http_{match.group(1)}"
+        return "bad_response"
+    return type(exc).__name__
+
+
+class Probe:
+    """Timing for one upstream call; pass ``extensions`` to the httpx request."""
+
+    def __init__(
+        self,
+        model_id: str,
+        provider_id: str,
+        provider_name: str,
+        model_name: str,
+        stream: bool,
+    ) -> None:
+        self.model_id = model_id
+        self.provider_id = provider_id
+        self.provider_name = provider_name
+        self.model_name = model_name
+        self.stream = stream
+        self.started_at = time.monotonic()
+        self.first_token_at: float | None = None
+        self.output_tokens = 0
+        self._connect_started: float | None = None
+        self._connected: float | None = None
+
+    def _on_trace(self, name: str) -> None:
+        # httpcore only emits connect events when it opens a new connection;
+        # reused keep-alive connections record no connect time.
+        if name == "connection.connect_tcp.started":
+            self._connect_started = time.monotonic()
+        elif name in (
+            "connection.connect_tcp.complete",
+            "connection.start_tls.complete",
+        ):
+            self._connected = time.monotonic()
+
+    def _trace_sync(self, name: str, info: dict) -> None:
+        self._on_trace(name)
+
+    async def _trace_async(self, name: str, info: dict) -> None:
+        self._on_trace(name)
+
+    def extensions(self, is_async: bool = False) -> dict:
+        return {"trace": self._trace_async if is_async else self._trace_sync}
+
+    def token(self, tokens: int) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        self.output_tokens += tokens
+
+    def finish(self, error: BaseException | None = None) -> None:
+        end = time.monotonic()
+        connect_ms = None
+        if self._connect_started is not None and self._connected is not None:
+            connect_ms = (self._connected - self._connect_started) * 1000
+        ttft_ms = None
+        if self.stream and self.first_token_at is not None:
+            ttft_ms = (self.first_token_at - self.started_at) * 1000
+        # Streams measure throughput after the first token; one-shot calls
+        # can only divide by the whole request.
+        generation_start = self.started_at
+        if self.stream and self.first_token_at is not None:
+            generation_start = self.first_token_at
+        generation_seconds = end - generation_start
+        tokens_per_second = None
+        if error is None and self.output_tokens and generation_seconds > 0:
+            tokens_per_second = self.output_tokens / generation_seconds
+        record(
+            self.model_id,
+            self.provider_id,
+            self.provider_name,
+            self.model_name,
+            Sample(
+                at=end,
+                stream=self.stream,
+                total_ms=(end - self.started_at) * 1000,
+                connect_ms=connect_ms,
+                ttft_ms=ttft_ms,
+                output_tokens=self.output_tokens,
+                tokens_per_second=tokens_per_second,
+                error_class=classify_error(error) if error is not None else None,
+            ),
+        )
+
+
+def _prune(series: _Series, now: float) -> None:
+    horizon = now - settings.llm_metrics_window_seconds
+    while series.samples and series.samples[0].at < horizon:
+        series.samples.popleft()
+    while len(series.samples) > max(settings.llm_metrics_max_samples, 1):
+        series.samples.popleft()
+
+
+def record(
+    model_id: str,
+    provider_id: str,
+    provider_name: str,
+    model_name: str,
+    sample: Sample,
+) -> None:
+    if not settings.llm_metrics_enabled:
+        return
+    with _lock:
+        series = _series.get(model_id)
+        if series is None:
+            series = _series[model_id] = _Series(
+                provider_id=provider_id,
+                provider_name=provider_name,
+                model_name=model_name,
+            )
+        series.samples.append(sample)
+        _prune(series, sample.at)
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return round(ordered[index], 1)
+
+
+def _distribution(values: list[float], histogram: bool = False) -> dict | None:
+    if not values:
+        return None
+    out: dict = {
+        "count": len(values),
+        "p50": _percentile(values, 0.5),
+        "p90": _percentile(values, 0.9),
+        "p99": _percentile(values, 0.99),
+    }
+    if histogram:
+        counts = Counter()
+        for value in values:
+            bucket = next(
+                (str(edge) for edge in LATENCY_BUCKETS_MS if value <= edge), "+inf"
+            )
+            counts[bucket] += 1
+        out["histogram"] = {
+            label: counts.get(label, 0)
+            for label in [str(edge) for edge in LATENCY_BUCKETS_MS] + ["+inf"]
+        }
+    return out
+
+
+def _snapshot(model_id: str, series: _Series) -> dict:
+    samples = list(series.samples)
+    ok_samples = [item for item in samples if item.error_class is None]
+    errors = Counter(
+        item.error_class
+        for item in samples
+        if item.error_class not in (None, "cancelled")
+    )
+    finished = len(samples) - sum(
+        1 for item in samples if item.error_class == "cancelled"
+    )
+    return {
+        "model_id": model_id,
+        "provider_id": series.provider_id,
+        "provider_name": series.provider_name,
+        "model_name": series.model_name,
+        "samples": len(samples),
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / finished, 4) if finished else 0.0,
+        "error_classes": dict(errors),
+        "connect_ms": _distribution(
+            [item.connect_ms for item in samples if item.connect_ms is not None]
+        ),
+        "ttft_ms": _distribution(
+            [item.ttft_ms for item in ok_samples if item.ttft_ms is not None],
+            histogram=True,
+        ),
+        "total_ms": _distribution(
+            [item.total_ms for item in ok_samples], histogram=True
+        ),
+        "tokens_per_second": _distribution(
+            [
+                item.tokens_per_second
+                for item in ok_samples
+                if item.tokens_per_second is not None
+            ]
+        ),
+    }
+
+
+def snapshot(model_ids: set[str] | None = None) -> list[dict]:
+    """Rolling aggregates per model, limited to ``model_ids`` when given."""
+    now = time.monotonic()
+    out = []
+    with _lock:
+        for model_id, series in _series.items():
+            if model_ids is not None and model_id not in model_ids:
+                continue
+            _prune(series, now)
+            if series.samples:
+                out.append(_snapshot(model_id, series))
+    return out
+
+
+def summary(item: dict) -> dict:
+    """Compact form of one ``snapshot`` entry for model listings."""
+
+    def _p50(key: str) -> float | None:
+        value = item.get(key)
+        return value["p50"] if value else None
+
+    return {
+        "samples": item["samples"],
+        "ttft_p50_ms": _p50("ttft_ms"),
+        "total_p50_ms": _p50("total_ms"),
+        "tokens_per_second_p50": _p50("tokens_per_second"),
+        "error_rate": item["error_rate"],
+    }
+
+
+def clear() -> None:
+    with _lock:
+        _series.clear()
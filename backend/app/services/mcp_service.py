@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from typing import Any
@@ -214,7 +215,13 @@ def route_tools(
     user_id: str,
     enabled_server_ids: list[str],
     query: str,
+    deadline: float | None = None,
 ) -> dict:
+    """Call the enabled tools in parallel.
+
+    ``deadline`` (``time.monotonic()``) stops waiting for slow tools; they are
+    reported in ``warnings`` and their threads are not joined.
+    """
     if not enabled_server_ids:
         return {"results": [], "warnings": []}
 
@@ -240,16 +247,24 @@ def route_tools(
     max_workers = min(settings.mcp_max_parallel_tools, max(len(ordered_servers), 1))
     results: list[dict] = []
 
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        futures = {
-            pool.submit(_call_single_tool, server, query): server
-            for server in ordered_servers
-        }
-        for future in as_completed(futures):
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {
+        pool.submit(_call_single_tool, server, query): server
+        for server in ordered_servers
+    }
+    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+    try:
+        for future in as_completed(futures, timeout=timeout):
             server = futures[future]
             try:
                 results.append(future.result(timeout=server.timeout_ms / 1000))
             except Exception as exc:  # noqa: BLE001
                 warnings.append(f"MCP {server.name} failed: {exc}")
+    except TimeoutError:
+        for future, server in futures.items():
+            if not future.done():
+                warnings.append(f"MCP {server.name} failed: deadline exceeded")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
     return {"results": results, "warnings": warnings}
@@ -4,7 +4,6 @@ import json
 from datetime import datetime, timezone
 from uuid import uuid4
 
-import httpx
 from sqlalchemy.orm import Session
 
 from app.core.crypto import decrypt_text
@@ -12,6 +11,8 @@ from app.core.crypto import encrypt_text
 from app.models.llm_runtime_profile import LlmRuntimeProfile
 from app.models.model_catalog import ModelCatalog
 from app.models.model_provider import ModelProvider
+from app.services import runtime_cache
+from app.services.llm_client import get_sync_client
 
 
 class ModelRegistryError(Exception):
@@ -88,8 +89,22 @@ _PROVIDER_PRESETS = [
 ]
 
 _ALLOWED_PARAMS_BY_PROVIDER = {
-    "gemini": {"temperature", "top_p", "max_tokens", "reasoning_budget"},
-    "deepseek": {"temperature", "top_p", "max_tokens", "reasoning_effort"},
+    "gemini": {
+        "temperature",
+        "top_p",
+        "max_tokens",
+        "reasoning_budget",
+        "context_token_budget",
+        "hedge_delay_ms",
+    },
+    "deepseek": {
+        "temperature",
+        "top_p",
+        "max_tokens",
+        "reasoning_effort",
+        "context_token_budget",
+        "hedge_delay_ms",
+    },
 }
 
 
@@ -176,8 +191,7 @@ def _openai_models_url(base_url: str) -> str:
 
 def _discover_gemini_models(base_url: str, api_key: str) -> list[tuple[str, str, dict]]:
     url = _normalize_base_url(base_url)
-    with httpx.Client(timeout=20) as client:
-        resp = client.get(f"{url}?key={api_key}")
+    resp = get_sync_client(url).get(f"{url}?key={api_key}", timeout=20)
     if resp.status_code >= 400:
         raise ModelRegistryError(
             3010, f"Gemini model discovery failed: HTTP {resp.status_code}"
@@ -212,8 +226,9 @@ def _discover_openai_compatible_models(
     base_url: str, api_key: str
 ) -> list[tuple[str, str, dict]]:
     models_url = _openai_models_url(base_url)
-    with httpx.Client(timeout=20) as client:
-        resp = client.get(models_url, headers={"Authorization": f"Bearer {api_key}"})
+    resp = get_sync_client(models_url).get(
+        models_url, headers={"Authorization": f"Bearer {api_key}"}, timeout=20
+    )
     if resp.status_code >= 400:
         raise ModelRegistryError(
             3011, f"Model discovery failed: HTTP {resp.status_code}"
@@ -285,6 +300,7 @@ def create_provider(
     )
     db.add(provider)
     db.commit()
+    runtime_cache.invalidate_user(user_id)
     db.refresh(provider)
     return provider
 
@@ -335,6 +351,7 @@ def update_provider(
     if enabled is not None:
         provider.enabled = enabled
     db.commit()
+    runtime_cache.invalidate_user(user_id)
     db.refresh(provider)
     return provider
 
@@ -350,6 +367,7 @@ def delete_provider(db: Session, user_id: str, provider_id: str) -> None:
     db.query(ModelCatalog).filter(ModelCatalog.provider_id == provider_id).delete()
     db.delete(provider)
     db.commit()
+    runtime_cache.invalidate_user(user_id)
 
 
 def refresh_models(
@@ -400,6 +418,7 @@ def refresh_models(
 
     provider.last_refresh_at = datetime.now(timezone.utc)
     db.commit()
+    runtime_cache.invalidate_user(user_id)
     return rows
 
 
@@ -457,6 +476,28 @@ def _provider_name_for_model(
     return provider.provider_name if provider else None
 
 
+def _normalize_fallback_ids(
+    db: Session, user_id: str, profile_id: str | None, fallback_ids: list[str]
+) -> list[str]:
+    ordered: list[str] = []
+    for fallback_id in fallback_ids:
+        if fallback_id == profile_id or fallback_id in ordered:
+            continue
+        ordered.append(fallback_id)
+    if not ordered:
+        return []
+    found = {
+        row.id
+        for row in db.query(LlmRuntimeProfile.id).filter(
+            LlmRuntimeProfile.user_id == user_id,
+            LlmRuntimeProfile.id.in_(ordered),
+        )
+    }
+    if len(found) != len(ordered):
+        raise ModelRegistryError(3005, "Fallback runtime profile not found")
+    return ordered
+
+
 def create_runtime_profile(
     db: Session,
     user_id: str,
@@ -466,6 +507,7 @@ def create_runtime_profile(
     reranker_model_id: str | None,
     params: dict,
     is_default: bool,
+    fallback_profile_ids: list[str] | None = None,
 ) -> LlmRuntimeProfile:
     duplicated = (
         db.query(LlmRuntimeProfile)
@@ -477,6 +519,9 @@ def create_runtime_profile(
 
     provider_name = _provider_name_for_model(db, user_id, llm_model_id)
     clipped = _clip_params(provider_name or "", params)
+    fallback_ids = _normalize_fallback_ids(
+        db, user_id, None, fallback_profile_ids or []
+    )
 
     if is_default:
         _ensure_default_profile_uniqueness(db, user_id=user_id)
@@ -489,10 +534,12 @@ def create_runtime_profile(
         embedding_model_id=embedding_model_id,
         reranker_model_id=reranker_model_id,
         params_json=json.dumps(clipped, ensure_ascii=False),
+        fallback_profile_ids_json=json.dumps(fallback_ids),
         is_default=is_default,
     )
     db.add(profile)
     db.commit()
+    runtime_cache.invalidate_user(user_id)
     db.refresh(profile)
     return profile
 
@@ -507,6 +554,7 @@ def update_runtime_profile(
     reranker_model_id: str | None,
     params: dict | None,
     is_default: bool | None,
+    fallback_profile_ids: list[str] | None = None,
 ) -> LlmRuntimeProfile:
     profile = (
         db.query(LlmRuntimeProfile)
@@ -542,6 +590,10 @@ def update_runtime_profile(
         profile.params_json = json.dumps(
             _clip_params(provider_name or "", params), ensure_ascii=False
         )
+    if fallback_profile_ids is not None:
+        profile.fallback_profile_ids_json = json.dumps(
+            _normalize_fallback_ids(db, user_id, profile_id, fallback_profile_ids)
+        )
     if is_default is not None:
         if is_default:
             _ensure_default_profile_uniqueness(
@@ -550,6 +602,7 @@ def update_runtime_profile(
         profile.is_default = is_default
 
     db.commit()
+    runtime_cache.invalidate_user(user_id)
     db.refresh(profile)
     return profile
 
@@ -575,3 +628,4 @@ def delete_runtime_profile(db: Session, user_id: str, profile_id: str) -> None:
         raise ModelRegistryError(3003, "Runtime profile not found")
     db.delete(profile)
     db.commit()
+    runtime_cache.invalidate_user(user_id)
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+
+from app.core.config import settings
+from app.services.chat_service import ChatError
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+_MAX_POLL_SECONDS = 1.0
+
+
+@dataclass(eq=False)
+class Ticket:
+    provider_key: str
+    priority: int
+    tokens: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    granted_at: float | None = None
+    cancelled: bool = False
+    output_tokens: int = 0
+    wake: Callable[[], None] | None = field(default=None, repr=False)
+
+    @property
+    def wait_ms(self) -> int:
+        end = self.granted_at if self.granted_at is not None else time.monotonic()
+        return int((end - self.enqueued_at) * 1000)
+
+
+class _ProviderState:
+    def __init__(self) -> None:
+        self.concurrency = 1
+        self.tpm = 0
+        self.available = 0.0
+        self.refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.waiters: list[tuple[int, int, Ticket]] = []
+
+    def configure(self, concurrency: int, tpm: int) -> None:
+        if tpm != self.tpm:
+            self.available = float(tpm)
+        self.concurrency = max(concurrency, 1)
+        self.tpm = max(tpm, 0)
+
+    def refill(self, now: float) -> None:
+        if self.tpm:
+            elapsed = now - self.refilled_at
+            self.available = min(
+                float(self.tpm), self.available + elapsed * self.tpm / 60
+            )
+        self.refilled_at = now
+
+    def can_start(self, tokens: int) -> bool:
+        if self.in_flight >= self.concurrency:
+            return False
+        # A prompt larger than the whole bucket still runs once it is full.
+        return not self.tpm or self.available >= min(tokens, self.tpm)
+
+    def token_eta(self, tokens: int) -> float | None:
+        if not self.tpm:
+            return None
+        missing = min(tokens, self.tpm) - self.available
+        return max(missing, 0) * 60 / self.tpm
+
+
+_states: dict[str, _ProviderState] = {}
+_sequence = itertools.count()
+_lock = threading.Lock()
+
+
+def _match_limit(limits: dict[str, int], provider_name: str, default: int) -> int:
+    lower_name = provider_name.lower()
+    for key, value in limits.items():
+        if key.lower() in lower_name:
+            return value
+    return default
+
+
+def _state_for(provider_key: str, provider_name: str) -> _ProviderState:
+    state = _states.get(provider_key)
+    if state is None:
+        state = _states[provider_key] = _ProviderState()
+    state.configure(
+        _match_limit(
+            settings.llm_provider_concurrency,
+            provider_name,
+            settings.llm_provider_max_concurrency,
+        ),
+        _match_limit(
+            settings.llm_provider_tpm, provider_name, settings.llm_provider_default_tpm
+        ),
+    )
+    return state
+
+
+def _dispatch(state: _ProviderState) -> None:
+    """Grant slots strictly in priority order; caller holds ``_lock``."""
+    now = time.monotonic()
+    state.refill(now)
+    while state.waiters:
+        _, _, ticket = state.waiters[0]
+        if ticket.cancelled:
+            heapq.heappop(state.waiters)
+            continue
+        if not state.can_start(ticket.tokens):
+            return
+        heapq.heappop(state.waiters)
+        state.in_flight += 1
+        if state.tpm:
+            state.available -= ticket.tokens
+        ticket.granted_at = now
+        if ticket.wake is not None:
+            ticket.wake()
+
+
+def _enqueue(
+    provider_key: str,
+    provider_name: str,
+    tokens: int,
+    priority: int,
+    wake: Callable[[], None],
+) -> Ticket:
+    ticket = Ticket(provider_key=provider_key, priority=priority, tokens=tokens)
+    ticket.wake = wake
+    with _lock:
+        state = _state_for(provider_key, provider_name)
+        heapq.heappush(state.waiters, (priority, next(_sequence), ticket))
+        _dispatch(state)
+    return ticket
+
+
+def _poll(ticket: Ticket, deadline: float) -> float | None:
+    """Re-run dispatch for a waiting ticket; return seconds to wait, or None if granted."""
+    with _lock:
+        state = _states[ticket.provider_key]
+        _dispatch(state)
+        if ticket.granted_at is not None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            ticket.cancelled = True
+            raise ChatError(7011, "Model provider is busy, please retry later")
+        eta = state.token_eta(ticket.tokens)
+        return min(remaining, eta if eta else _MAX_POLL_SECONDS, _MAX_POLL_SECONDS)
+
+
+def release(ticket: Ticket) -> None:
+    with _lock:
+        state = _states.get(ticket.provider_key)
+        if state is None:
+            return
+        state.in_flight = max(state.in_flight - 1, 0)
+        if state.tpm:
+            state.available -= ticket.output_tokens
+        _dispatch(state)
+
+
+def acquire(
+    provider_key: str, provider_name: str, tokens: int, priority: int
+) -> Ticket:
+    """Block until the provider has a free slot and token budget for this call."""
+    granted = threading.Event()
+    ticket = _enqueue(provider_key, provider_name, tokens, priority, granted.set)
+    deadline = ticket.enqueued_at + settings.llm_scheduler_queue_timeout_seconds
+    while not granted.is_set():
+        timeout = _poll(ticket, deadline)
+        if timeout is None:
+            break
+        granted.wait(timeout)
+    return ticket
+
+
+async def acquire_async(
+    provider_key: str, provider_name: str, tokens: int, priority: int
+) -> Ticket:
+    loop = asyncio.get_running_loop()
+    granted: asyncio.Future = loop.create_future()
+
+    def _resolve() -> None:
+        if not granted.done():
+            granted.set_result(None)
+
+    ticket = _enqueue(
+        provider_key,
+        provider_name,
+        tokens,
+        priority,
+        lambda: loop.call_soon_threadsafe(_resolve),
+    )
+    deadline = ticket.enqueued_at + settings.llm_scheduler_queue_timeout_seconds
+    try:
+        while not granted.done():
+            timeout = _poll(ticket, deadline)
+            if timeout is None:
+                break
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), timeout)
+            except TimeoutError:
+                pass
+    except asyncio.CancelledError:
+        with _lock:
+            ticket.cancelled = True
+            was_granted = ticket.granted_at is not None
+        if was_granted:
+            release(ticket)
+        raise
+    return ticket
+
+
+@contextmanager
+def slot(
+    provider_key: str, provider_name: str, tokens: int, priority: int
+) -> Iterator[Ticket]:
+    ticket = acquire(provider_key, provider_name, tokens, priority)
+    try:
+        yield ticket
+    finally:
+        release(ticket)
+
+
+@asynccontextmanager
+async def slot_async(
+    provider_key: str, provider_name: str, tokens: int, priority: int
+) -> AsyncIterator[Ticket]:
+    ticket = await acquire_async(provider_key, provider_name, tokens, priority)
+    try:
+        yield ticket
+    finally:
+        release(ticket)
+
+
+def reset() -> None:
+    with _lock:
+        _states.clear()
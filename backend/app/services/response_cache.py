@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.services.text_similarity import cosine, term_vector
+
+
+@dataclass(frozen=True)
+class CacheRef:
+    bucket: str
+    key: str
+    # Set only when the turn is a standalone question eligible for similarity hits.
+    query: str | None = None
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    reasoning: str
+    bucket: str
+    expires_at: float
+    vector: dict[str, float] | None = None
+
+
+_entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _digest(value) -> str:
+    raw = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def make_ref(
+    scope: str,
+    model_key: str,
+    system_prompt: str,
+    messages: list[dict],
+    params: dict,
+    standalone_query: str | None = None,
+    context: str = "",
+) -> CacheRef | None:
+    """Build the cache key for one turn, or ``None`` when caching is disabled.
+
+    The bucket pins user scope, model, system prompt, params and the
+    retrieved ``context`` (KB hits, attachments, tool output), so similarity
+    hits only reuse answers built on the same evidence; the key adds the
+    packed messages, so an exact hit means the provider would have seen the
+    identical prompt.
+    """
+    if not settings.response_cache_enabled:
+        return None
+    bucket = _digest(
+        [scope, model_key, _digest(system_prompt), params, _digest(context)]
+    )
+    key = _digest([bucket, messages])
+    semantic = settings.response_cache_similarity_threshold > 0
+    return CacheRef(
+        bucket=bucket,
+        key=key,
+        query=standalone_query if semantic and standalone_query else None,
+    )
+
+
+def lookup(ref: CacheRef) -> CachedAnswer | None:
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(ref.key)
+        if entry is not None and entry.expires_at > now:
+            _entries.move_to_end(ref.key)
+            return entry
+        if entry is not None:
+            del _entries[ref.key]
+        if ref.query is None:
+            return None
+
+        vector = term_vector(ref.query)
+        best_key, best_score = None, settings.response_cache_similarity_threshold
+        for key, candidate in list(_entries.items()):
+            if candidate.expires_at <= now:
+                del _entries[key]
+                continue
+            if candidate.bucket != ref.bucket or candidate.vector is None:
+                continue
+            score = cosine(vector, candidate.vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        _entries.move_to_end(best_key)
+        return _entries[best_key]
+
+
+def store(ref: CacheRef, answer: str, reasoning: str) -> None:
+    if not answer.strip():
+        return
+    entry = CachedAnswer(
+        answer=answer,
+        reasoning=reasoning,
+        bucket=ref.bucket,
+        expires_at=time.monotonic() + settings.response_cache_ttl_seconds,
+        vector=term_vector(ref.query) if ref.query else None,
+    )
+    with _lock:
+        _entries[ref.key] = entry
+        _entries.move_to_end(ref.key)
+        while len(_entries) > max(settings.response_cache_max_entries, 1):
+            _entries.popitem(last=False)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
@@ -1,10 +1,34 @@
 from __future__ import annotations
 
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
 
+from app.core.config import settings
 from app.core.paths import role_library_root
 
 
+@dataclass(frozen=True)
+class Role:
+    id: str
+    name: str
+    prompt: str
+    prompt_hash: str
+    updated_at: float
+
+
+# Registry state: roles by id plus the (mtime_ns, size) each was loaded from,
+# so a refresh only re-reads files that actually changed.
+_roles: dict[str, Role] = {}
+_file_stats: dict[str, tuple[int, int]] = {}
+_root: Path | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
 def _to_role_id(path: Path) -> str:
     return path.stem
 
@@ -17,25 +41,96 @@ def _extract_title(markdown_text: str, fallback: str) -> str:
     return fallback
 
 
-def list_roles() -> list[dict]:
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _scan(root: Path) -> dict[str, tuple[int, int, float]]:
+    stats: dict[str, tuple[int, int, float]] = {}
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".md") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            stats[entry.name] = (stat.st_mtime_ns, stat.st_size, stat.st_mtime)
+    return stats
+
+
+def _load_role(path: Path, updated_at: float) -> Role:
+    content = path.read_text(encoding="utf-8")
+    role_id = _to_role_id(path)
+    return Role(
+        id=role_id,
+        name=_extract_title(content, role_id),
+        prompt=content,
+        prompt_hash=prompt_hash(content),
+        updated_at=updated_at,
+    )
+
+
+def _refresh_locked(force: bool) -> None:
+    global _root, _checked_at
     root = role_library_root()
-    items: list[dict] = []
-    for path in sorted(root.glob("*.md")):
-        content = path.read_text(encoding="utf-8")
-        role_id = _to_role_id(path)
-        items.append(
-            {
-                "id": role_id,
-                "name": _extract_title(content, role_id),
-                "updated_at": path.stat().st_mtime,
-            }
-        )
-    return items
+    now = time.monotonic()
+    if (
+        not force
+        and root == _root
+        and now - _checked_at < settings.role_library_refresh_seconds
+    ):
+        return
+    if root != _root:
+        _roles.clear()
+        _file_stats.clear()
+        _root = root
+    _checked_at = now
 
+    scanned = _scan(root)
+    for name in [name for name in _file_stats if name not in scanned]:
+        del _file_stats[name]
+        _roles.pop(_to_role_id(Path(name)), None)
+    for name, (mtime_ns, size, mtime) in scanned.items():
+        if _file_stats.get(name) == (mtime_ns, size):
+            continue
+        try:
+            role = _load_role(root / name, mtime)
+        except FileNotFoundError:
+            continue
+        _roles[role.id] = role
+        _file_stats[name] = (mtime_ns, size)
 
-def get_role_prompt(role_id: str) -> str:
+
+def reload_roles() -> int:
+    """Rescan the role library now; returns the number of loaded roles."""
+    with _lock:
+        _refresh_locked(force=True)
+        return len(_roles)
+
+
+def _current() -> dict[str, Role]:
+    with _lock:
+        _refresh_locked(force=False)
+        return dict(_roles)
+
+
+def list_roles() -> list[dict]:
+    return [
+        {
+            "id": role.id,
+            "name": role.name,
+            "prompt_hash": role.prompt_hash,
+            "updated_at": role.updated_at,
+        }
+        for _, role in sorted(_current().items())
+    ]
+
+
+def get_role(role_id: str) -> Role:
     safe_id = role_id.strip().replace("\\", "").replace("/", "")
-    path = role_library_root() / f"{safe_id}.md"
-    if not path.exists():
+    role = _current().get(safe_id)
+    if role is None:
         raise FileNotFoundError(role_id)
-    return path.read_text(encoding="utf-8")
+    return role
+
+
+def get_role_prompt(role_id: str) -> str:
+    return get_role(role_id).prompt
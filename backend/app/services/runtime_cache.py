@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class RuntimeDescriptor:
+    """Resolved runtime profile, model and provider, ready for a provider call."""
+
+    profile_id: str
+    model_id: str
+    model_name: str
+    supports_vision: bool
+    provider_id: str
+    provider_name: str
+    base_url: str
+    api_key: str = field(repr=False)
+    params: dict = field(default_factory=dict)
+    fallback_profile_ids: tuple[str, ...] = ()
+
+
+# Per-process state: invalidation does not reach other worker processes, which
+# keep serving their entries until the TTL expires.
+_entries: dict[tuple[str, str | None], tuple[float, RuntimeDescriptor]] = {}
+_generations: dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def generation(user_id: str) -> int:
+    """Snapshot to pass to ``put`` so a concurrent invalidation is not undone."""
+    with _lock:
+        return _generations.get(user_id, 0)
+
+
+def get(user_id: str, profile_id: str | None) -> RuntimeDescriptor | None:
+    with _lock:
+        entry = _entries.get((user_id, profile_id))
+        if entry is None:
+            return None
+        expires_at, descriptor = entry
+        if expires_at <= time.monotonic():
+            _entries.pop((user_id, profile_id), None)
+            return None
+        return descriptor
+
+
+def put(
+    user_id: str,
+    profile_id: str | None,
+    descriptor: RuntimeDescriptor,
+    generation_snapshot: int,
+) -> None:
+    ttl = settings.runtime_cache_ttl_seconds
+    if ttl <= 0:
+        return
+    with _lock:
+        if _generations.get(user_id, 0) != generation_snapshot:
+            return
+        _entries[(user_id, profile_id)] = (time.monotonic() + ttl, descriptor)
+
+
+def invalidate_user(user_id: str) -> None:
+    with _lock:
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+        for key in [key for key in _entries if key[0] == user_id]:
+            del _entries[key]
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+        _generations.clear()
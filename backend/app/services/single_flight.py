@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import weakref
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import aclosing
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.events: list[Any] = []
+        self.finished = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.task: asyncio.Task | None = None
+        self.signal = asyncio.Event()
+
+    def notify(self) -> None:
+        signal, self.signal = self.signal, asyncio.Event()
+        signal.set()
+
+
+_calls: dict[str, _Call] = {}
+_calls_lock = threading.Lock()
+# Streams are tied to the loop that opened them, like the async HTTP clients.
+_flights: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, _Flight]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def key_for(*parts: Any) -> str:
+    """Stable digest of the parts that fully determine an upstream request."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def run(key: str, fn: Callable[[], T]) -> T:
+    """Run ``fn`` once for all threads that ask for ``key`` at the same time."""
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+    except BaseException as exc:
+        call.error = exc
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
+    return call.result
+
+
+async def _produce(
+    flights: dict[str, _Flight],
+    key: str,
+    flight: _Flight,
+    factory: Callable[[], AsyncIterator[T]],
+) -> None:
+    try:
+        async with aclosing(factory()) as stream:
+            async for item in stream:
+                flight.events.append(item)
+                flight.notify()
+    except Exception as exc:  # noqa: BLE001
+        flight.error = exc
+    finally:
+        flight.finished = True
+        if flights.get(key) is flight:
+            del flights[key]
+        flight.notify()
+
+
+async def subscribe(
+    key: str, factory: Callable[[], AsyncIterator[T]]
+) -> AsyncGenerator[T, None]:
+    """Share one upstream stream among all concurrent subscribers of ``key``.
+
+    Late subscribers first replay what was already received. The upstream is
+    cancelled once the last subscriber leaves; a finished stream is not
+    reused, so a later request starts a fresh upstream call.
+    """
+    loop = asyncio.get_running_loop()
+    flights = _flights.setdefault(loop, {})
+    flight = flights.get(key)
+    if flight is None:
+        flight = flights[key] = _Flight()
+        flight.task = loop.create_task(_produce(flights, key, flight, factory))
+    flight.subscribers += 1
+    index = 0
+    try:
+        while True:
+            while index < len(flight.events):
+                yield flight.events[index]
+                index += 1
+            if flight.finished:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            await flight.signal.wait()
+    finally:
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.finished:
+            if flights.get(key) is flight:
+                del flights[key]
+            flight.task.cancel()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import suppress
+from functools import partial
+from typing import TypeVar
+
+_ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+if _ORJSON_AVAILABLE:
+    import orjson
+
+HEARTBEAT = ": ping\n\n"
+
+_T = TypeVar("_T")
+
+
+def _dumps(payload: dict) -> str:
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(payload).decode("utf-8")
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def event(payload: dict) -> str:
+    return f"data: {_dumps(payload)}\n\n"
+
+
+async def with_heartbeats(
+    work: Awaitable[_T],
+    interval: float,
+    on_abandon: Callable[[_T], None] | None = None,
+) -> AsyncIterator[str | tuple[_T]]:
+    """Await ``work``, yielding ``HEARTBEAT`` every ``interval`` seconds meanwhile.
+
+    The result is yielded last, wrapped in a one-tuple so it cannot be
+    mistaken for a heartbeat. If the consumer goes away first, ``work`` is
+    left to finish and its result is passed to ``on_abandon`` (or it is
+    cancelled when no callback is given).
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {task}, timeout=interval if interval > 0 else None
+            )
+            if done:
+                break
+            yield HEARTBEAT
+        yield (task.result(),)
+    finally:
+        if not task.done():
+            if on_abandon is None:
+                task.cancel()
+            else:
+                task.add_done_callback(partial(_abandoned, on_abandon))
+
+
+def _abandoned(on_abandon: Callable[[_T], None], task: asyncio.Future) -> None:
+    if not task.cancelled() and task.exception() is None:
+        on_abandon(task.result())
+
+
+async def coalesce(
+    deltas: AsyncIterator[tuple[str, str]], window: float, max_chars: int
+) -> AsyncIterator[tuple[str, str]]:
+    """Merge consecutive ``(kind, delta)`` items of the same kind.
+
+    A merged item is released once ``window`` seconds passed since its first
+    delta, once it holds ``max_chars`` characters, or when the kind changes,
+    so a slow stream still shows up token by token. ``window <= 0`` passes
+    deltas through unchanged.
+    """
+    if window <= 0:
+        async for item in deltas:
+            yield item
+        return
+
+    kind: str | None = None
+    parts: list[str] = []
+    size = 0
+    started = 0.0
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(deltas.__anext__())
+            timeout = None
+            if parts:
+                timeout = max(started + window - time.monotonic(), 0)
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield kind, "".join(parts)
+                kind, parts, size = None, [], 0
+                continue
+            finished, pending = pending, None
+            try:
+                next_kind, delta = finished.result()
+            except StopAsyncIteration:
+                break
+            except Exception:
+                # Hand over what was already received before the failure.
+                if parts:
+                    yield kind, "".join(parts)
+                raise
+            if parts and next_kind != kind:
+                yield kind, "".join(parts)
+                parts, size = [], 0
+            if not parts:
+                kind, started = next_kind, time.monotonic()
+            parts.append(delta)
+            size += len(delta)
+            if size >= max_chars:
+                yield kind, "".join(parts)
+                kind, parts, size = None, [], 0
+        if parts:
+            yield kind, "".join(parts)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            with suppress(asyncio.CancelledError, StopAsyncIteration, Exception):
+                await pending
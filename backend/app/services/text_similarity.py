@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RUN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+")
+
+
+def terms(text: str) -> list[str]:
+    """Lower-cased word tokens plus CJK character bigrams (unigram for single chars)."""
+    lower = text.lower()
+    out = _WORD_RE.findall(lower)
+    for run in _CJK_RUN_RE.findall(lower):
+        if len(run) == 1:
+            out.append(run)
+        else:
+            out.extend(run[idx : idx + 2] for idx in range(len(run) - 1))
+    return out
+
+
+def term_vector(text: str) -> dict[str, float]:
+    counts = Counter(terms(text))
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    if not norm:
+        return {}
+    return {term: value / norm for term, value in counts.items()}
+
+
+def cosine(left: dict[str, float], right: dict[str, float]) -> float:
+    if len(left) > len(right):
+        left, right = right, left
+    return sum(value * right.get(term, 0.0) for term, value in left.items())
+
+
+def shingles(text: str, size: int = 4) -> frozenset[int]:
+    """Hashed character ``size``-grams of whitespace-collapsed, lower-cased text."""
+    normalized = " ".join(text.lower().split())
+    if len(normalized) <= size:
+        return frozenset([hash(normalized)]) if normalized else frozenset()
+    return frozenset(
+        hash(normalized[idx : idx + size]) for idx in range(len(normalized) - size + 1)
+    )
+
+
+def jaccard(left: frozenset[int], right: frozenset[int]) -> float:
+    if not left or not right:
+        return 0.0
+    if len(left) > len(right):
+        left, right = right, left
+    overlap = sum(1 for item in left if item in right)
+    return overlap / (len(left) + len(right) - overlap)
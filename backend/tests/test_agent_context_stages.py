@@ -0,0 +1,121 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import agent_service
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def _create_session(client: TestClient, headers: dict) -> str:
+    resp = client.post(
+        "/api/v1/chat/sessions", headers=headers, json={"title": "ctx-stages"}
+    )
+    assert resp.status_code == 200
+    return resp.json()["data"]["id"]
+
+
+def test_kb_stages_run_concurrently(client: TestClient, monkeypatch):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = _create_session(client, headers)
+
+    def slow_retrieve(db, kb_id, user_id, query, top_k, deadline=None):
+        time.sleep(0.4)
+        return [{"text": f"hit from {kb_id}", "score": {"total": 1.0}}]
+
+    monkeypatch.setattr(agent_service, "retrieve_from_kb", slow_retrieve)
+
+    started = time.perf_counter()
+    resp = client.post(
+        "/api/v1/agent/qa",
+        headers=headers,
+        json={"session_id": session_id, "query": "尿酸", "kb_ids": ["kb-a", "kb-b"]},
+    )
+    elapsed = time.perf_counter() - started
+
+    assert resp.status_code == 200
+    assert resp.json()["data"]["context"]["kb_hits"] == 2
+    assert elapsed < 0.75
+
+
+def test_stage_missing_deadline_degrades_to_warning(client: TestClient, monkeypatch):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = _create_session(client, headers)
+
+    def stuck_retrieve(db, kb_id, user_id, query, top_k, deadline=None):
+        time.sleep(1.0)
+        return []
+
+    monkeypatch.setattr(agent_service, "retrieve_from_kb", stuck_retrieve)
+    monkeypatch.setattr(settings, "agent_context_budget_ms", 100)
+
+    resp = client.post(
+        "/api/v1/agent/qa",
+        headers=headers,
+        json={"session_id": session_id, "query": "hello", "kb_ids": ["kb-slow"]},
+    )
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert data["context"]["kb_hits"] == 0
+    assert "Context stage timed out: kb:kb-slow" in data["tool_warnings"]
+
+
+def test_duplicate_kb_hits_across_kbs_are_dropped(client: TestClient, monkeypatch):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = _create_session(client, headers)
+
+    def duplicate_retrieve(db, kb_id, user_id, query, top_k, deadline=None):
+        return [
+            {
+                "text": "尿酸偏高时应减少高嘌呤食物与饮酒，多喝水，必要时就医。",
+                "score": {"total": 1.0},
+            }
+        ]
+
+    monkeypatch.setattr(agent_service, "retrieve_from_kb", duplicate_retrieve)
+    resp = client.post(
+        "/api/v1/agent/qa",
+        headers=headers,
+        json={"session_id": session_id, "query": "尿酸", "kb_ids": ["kb-a", "kb-b"]},
+    )
+
+    assert resp.status_code == 200
+    context = resp.json()["data"]["context"]
+    assert context["kb_hits"] == 1
+    assert context["kb_selection"] == {"candidates": 2, "selected": 1, "duplicates": 1}
+
+
+def test_stage_budget_counts_run_time_not_queue_time(monkeypatch):
+    monkeypatch.setattr(settings, "agent_context_budget_ms", 300)
+    started: dict[str, float] = {}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        submitted_at = time.monotonic()
+        stages = {
+            name: pool.submit(
+                agent_service._run_stage, started, name, time.sleep, seconds
+            )
+            for name, seconds in (("first", 0.2), ("queued", 0.15), ("stuck", 1.0))
+        }
+        done, timed_out = agent_service._wait_stages(stages, started, submitted_at)
+
+    # "queued" ends 0.35s after submit but only 0.15s after it started.
+    assert stages["queued"] in done
+    assert timed_out == ["stuck"]
@@ -0,0 +1,317 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import app.models
+from app.core.config import settings
+from app.core.database import Base, get_db
+from app.main import app as fastapi_app
+from app.models.chat_message import ChatMessage
+from app.services import agent_service
+from app.services.chat_service import add_message, mark_interrupted_streams
+from app.services.runtime_cache import RuntimeDescriptor
+
+_RUNTIME = RuntimeDescriptor(
+    profile_id="p-1",
+    model_id="m-1",
+    model_name="deepseek-chat",
+    supports_vision=False,
+    provider_id="prov-1",
+    provider_name="deepseek",
+    base_url="https://llm.invalid/v1/chat/completions",
+    api_key="sk-test",
+)
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def _stream_events(client: TestClient, headers: dict, payload: dict) -> list[dict]:
+    with client.stream(
+        "POST", "/api/v1/agent/qa/stream", headers=headers, json=payload
+    ) as resp:
+        assert resp.status_code == 200
+        return [
+            json.loads(line[5:])
+            for line in resp.iter_lines()
+            if line.startswith("data:")
+        ]
+
+
+def test_stream_releases_db_session_before_upstream(client: TestClient, monkeypatch):
+    order: list[str] = []
+    original_release = agent_service._release_session
+
+    def spy_release(db):
+        order.append("released")
+        original_release(db)
+
+    async def fake_stream(runtime, system_prompt, messages, *args):
+        order.append("upstream")
+        yield "message", "ok"
+
+    monkeypatch.setattr(agent_service, "_resolve_runtime", lambda *args: _RUNTIME)
+    monkeypatch.setattr(agent_service, "_aiter_provider_stream", fake_stream)
+    monkeypatch.setattr(agent_service, "_release_session", spy_release)
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = client.post(
+        "/api/v1/chat/sessions", headers=headers, json={"title": "stream"}
+    ).json()["data"]["id"]
+
+    events = _stream_events(
+        client, headers, {"session_id": session_id, "query": "hello"}
+    )
+    assert order == ["released", "upstream"]
+    assert events[-1]["type"] == "done"
+
+    messages = client.get(
+        f"/api/v1/chat/sessions/{session_id}/messages", headers=headers
+    ).json()["data"]["items"]
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    assert messages[-1]["id"] == events[-1]["assistant_message_id"]
+
+
+def test_async_provider_stream_parses_openai_sse(monkeypatch):
+    body = (
+        'data: {"choices":[{"delta":{"reasoning_content":"think"}}]}\n\n'
+        'data: {"choices":[{"delta":{"content":"Hel"}}]}\n\n'
+        'data: {"choices":[{"delta":{"content":"lo"}}]}\n\n'
+        "data: [DONE]\n\n"
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(
+            200, content=body, headers={"content-type": "text/event-stream"}
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(agent_service, "get_async_client", lambda url: client)
+
+    async def collect():
+        return [
+            event
+            async for event in agent_service._aiter_provider_stream(
+                _RUNTIME, "", [{"role": "user", "content": "hi"}], None, None, True
+            )
+        ]
+
+    assert asyncio.run(collect()) == [
+        ("reasoning", "think"),
+        ("message", "Hel"),
+        ("message", "lo"),
+    ]
+
+
+def test_closing_the_stream_cancels_upstream(monkeypatch):
+    state = {"closed": False}
+
+    async def endless_stream(runtime, system_prompt, messages, *args):
+        try:
+            while True:
+                yield "message", "tick "
+                await asyncio.sleep(0)
+        finally:
+            state["closed"] = True
+
+    plan = {
+        "ctx": {"system_prompt": "", "trimmed": []},
+        "user_id": "u-1",
+        "reasoning": (None, None, False),
+        "flush_window": 0.0,
+        "runtime": _RUNTIME,
+        "candidates": [_RUNTIME],
+        "cache_ref": None,
+        "cached": None,
+        "error": None,
+        "assistant_message_id": "a-1",
+    }
+    checkpoints: list[tuple[str, str]] = []
+
+    def record_checkpoint(db, message_id, content, reasoning, status):
+        checkpoints.append((status, content))
+
+    monkeypatch.setattr(agent_service, "_open_stream", lambda *args: plan)
+    monkeypatch.setattr(agent_service, "_checkpoint_assistant", record_checkpoint)
+    monkeypatch.setattr(agent_service, "_aiter_provider_stream", endless_stream)
+
+    async def consume_then_disconnect():
+        stream = agent_service.stream_agent_qa(
+            None, None, "s-1", "hi", None, None, None, None, None
+        )
+        start = await stream.__anext__()
+        first = await stream.__anext__()
+        await stream.aclose()
+        return start, first
+
+    start, first = asyncio.run(consume_then_disconnect())
+    agent_service._context_pool.submit(lambda: None).result()
+    assert json.loads(start[5:]) == {"type": "start", "assistant_message_id": "a-1"}
+    assert json.loads(first[5:])["delta"] == "tick "
+    assert state["closed"] is True
+    assert checkpoints[-1] == ("interrupted", "tick ")
+
+
+def test_stream_checkpoints_and_resume(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "stream_checkpoint_chars", 4)
+    checkpoints: list[str] = []
+    original_checkpoint = agent_service._checkpoint_assistant
+
+    def spy_checkpoint(db, message_id, content, reasoning, status):
+        checkpoints.append(status)
+        original_checkpoint(db, message_id, content, reasoning, status)
+
+    async def fake_stream(runtime, system_prompt, messages, *args):
+        for chunk in ("Uric ", "acid ", "is ", "fine."):
+            yield "message", chunk
+
+    monkeypatch.setattr(agent_service, "_resolve_runtime", lambda *args: _RUNTIME)
+    monkeypatch.setattr(agent_service, "_aiter_provider_stream", fake_stream)
+    monkeypatch.setattr(agent_service, "_checkpoint_assistant", spy_checkpoint)
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    # Per-token frames, so every delta reaches the checkpoint logic.
+    session = client.post(
+        "/api/v1/chat/sessions",
+        headers=headers,
+        json={"title": "resume", "stream_flush_ms": 0},
+    ).json()["data"]
+    assert session["stream_flush_ms"] == 0
+    session_id = session["id"]
+
+    events = _stream_events(
+        client, headers, {"session_id": session_id, "query": "uric acid?"}
+    )
+    message_id = events[0]["assistant_message_id"]
+    assert events[0]["type"] == "start"
+    assert checkpoints.count("streaming") >= 2
+
+    with client.stream(
+        "GET",
+        "/api/v1/agent/qa/stream/resume",
+        headers=headers,
+        params={"session_id": session_id, "message_id": message_id, "offset": 5},
+    ) as resp:
+        resumed = [
+            json.loads(line[5:])
+            for line in resp.iter_lines()
+            if line.startswith("data:")
+        ]
+    assert resumed[0] == {"type": "message", "delta": "acid is fine."}
+    assert resumed[-1]["status"] == "done"
+
+    messages = client.get(
+        f"/api/v1/chat/sessions/{session_id}/messages", headers=headers
+    ).json()["data"]["items"]
+    assert messages[-1]["status"] == "done"
+
+    missing = client.get(
+        "/api/v1/agent/qa/stream/resume",
+        headers=headers,
+        params={"session_id": session_id, "message_id": "nope"},
+    )
+    assert missing.status_code == 404
+
+
+def test_upstream_timeout_mid_stream_fails_the_row(client: TestClient, monkeypatch):
+    async def fake_stream(runtime, system_prompt, messages, *args):
+        yield "message", "Uric acid"
+        raise httpx.ReadTimeout("upstream stalled")
+
+    monkeypatch.setattr(agent_service, "_resolve_runtime", lambda *args: _RUNTIME)
+    monkeypatch.setattr(agent_service, "_aiter_provider_stream", fake_stream)
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = client.post(
+        "/api/v1/chat/sessions",
+        headers=headers,
+        json={"title": "timeout", "stream_flush_ms": 0},
+    ).json()["data"]["id"]
+
+    events = _stream_events(
+        client, headers, {"session_id": session_id, "query": "uric acid?"}
+    )
+    assert [event["type"] for event in events] == ["start", "message", "error"]
+    assert "ReadTimeout" in events[-1]["message"]
+
+    messages = client.get(
+        f"/api/v1/chat/sessions/{session_id}/messages", headers=headers
+    ).json()["data"]["items"]
+    assert messages[-1]["id"] == events[0]["assistant_message_id"]
+    assert messages[-1]["status"] == "failed"
+    assert messages[-1]["content"] == "Uric acid"
+
+
+def test_startup_marks_leftover_streams_interrupted():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        db.add(ChatMessage(id="m-1", session_id="s", role="assistant", content="par"))
+        db.add(
+            ChatMessage(
+                id="m-2",
+                session_id="s",
+                role="assistant",
+                content="partial",
+                status="streaming",
+            )
+        )
+        db.commit()
+        assert mark_interrupted_streams(db) == 1
+        assert db.get(ChatMessage, "m-1").status == "done"
+        assert db.get(ChatMessage, "m-2").status == "interrupted"
+
+
+def test_empty_interrupted_answers_are_not_sent_as_history(
+    client: TestClient, monkeypatch
+):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = client.post(
+        "/api/v1/chat/sessions", headers=headers, json={"title": "history"}
+    ).json()["data"]["id"]
+    db = next(fastapi_app.dependency_overrides[get_db]())
+    user_id = db.query(app.models.User).one().id
+    add_message(db, session_id=session_id, user_id=user_id, role="user", content="q1")
+    add_message(
+        db,
+        session_id=session_id,
+        user_id=user_id,
+        role="assistant",
+        content="",
+        status="interrupted",
+    )
+    db.close()
+
+    captured: dict = {}
+    original_pack = agent_service.pack_context
+
+    def spy_pack(**kwargs):
+        captured.update(kwargs)
+        return original_pack(**kwargs)
+
+    monkeypatch.setattr(agent_service, "pack_context", spy_pack)
+    resp = client.post(
+        "/api/v1/agent/qa",
+        headers=headers,
+        json={"session_id": session_id, "query": "q2"},
+    )
+    assert resp.status_code == 200
+    assert [item["role"] for item in captured["history"]] == ["user", "user"]
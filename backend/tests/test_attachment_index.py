@@ -0,0 +1,118 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import agent_service, attachment_index
+
+_FILLER = "Routine follow-up notes about sleep, steps and hydration were unremarkable."
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def _long_report() -> str:
+    paragraphs = [f"Section {idx}. {_FILLER}" for idx in range(40)]
+    paragraphs.insert(
+        33, "Uric acid was 520 umol/L; gout risk is high, review allopurinol."
+    )
+    return "\n\n".join(paragraphs)
+
+
+def test_split_offsets_match_file_bytes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "attachment_passage_chars", 40)
+    text = "第一段：血压偏高，需要复查。\n\n" + "Second paragraph " * 6 + "\n尾注"
+    path = tmp_path / "report.md"
+    path.write_bytes(text.encode("utf-8"))
+
+    passages = attachment_index._split(text, 40)
+    assert len(passages) > 2
+    raw = path.read_bytes()
+    for start, end, body in passages:
+        assert raw[start:end].decode("utf-8") == body
+    assert "".join(body for _, _, body in passages).strip() == text.strip()
+
+
+def _passage_texts(*args, **kwargs) -> list[str]:
+    return [
+        item["text"] for item in attachment_index.select_passage_spans(*args, **kwargs)
+    ]
+
+
+def test_selection_prefers_relevant_passages_within_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "attachment_passage_chars", 200)
+    attachment_index.clear()
+    path = tmp_path / "report.md"
+    path.write_text(_long_report(), encoding="utf-8")
+
+    texts = _passage_texts(
+        "s-1", [("a-1", str(path))], "uric acid and gout", token_budget=120
+    )
+    assert len(texts) == 1
+    assert "Uric acid was 520" in texts[0].split("\n...\n")[0]
+    assert len(texts[0]) < len(_long_report()) // 3
+
+    # Without a query the document opening is used.
+    [opening] = _passage_texts("s-1", [("a-1", str(path))], "", token_budget=60)
+    assert opening.startswith("Section 0.")
+
+
+def test_index_is_rebuilt_when_the_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "attachment_passage_chars", 200)
+    attachment_index.clear()
+    path = tmp_path / "report.md"
+    path.write_text("Blood pressure 150/95.", encoding="utf-8")
+    attachment_index.index_attachment("s-2", "a-2", path)
+    path.write_text("Fasting glucose 7.2 mmol/L, recheck HbA1c.", encoding="utf-8")
+
+    [text] = _passage_texts("s-2", [("a-2", str(path))], "glucose", token_budget=100)
+    assert text == "Fasting glucose 7.2 mmol/L, recheck HbA1c."
+
+
+def test_agent_uses_relevant_attachment_passages(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "attachment_passage_chars", 200)
+    monkeypatch.setattr(settings, "agent_context_token_budget", 400)
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = client.post(
+        "/api/v1/chat/sessions", json={"title": "attachments"}, headers=headers
+    ).json()["data"]["id"]
+    upload = client.post(
+        f"/api/v1/chat/sessions/{session_id}/attachments",
+        headers=headers,
+        files={"file": ("report.txt", _long_report().encode("utf-8"), "text/plain")},
+    )
+    assert upload.status_code == 200
+    attachment_id = upload.json()["data"]["id"]
+
+    captured = {}
+    original_pack = agent_service.pack_context
+
+    def _capture(**kwargs):
+        captured["attachment_texts"] = kwargs["attachment_texts"]
+        return original_pack(**kwargs)
+
+    monkeypatch.setattr(agent_service, "pack_context", _capture)
+    resp = client.post(
+        "/api/v1/agent/qa",
+        headers=headers,
+        json={
+            "session_id": session_id,
+            "query": "Is my uric acid a gout risk?",
+            "attachments_ids": [attachment_id],
+        },
+    )
+    assert resp.status_code == 200
+    [text] = captured["attachment_texts"]
+    assert "Uric acid was 520" in text.split("\n...\n")[0]
+    assert "Section 0." not in text
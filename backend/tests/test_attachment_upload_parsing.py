@@ -92,3 +92,27 @@ def test_upload_attachment_with_invalid_windows_filename(client: TestClient):
         files={"file": ("bad:name?.txt", "safe content".encode("utf-8"), "text/plain")},
     )
     assert upload_resp.status_code == 200
+
+
+def test_kb_ingest_extraction_failure_is_reported(client: TestClient, monkeypatch):
+    from app.api.v1 import chat as chat_api
+    from app.services.extraction_worker import ExtractionError
+
+    def failing_extract(file_name, file_bytes):
+        raise ExtractionError(9001, "Text extraction exceeded 60s", "timeout")
+
+    monkeypatch.setattr(chat_api, "extract_text_cached", failing_extract)
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = client.post(
+        "/api/v1/chat/sessions", json={"title": "kb-ingest"}, headers=headers
+    ).json()["data"]["id"]
+
+    upload_resp = client.post(
+        f"/api/v1/chat/sessions/{session_id}/attachments",
+        headers=headers,
+        data={"kb_mode": "kb", "kb_id": "kb-1"},
+        files={"file": ("notes.txt", b"ALT 56 U/L", "text/plain")},
+    )
+    assert upload_resp.status_code == 400
+    assert upload_resp.json()["code"] == 4002
@@ -0,0 +1,104 @@
+from app.services.context_packer import (
+    estimate_tokens,
+    pack_context,
+    select_diverse_hits,
+)
+from app.services.text_similarity import jaccard, shingles
+
+
+def _turns(count: int, size: int) -> list[dict]:
+    return [
+        {"role": "user" if idx % 2 == 0 else "assistant", "content": f"{idx}" * size}
+        for idx in range(count)
+    ]
+
+
+def test_estimate_tokens_counts_cjk_per_char():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("尿酸偏高") == 4
+    assert estimate_tokens("abcdefgh") == 2
+
+
+def test_pack_keeps_current_turn_and_newest_contiguous_history():
+    history = _turns(9, 400)
+    packed = pack_context(
+        system_prompt="sys",
+        history=history,
+        mcp_results=[],
+        kb_hits=[],
+        attachment_texts=[],
+        budget=450,
+    )
+    kept = packed["history"]
+    assert kept[-1] == history[-1]
+    assert kept == history[-len(kept) :]
+    assert 1 < len(kept) < len(history)
+    dropped_history = [d for d in packed["report"]["dropped"] if d["kind"] == "history"]
+    assert len(dropped_history) == len(history) - len(kept)
+    assert packed["report"]["used"] <= 450
+
+
+def test_pack_truncates_large_attachment_and_reports_drops():
+    packed = pack_context(
+        system_prompt="",
+        history=[{"role": "user", "content": "总结附件"}],
+        mcp_results=[],
+        kb_hits=[{"text": "k" * 4000, "score": {"total": 0.9}}],
+        attachment_texts=["a" * 40000],
+        budget=1000,
+    )
+    assert packed["attachment_texts"][0].endswith("...[truncated]")
+    assert packed["report"]["used"] <= 1000
+    truncated_kinds = {item["kind"] for item in packed["report"]["truncated"]}
+    assert "attachment" in truncated_kinds or "kb" in truncated_kinds
+
+
+def test_pack_dedupes_repeated_user_turns():
+    history = [
+        {"role": "user", "content": "hello"},
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+        {"role": "user", "content": "next"},
+    ]
+    packed = pack_context("", history, [], [], [], budget=1000)
+    assert [item["content"] for item in packed["history"]] == ["hello", "hi", "next"]
+
+
+def _hit(text: str, total: float, kb_id: str = "kb-a") -> dict:
+    return {"text": text, "kb_id": kb_id, "score": {"total": total}}
+
+
+def test_shingle_similarity_spots_overlap():
+    base = "Uric acid above 420 umol/L suggests hyperuricemia; limit purines."
+    assert jaccard(shingles(base), shingles(base.upper())) == 1.0
+    overlap = jaccard(shingles(base), shingles(base[20:] + " Drink water."))
+    assert 0.3 < overlap < 1.0
+    assert jaccard(shingles(base), shingles("血压偏高需要复查")) == 0.0
+
+
+def test_diverse_selection_drops_duplicates_and_demotes_overlap():
+    gout = (
+        "Uric acid above 420 umol/L suggests hyperuricemia; limit purines and alcohol."
+    )
+    hits = [
+        _hit(gout, 0.9),
+        _hit(gout, 0.9, kb_id="kb-b"),
+        _hit(gout[:60] + " Recheck in three months.", 0.85),
+        _hit("Blood pressure over 140/90 on repeated readings needs review.", 0.6),
+    ]
+    selected, report = select_diverse_hits(
+        hits, budget=1000, mmr_lambda=0.5, duplicate_threshold=0.9
+    )
+    assert report == {"candidates": 4, "selected": 3, "duplicates": 1}
+    assert [hit["score"]["total"] for hit in selected] == [0.9, 0.6, 0.85]
+
+
+def test_diverse_selection_stops_at_budget():
+    hits = [
+        _hit(f"{idx} " + "different words " * 20 + str(idx), 1.0) for idx in range(5)
+    ]
+    selected, report = select_diverse_hits(
+        hits, budget=100, mmr_lambda=0.7, duplicate_threshold=0.99
+    )
+    assert 1 <= len(selected) < 5
+    assert report["selected"] == len(selected)
@@ -0,0 +1,157 @@
+from datetime import UTC, datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import app.models  # noqa: F401
+from app.core.config import settings
+from app.core.database import Base
+from app.models.chat_message import ChatMessage
+from app.models.chat_session import ChatSession
+from app.services import agent_service, conversation_summary_service
+from app.services.conversation_summary_service import refresh_session_summary
+
+
+def _seed_session(db: Session, message_count: int, window: int) -> ChatSession:
+    session = ChatSession(
+        id="s-1", user_id="u-1", title="long", context_message_limit=window
+    )
+    db.add(session)
+    start = datetime(2026, 1, 1, tzinfo=UTC)
+    for idx in range(message_count):
+        db.add(
+            ChatMessage(
+                id=f"m-{idx}",
+                session_id=session.id,
+                role="user" if idx % 2 == 0 else "assistant",
+                content=f"turn {idx}",
+                created_at=start + timedelta(seconds=idx),
+            )
+        )
+    db.commit()
+    return session
+
+
+def test_refresh_folds_messages_older_than_window(monkeypatch):
+    monkeypatch.setattr(settings, "chat_summary_trigger_messages", 4)
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    batches: list[list[str]] = []
+
+    def fake_summarize(db, session, previous, messages):
+        batches.append([m.content for m in messages])
+        return (previous + " " + ",".join(m.content for m in messages)).strip()
+
+    with Session(bind=engine) as db:
+        _seed_session(db, message_count=11, window=3)
+        assert refresh_session_summary(db, "s-1", summarize=fake_summarize)
+        session = db.get(ChatSession, "s-1")
+        assert [len(batch) for batch in batches] == [4, 4]
+        assert session.summary.endswith("turn 7")
+        assert session.summary_until_at.replace(tzinfo=None) == datetime(
+            2026, 1, 1, 0, 0, 7
+        )
+        assert not refresh_session_summary(db, "s-1", summarize=fake_summarize)
+
+
+def test_extractive_summary_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "chat_summary_max_chars", 50)
+    messages = [ChatMessage(role="user", content="x" * 500) for _ in range(5)]
+    summary = conversation_summary_service.extractive_summary(None, None, "", messages)
+    assert len(summary) <= 60
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def test_summary_is_built_in_background_and_injected(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "chat_summary_trigger_messages", 2)
+    monkeypatch.setattr(
+        conversation_summary_service,
+        "llm_summary",
+        conversation_summary_service.extractive_summary,
+    )
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = client.post(
+        "/api/v1/chat/sessions",
+        headers=headers,
+        json={"title": "summary", "context_message_limit": 2},
+    ).json()["data"]["id"]
+
+    for idx in range(3):
+        resp = client.post(
+            "/api/v1/agent/qa",
+            headers=headers,
+            json={"session_id": session_id, "query": f"问题 {idx}"},
+        )
+        assert resp.status_code == 200
+    conversation_summary_service._executor.submit(lambda: None).result()
+
+    captured: dict = {}
+    original_pack = agent_service.pack_context
+
+    def spy_pack(**kwargs):
+        captured.update(kwargs)
+        return original_pack(**kwargs)
+
+    monkeypatch.setattr(agent_service, "pack_context", spy_pack)
+    resp = client.post(
+        "/api/v1/agent/qa",
+        headers=headers,
+        json={"session_id": session_id, "query": "继续"},
+    )
+    assert resp.status_code == 200
+    assert "Summary of earlier conversation:" in captured["system_prompt"]
+    assert "问题 0" in captured["system_prompt"]
+    assert len(captured["history"]) <= 4
+
+
+def test_history_reaches_back_to_the_summary_trigger(monkeypatch):
+    monkeypatch.setattr(settings, "chat_summary_trigger_messages", 4)
+    session = ChatSession(id="s-1", user_id="u-1", context_message_limit=3)
+    assert conversation_summary_service.history_limit(session) == 7
+    monkeypatch.setattr(settings, "chat_summary_enabled", False)
+    assert conversation_summary_service.history_limit(session) == 3
+
+
+def test_failed_refresh_is_logged(monkeypatch, caplog):
+    def broken_refresh(db, session_id):
+        raise RuntimeError("summarizer down")
+
+    monkeypatch.setattr(
+        conversation_summary_service, "refresh_session_summary", broken_refresh
+    )
+    engine = create_engine("sqlite:///:memory:", future=True)
+    conversation_summary_service._inflight.add("s-1")
+    conversation_summary_service._run_refresh(Session(bind=engine), "s-1")
+    assert "s-1" not in conversation_summary_service._inflight
+    assert "summary refresh failed for s-1" in caplog.text
+    assert "summarizer down" in caplog.text
+
+
+def test_llm_summary_failure_is_logged_before_fallback(monkeypatch, caplog):
+    def broken_complete(*args, **kwargs):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(agent_service, "complete_text", broken_complete)
+    session = ChatSession(id="s-1", user_id="u-1", context_message_limit=3)
+    messages = [ChatMessage(role="user", content="uric acid 420")]
+    with caplog.at_level("WARNING"):
+        summary = conversation_summary_service.llm_summary(None, session, "", messages)
+    assert "uric acid 420" in summary
+    assert "LLM summary failed for s-1" in caplog.text
+    assert "provider down" in caplog.text
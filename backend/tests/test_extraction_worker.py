@@ -0,0 +1,105 @@
+import os
+import time
+
+import pytest
+
+from app.services import extraction_worker
+from app.services.extraction_worker import (
+    ExtractionError,
+    ExtractionWorkerPool,
+    _rss_bytes,
+)
+from app.services.file_text_extract import extract_text_from_file
+
+_MIB = 1024 * 1024
+
+
+def _hang_on_request(file_name: str, file_bytes: bytes) -> str:
+    if file_name == "hang.pdf":
+        time.sleep(60)
+    return extract_text_from_file(file_name, file_bytes)
+
+
+def _hold_memory(file_name: str, file_bytes: bytes) -> str:
+    if file_name == "big.pdf":
+        # Filled bytes, so the allocation shows up as resident memory.
+        ballast = [b"x" * (16 * _MIB) for _ in range(32)]
+        time.sleep(60)
+        return str(len(ballast))
+    return extract_text_from_file(file_name, file_bytes)
+
+
+def test_worker_pool_extracts_and_recycles_workers():
+    pool = ExtractionWorkerPool(
+        size=1, max_jobs_per_worker=1, timeout_seconds=30, max_rss_bytes=0
+    )
+    try:
+        assert pool.run("note.txt", "尿酸 420".encode()) == "尿酸 420"
+        assert pool.run("note.md", b"# title") == "# title"
+    finally:
+        pool.close()
+
+
+def test_worker_pool_reports_structured_failures():
+    pool = ExtractionWorkerPool(
+        size=1, max_jobs_per_worker=10, timeout_seconds=30, max_rss_bytes=0
+    )
+    try:
+        with pytest.raises(ExtractionError) as exc_info:
+            pool.run("broken.docx", b"not a zip archive")
+        assert exc_info.value.kind == "error"
+        assert exc_info.value.code == 9004
+        assert pool.run("ok.txt", b"still alive") == "still alive"
+    finally:
+        pool.close()
+
+
+def test_worker_pool_kills_jobs_past_the_timeout():
+    pool = ExtractionWorkerPool(
+        size=1,
+        max_jobs_per_worker=10,
+        timeout_seconds=1,
+        max_rss_bytes=0,
+        extract=_hang_on_request,
+    )
+    try:
+        started = time.monotonic()
+        with pytest.raises(ExtractionError) as exc_info:
+            pool.run("hang.pdf", b"%PDF-1.4")
+        assert exc_info.value.kind == "timeout"
+        assert exc_info.value.code == 9001
+        assert time.monotonic() - started < 10
+        assert pool.run("ok.txt", b"next job") == "next job"
+    finally:
+        pool.close()
+
+
+@pytest.mark.skipif(
+    _rss_bytes(os.getpid()) is None, reason="resident memory is not readable here"
+)
+def test_worker_pool_enforces_memory_limit():
+    pool = ExtractionWorkerPool(
+        size=1,
+        max_jobs_per_worker=10,
+        timeout_seconds=30,
+        max_rss_bytes=256 * _MIB,
+        extract=_hold_memory,
+    )
+    try:
+        # An idle worker sits well under the limit.
+        assert pool.run("ok.txt", b"small") == "small"
+        with pytest.raises(ExtractionError) as exc_info:
+            pool.run("big.pdf", b"%PDF-1.4")
+        assert exc_info.value.kind == "memory"
+        assert exc_info.value.code == 9002
+    finally:
+        pool.close()
+
+
+def test_unreadable_rss_is_logged(monkeypatch, caplog):
+    monkeypatch.setattr(extraction_worker, "_rss_bytes", lambda pid: None)
+    with caplog.at_level("WARNING", logger=extraction_worker.__name__):
+        ExtractionWorkerPool(
+            size=1, max_jobs_per_worker=1, timeout_seconds=1, max_rss_bytes=_MIB
+        ).close()
+    assert "memory limit is not enforced" in caplog.text
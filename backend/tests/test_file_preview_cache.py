@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import extraction_cache
+from app.services.extraction_cache import extract_text_cached
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def test_extract_preview_uses_content_hash_cache(
+    client: TestClient, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "data_root", str(tmp_path))
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = "血常规 ALT 56 U/L".encode()
+
+    first = client.post(
+        "/api/v1/file-preview/extract",
+        headers=headers,
+        files={"file": ("lab.txt", payload, "text/plain")},
+    )
+    assert first.status_code == 200
+    assert first.headers["X-Extract-Cache"] == "miss"
+
+    second = client.post(
+        "/api/v1/file-preview/extract",
+        headers=headers,
+        files={"file": ("lab-copy.txt", payload, "text/plain")},
+    )
+    assert second.status_code == 200
+    assert second.headers["X-Extract-Cache"] == "hit"
+    assert second.json()["data"]["text"] == first.json()["data"]["text"]
+
+
+def test_extract_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_root", str(tmp_path))
+    monkeypatch.setattr(settings, "extract_cache_max_bytes", 40)
+
+    assert extract_text_cached("a.txt", b"a" * 30) == ("a" * 30, False)
+    assert extract_text_cached("b.txt", b"b" * 30) == ("b" * 30, False)
+    assert extract_text_cached("b.txt", b"b" * 30)[1] is True
+    assert extract_text_cached("a.txt", b"a" * 30)[1] is False
+
+
+def test_extract_cache_tracks_size_without_rescanning(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_root", str(tmp_path))
+    monkeypatch.setattr(settings, "extract_cache_max_bytes", 1000)
+    scans: list[int] = []
+    original_scan = extraction_cache._scan
+
+    def counting_scan(root):
+        scans.append(1)
+        return original_scan(root)
+
+    monkeypatch.setattr(extraction_cache, "_scan", counting_scan)
+    for index in range(5):
+        extract_text_cached(f"{index}.txt", str(index).encode() * 10)
+    assert len(scans) <= 1
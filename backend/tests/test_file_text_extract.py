@@ -0,0 +1,98 @@
+import codecs
+import zipfile
+from io import BytesIO
+
+import openpyxl
+
+from app.services.file_text_extract import (
+    decode_text_with_fallback,
+    detect_text_encoding,
+    extract_text_from_file,
+    iter_decoded_text,
+)
+
+
+def _build_pdf(page_texts: list[str]) -> bytes:
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for idx, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{idx} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def test_text_encoding_detected_from_bom_or_sample():
+    gbk_log = ("化验单 尿酸偏高\n" * 20000).encode("gb18030")
+    assert detect_text_encoding(gbk_log) == "gb18030"
+    assert decode_text_with_fallback(gbk_log) == gbk_log.decode("gb18030")
+
+    assert detect_text_encoding(codecs.BOM_UTF8 + b"abc") == "utf-8-sig"
+    assert decode_text_with_fallback(codecs.BOM_UTF8 + b"abc") == "abc"
+    assert decode_text_with_fallback("血压 120/80".encode("utf-16")) == "血压 120/80"
+
+
+def test_streaming_decode_matches_full_decode():
+    payload = ("血糖 5.6 mmol/L; " * 5000).encode("utf-8")
+    pieces = list(iter_decoded_text(payload, chunk_size=1001))
+    assert len(pieces) > 1
+    assert "".join(pieces) == payload.decode("utf-8")
+
+
+def test_pdf_pages_are_extracted_in_order():
+    pages = [f"page {idx}" for idx in range(12)]
+    pdf_bytes = _build_pdf(pages)
+
+    assert extract_text_from_file("summary.pdf", pdf_bytes) == "\n".join(pages)
+
+
+def test_docx_paragraphs_are_streamed_line_by_line():
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        "<w:body><w:p><w:r><w:t>出院小结</w:t></w:r></w:p>"
+        "<w:tbl><w:tr><w:tc><w:p><w:r><w:t>ALT</w:t></w:r><w:r><w:tab/>"
+        "<w:t>56 U/L</w:t></w:r></w:p></w:tc></w:tr></w:tbl>"
+        "<w:p/></w:body></w:document>"
+    )
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("word/document.xml", xml)
+
+    assert (
+        extract_text_from_file("report.docx", buf.getvalue()) == "出院小结\nALT 56 U/L"
+    )
+
+
+def test_xlsx_rows_are_read_in_read_only_mode():
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for idx in range(1200):
+        sheet.append(["ALT", idx, None, "U/L"])
+    buf = BytesIO()
+    workbook.save(buf)
+
+    lines = extract_text_from_file("labs.xlsx", buf.getvalue()).splitlines()
+    assert len(lines) == 1200
+    assert lines[0] == "ALT\t0\tU/L"
+    assert lines[-1] == "ALT\t1199\tU/L"
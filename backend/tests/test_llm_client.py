@@ -0,0 +1,39 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.llm_client import (
+    close_llm_clients,
+    get_async_client,
+    get_sync_client,
+    provider_timeout,
+)
+
+
+def test_sync_client_is_shared_per_origin():
+    first = get_sync_client("https://api.example.com/v1/chat/completions")
+    second = get_sync_client("https://API.example.com/v1/models")
+    other = get_sync_client("https://other.example.com/v1/models")
+    assert first is second
+    assert first is not other
+
+
+def test_async_clients_are_scoped_to_running_loop():
+    async def _grab():
+        client = get_async_client("https://api.example.com/v1/chat/completions")
+        assert client is get_async_client("https://api.example.com/v1/models")
+        await close_llm_clients()
+        return client
+
+    client = asyncio.run(_grab())
+    assert client.is_closed
+
+
+def test_provider_timeout_applies_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "llm_provider_timeouts", {"gemini": 300.0})
+    assert provider_timeout("gemini-pro", stream=True).read == 300.0
+    default = provider_timeout("deepseek")
+    assert default.read == settings.llm_read_timeout_seconds
+    assert default.connect == settings.llm_connect_timeout_seconds
+    assert provider_timeout("deepseek", stream=True).read == (
+        settings.llm_stream_read_timeout_seconds
+    )
@@ -0,0 +1,178 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import agent_service, llm_metrics
+from app.services.chat_service import ChatError
+from app.services.runtime_cache import RuntimeDescriptor
+
+_RUNTIME = RuntimeDescriptor(
+    profile_id="p-1",
+    model_id="model-metrics",
+    model_name="deepseek-chat",
+    supports_vision=False,
+    provider_id="prov-metrics",
+    provider_name="deepseek",
+    base_url="https://llm.invalid/v1/chat/completions",
+    api_key="sk-test",
+)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_metrics():
+    llm_metrics.clear()
+    yield
+    llm_metrics.clear()
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def _sample(total_ms: float, error_class: str | None = None) -> llm_metrics.Sample:
+    return llm_metrics.Sample(
+        at=time.monotonic(),
+        stream=True,
+        total_ms=total_ms,
+        connect_ms=None,
+        ttft_ms=total_ms / 2,
+        output_tokens=100,
+        tokens_per_second=50.0,
+        error_class=error_class,
+    )
+
+
+def test_error_classes():
+    assert llm_metrics.classify_error(ChatError(7006, "failed: HTTP 429")) == (
+        "http_429"
+    )
+    assert llm_metrics.classify_error(ChatError(7008, "content missing")) == (
+        "bad_response"
+    )
+    assert llm_metrics.classify_error(httpx.ReadTimeout("slow")) == "timeout"
+    assert llm_metrics.classify_error(asyncio.CancelledError()) == "cancelled"
+
+
+def test_snapshot_aggregates_rolling_samples():
+    for total in (80, 300, 300, 4000):
+        llm_metrics.record("m-1", "prov-1", "deepseek", "deepseek-chat", _sample(total))
+    llm_metrics.record(
+        "m-1", "prov-1", "deepseek", "deepseek-chat", _sample(50, "http_429")
+    )
+    llm_metrics.record(
+        "m-1", "prov-1", "deepseek", "deepseek-chat", _sample(10, "cancelled")
+    )
+
+    [item] = llm_metrics.snapshot({"m-1"})
+    assert item["samples"] == 6
+    assert item["errors"] == 1
+    assert item["error_classes"] == {"http_429": 1}
+    assert item["error_rate"] == 0.2
+    assert item["total_ms"]["p50"] == 300
+    assert item["total_ms"]["histogram"]["100"] == 1
+    assert item["total_ms"]["histogram"]["500"] == 2
+    assert item["total_ms"]["histogram"]["5000"] == 1
+    assert item["tokens_per_second"]["p50"] == 50.0
+    assert llm_metrics.snapshot({"other"}) == []
+
+
+def test_stream_records_ttft_and_throughput(monkeypatch):
+    body = (
+        'data: {"choices":[{"delta":{"content":"Hello there"}}]}\n\n'
+        'data: {"choices":[{"delta":{"content":" and welcome"}}]}\n\n'
+        "data: [DONE]\n\n"
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, content=body, headers={"content-type": "text/event-stream"}
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(agent_service, "get_async_client", lambda url: client)
+
+    async def collect():
+        return [
+            event
+            async for event in agent_service._aiter_provider_stream(
+                _RUNTIME, "", [{"role": "user", "content": "hi"}], None, None, False
+            )
+        ]
+
+    asyncio.run(collect())
+    [item] = llm_metrics.snapshot({"model-metrics"})
+    assert item["provider_id"] == "prov-metrics"
+    assert item["errors"] == 0
+    assert item["ttft_ms"]["count"] == 1
+    assert item["total_ms"]["count"] == 1
+
+
+def test_failed_call_records_error_class(monkeypatch):
+    def failing(**kwargs):
+        raise ChatError(7006, "LLM request failed: HTTP 503 unavailable")
+
+    monkeypatch.setattr(agent_service, "_openai_nonstream", failing)
+    with pytest.raises(ChatError):
+        agent_service._call_provider(_RUNTIME, "", [], None, None, False)
+
+    [item] = llm_metrics.snapshot({"model-metrics"})
+    assert item["error_classes"] == {"http_503": 1}
+    assert item["ttft_ms"] is None
+
+
+def test_catalog_exposes_metrics_summary(client: TestClient):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    provider_id = client.post(
+        "/api/v1/model-providers",
+        json={
+            "provider_name": "gemini",
+            "base_url": "https://example.local/gemini",
+            "api_key": "secret",
+            "enabled": True,
+        },
+        headers=headers,
+    ).json()["data"]["id"]
+    client.post(
+        f"/api/v1/model-providers/{provider_id}/refresh-models",
+        json={"manual_models": ["gemini-custom"]},
+        headers=headers,
+    )
+    items = client.get("/api/v1/model-catalog", headers=headers).json()["data"]["items"]
+    model = next(item for item in items if item["model_type"] == "llm")
+    assert model["metrics"] is None
+
+    llm_metrics.record(
+        model["id"], provider_id, "gemini", model["model_name"], _sample(900)
+    )
+    llm_metrics.record("not-mine", "prov-x", "gemini", "other", _sample(100))
+
+    items = client.get("/api/v1/model-catalog", headers=headers).json()["data"]["items"]
+    summary = next(item for item in items if item["id"] == model["id"])["metrics"]
+    assert summary == {
+        "samples": 1,
+        "ttft_p50_ms": 450.0,
+        "total_p50_ms": 900.0,
+        "tokens_per_second_p50": 50.0,
+        "error_rate": 0.0,
+    }
+
+    metrics_resp = client.get("/api/v1/model-catalog/metrics", headers=headers)
+    assert metrics_resp.status_code == 200
+    data = metrics_resp.json()["data"]
+    assert [item["model_id"] for item in data["items"]] == [model["id"]]
+    assert data["latency_buckets_ms"][0] == 100
@@ -0,0 +1,123 @@
+from fastapi.testclient import TestClient
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def _setup(client: TestClient, headers: dict) -> dict:
+    kb_id = client.post(
+        "/api/v1/knowledge-bases",
+        headers=headers,
+        json={"name": "kb-sources", "chunk_size": 400, "chunk_overlap": 50},
+    ).json()["data"]["id"]
+    build_resp = client.post(
+        f"/api/v1/knowledge-bases/{kb_id}/build",
+        headers=headers,
+        json={
+            "documents": [{"title": "doc1", "content": "尿酸偏高应减少高嘌呤食物。"}]
+        },
+    )
+    assert build_resp.status_code == 200
+
+    mcp_id = client.post(
+        "/api/v1/mcp/servers",
+        headers=headers,
+        json={
+            "name": "tool-a",
+            "endpoint": "mock://tool-a",
+            "auth_type": "none",
+            "enabled": True,
+            "timeout_ms": 8000,
+        },
+    ).json()["data"]["id"]
+
+    session_id = client.post(
+        "/api/v1/chat/sessions", headers=headers, json={"title": "sources"}
+    ).json()["data"]["id"]
+    attachment_id = client.post(
+        f"/api/v1/chat/sessions/{session_id}/attachments",
+        headers=headers,
+        files={"file": ("labs.txt", "尿酸 520 umol/L，偏高。".encode(), "text/plain")},
+    ).json()["data"]["id"]
+    return {
+        "kb_id": kb_id,
+        "mcp_id": mcp_id,
+        "session_id": session_id,
+        "attachment_id": attachment_id,
+    }
+
+
+def test_answer_sources_are_persisted_and_expanded_lazily(client: TestClient):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = _setup(client, headers)
+    session_id = ids["session_id"]
+
+    qa_resp = client.post(
+        "/api/v1/agent/qa",
+        headers=headers,
+        json={
+            "session_id": session_id,
+            "query": "尿酸偏高怎么办",
+            "kb_ids": [ids["kb_id"]],
+            "enabled_mcp_ids": [ids["mcp_id"]],
+            "attachments_ids": [ids["attachment_id"]],
+        },
+    )
+    assert qa_resp.status_code == 200
+    qa_data = qa_resp.json()["data"]
+    assert {item["type"] for item in qa_data["citations"]} == {"kb", "attachment"}
+
+    items = client.get(
+        f"/api/v1/chat/sessions/{session_id}/messages", headers=headers
+    ).json()["data"]["items"]
+    user_msg, answer = items
+    assert user_msg["citations"] == [] and user_msg["tool_calls"] == []
+    kb_citation = next(item for item in answer["citations"] if item["type"] == "kb")
+    assert kb_citation["kb_id"] == ids["kb_id"]
+    assert kb_citation["chunk_id"] and kb_citation["document_id"]
+    assert kb_citation["score"] > 0
+    assert "text" not in kb_citation
+    [tool_call] = answer["tool_calls"]
+    assert tool_call["server_name"] == "tool-a"
+    assert tool_call["output_chars"] > 0
+    assert "output" not in tool_call
+
+    sources_resp = client.get(
+        f"/api/v1/chat/sessions/{session_id}/messages/{answer['id']}/sources",
+        headers=headers,
+    )
+    assert sources_resp.status_code == 200
+    sources = sources_resp.json()["data"]
+    by_type = {item["type"]: item for item in sources["citations"]}
+    assert by_type["kb"]["available"] is True
+    assert "尿酸" in by_type["kb"]["text"]
+    assert by_type["attachment"]["file_name"] == "labs.txt"
+    assert by_type["attachment"]["passages"] == ["尿酸 520 umol/L，偏高。"]
+    assert sources["tool_calls"][0]["output"].startswith("[tool-a]")
+
+
+def test_sources_of_missing_message_return_404(client: TestClient):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = client.post(
+        "/api/v1/chat/sessions", headers=headers, json={"title": "sources"}
+    ).json()["data"]["id"]
+    resp = client.get(
+        f"/api/v1/chat/sessions/{session_id}/messages/missing/sources",
+        headers=headers,
+    )
+    assert resp.status_code == 404
+    assert resp.json()["code"] == 4007
@@ -0,0 +1,191 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import agent_service
+from app.services.chat_service import ChatError
+from app.services.runtime_cache import RuntimeDescriptor
+
+
+def _runtime(profile_id: str, **params) -> RuntimeDescriptor:
+    return RuntimeDescriptor(
+        profile_id=profile_id,
+        model_id=f"m-{profile_id}",
+        model_name="deepseek-chat",
+        supports_vision=False,
+        provider_id=f"prov-{profile_id}",
+        provider_name="deepseek",
+        base_url=f"https://{profile_id}.invalid/v1/chat/completions",
+        api_key="sk-test",
+        params=params,
+    )
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def test_failover_to_next_profile_on_error(monkeypatch):
+    calls: list[str] = []
+
+    def fake_call(runtime, *args):
+        calls.append(runtime.profile_id)
+        if runtime.profile_id == "primary":
+            raise ChatError(7006, "LLM request failed: HTTP 503")
+        return "answer", ""
+
+    monkeypatch.setattr(agent_service, "_call_provider", fake_call)
+    answer, _, route = agent_service._call_with_failover(
+        [_runtime("primary"), _runtime("backup")], "", [], None, None, False
+    )
+    assert answer == "answer"
+    assert calls == ["primary", "backup"]
+    assert route["profile_id"] == "backup"
+    assert route["attempts"] == 2
+    assert route["hedged"] is False
+
+
+def test_failover_raises_last_error_when_all_fail(monkeypatch):
+    def fake_call(runtime, *args):
+        raise ChatError(7006, f"down: {runtime.profile_id}")
+
+    monkeypatch.setattr(agent_service, "_call_provider", fake_call)
+    with pytest.raises(ChatError, match="down: backup"):
+        agent_service._call_with_failover(
+            [_runtime("primary"), _runtime("backup")], "", [], None, None, False
+        )
+
+
+def test_hedged_call_keeps_first_responder(monkeypatch):
+    def fake_call(runtime, *args):
+        if runtime.profile_id == "primary":
+            time.sleep(0.5)
+            return "slow", ""
+        return "fast", ""
+
+    monkeypatch.setattr(agent_service, "_call_provider", fake_call)
+    answer, _, route = agent_service._call_with_failover(
+        [_runtime("primary", hedge_delay_ms=20), _runtime("backup")],
+        "",
+        [],
+        None,
+        None,
+        False,
+    )
+    assert answer == "fast"
+    assert route["profile_id"] == "backup"
+    assert route["hedged"] is True
+
+
+def test_hedged_stream_cancels_slower_candidate(monkeypatch):
+    closed: list[str] = []
+
+    async def fake_stream(runtime, *args):
+        try:
+            if runtime.profile_id == "primary":
+                await asyncio.sleep(5)
+            for chunk in ("from ", runtime.profile_id):
+                yield "message", chunk
+        finally:
+            closed.append(runtime.profile_id)
+
+    monkeypatch.setattr(agent_service, "_aiter_provider_stream", fake_stream)
+
+    async def consume() -> tuple[list, dict]:
+        route: dict = {}
+        events = agent_service._aiter_failover_stream(
+            [_runtime("primary", hedge_delay_ms=20), _runtime("backup")],
+            route,
+            "",
+            [],
+            None,
+            None,
+            False,
+        )
+        out = [event async for event in events]
+        await asyncio.sleep(0)
+        return out, route
+
+    events, route = asyncio.run(consume())
+    assert events == [("message", "from "), ("message", "backup")]
+    assert route["profile_id"] == "backup"
+    assert route["hedged"] is True
+    assert "primary" in closed
+
+
+def test_stream_fails_over_before_first_token(monkeypatch):
+    async def fake_stream(runtime, *args):
+        if runtime.profile_id == "primary":
+            raise ChatError(7006, "LLM stream failed: HTTP 429")
+        yield "message", "ok"
+
+    monkeypatch.setattr(agent_service, "_aiter_provider_stream", fake_stream)
+
+    async def consume() -> tuple[list, dict]:
+        route: dict = {}
+        events = agent_service._aiter_failover_stream(
+            [_runtime("primary"), _runtime("backup")], route, "", [], None, None, False
+        )
+        return [event async for event in events], route
+
+    events, route = asyncio.run(consume())
+    assert events == [("message", "ok")]
+    assert route["profile_id"] == "backup"
+    assert route["hedged"] is False
+
+
+def test_stream_raises_unexpected_candidate_errors(monkeypatch):
+    async def fake_stream(runtime, *args):
+        if runtime.profile_id == "primary":
+            raise KeyError("choices")
+        await asyncio.sleep(5)
+        yield "message", "late"
+
+    monkeypatch.setattr(agent_service, "_aiter_provider_stream", fake_stream)
+
+    async def consume() -> list:
+        events = agent_service._aiter_failover_stream(
+            [_runtime("primary"), _runtime("backup")], {}, "", [], None, None, False
+        )
+        return [event async for event in events]
+
+    with pytest.raises(KeyError):
+        asyncio.run(asyncio.wait_for(consume(), timeout=2))
+
+
+def test_runtime_profile_fallback_ids_are_validated(client: TestClient):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    backup = client.post(
+        "/api/v1/runtime-profiles", headers=headers, json={"name": "backup"}
+    ).json()["data"]
+    primary_resp = client.post(
+        "/api/v1/runtime-profiles",
+        headers=headers,
+        json={"name": "primary", "fallback_profile_ids": [backup["id"], backup["id"]]},
+    )
+    assert primary_resp.status_code == 200
+    primary = primary_resp.json()["data"]
+    assert primary["fallback_profile_ids"] == [backup["id"]]
+
+    bad_resp = client.patch(
+        f"/api/v1/runtime-profiles/{primary['id']}",
+        headers=headers,
+        json={"fallback_profile_ids": ["missing"]},
+    )
+    assert bad_resp.status_code == 400
+    assert bad_resp.json()["code"] == 3005
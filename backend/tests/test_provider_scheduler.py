@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import agent_service, provider_scheduler
+from app.services.chat_service import ChatError
+from app.services.provider_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from app.services.runtime_cache import RuntimeDescriptor
+
+
+@pytest.fixture(autouse=True)
+def _fresh_scheduler(monkeypatch):
+    monkeypatch.setattr(settings, "llm_provider_max_concurrency", 1)
+    provider_scheduler.reset()
+    yield
+    provider_scheduler.reset()
+
+
+def _acquire_in_thread(key: str, priority: int, order: list[int]) -> threading.Thread:
+    def _run():
+        with provider_scheduler.slot(key, "deepseek", 10, priority):
+            order.append(priority)
+
+    thread = threading.Thread(target=_run)
+    thread.start()
+    return thread
+
+
+def test_interactive_requests_jump_the_background_queue():
+    holder = provider_scheduler.acquire("prov-a", "deepseek", 10, PRIORITY_BACKGROUND)
+    order: list[int] = []
+    background = _acquire_in_thread("prov-a", PRIORITY_BACKGROUND, order)
+    time.sleep(0.05)
+    interactive = _acquire_in_thread("prov-a", PRIORITY_INTERACTIVE, order)
+    time.sleep(0.05)
+    assert order == []
+
+    provider_scheduler.release(holder)
+    background.join(2)
+    interactive.join(2)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
+
+
+def test_token_bucket_delays_requests_over_the_tpm_limit(monkeypatch):
+    monkeypatch.setattr(settings, "llm_provider_max_concurrency", 4)
+    monkeypatch.setattr(settings, "llm_provider_tpm", {"deepseek": 6000})
+    with provider_scheduler.slot("prov-b", "deepseek", 6000, PRIORITY_INTERACTIVE):
+        pass
+    # The bucket refills at 100 tokens/s, so 30 tokens take about 0.3 s.
+    with provider_scheduler.slot(
+        "prov-b", "deepseek", 30, PRIORITY_INTERACTIVE
+    ) as ticket:
+        assert ticket.wait_ms >= 200
+
+
+def test_queue_timeout_raises_busy_error(monkeypatch):
+    monkeypatch.setattr(settings, "llm_scheduler_queue_timeout_seconds", 0.1)
+    holder = provider_scheduler.acquire("prov-c", "deepseek", 10, PRIORITY_INTERACTIVE)
+    with pytest.raises(ChatError) as exc_info:
+        provider_scheduler.acquire("prov-c", "deepseek", 10, PRIORITY_INTERACTIVE)
+    assert exc_info.value.code == 7011
+    provider_scheduler.release(holder)
+
+    # The abandoned ticket must not keep the slot.
+    ticket = provider_scheduler.acquire("prov-c", "deepseek", 10, PRIORITY_INTERACTIVE)
+    assert ticket.wait_ms < 100
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    holder = provider_scheduler.acquire("prov-d", "deepseek", 10, PRIORITY_INTERACTIVE)
+
+    async def main():
+        waiter = asyncio.create_task(
+            provider_scheduler.acquire_async(
+                "prov-d", "deepseek", 10, PRIORITY_INTERACTIVE
+            )
+        )
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(main())
+    provider_scheduler.release(holder)
+    ticket = provider_scheduler.acquire("prov-d", "deepseek", 10, PRIORITY_INTERACTIVE)
+    assert ticket.wait_ms < 100
+
+
+def test_queue_wait_is_reported_in_provider_route(monkeypatch):
+    runtime = RuntimeDescriptor(
+        profile_id="p-1",
+        model_id="m-1",
+        model_name="deepseek-chat",
+        supports_vision=False,
+        provider_id="prov-e",
+        provider_name="deepseek",
+        base_url="https://llm.invalid/v1/chat/completions",
+        api_key="sk-test",
+    )
+    monkeypatch.setattr(
+        agent_service, "_openai_nonstream", lambda **kwargs: ("answer", "")
+    )
+    holder = provider_scheduler.acquire("prov-e", "deepseek", 10, PRIORITY_BACKGROUND)
+    threading.Timer(0.2, provider_scheduler.release, args=(holder,)).start()
+
+    answer, _, route = agent_service._call_with_failover(
+        [runtime], "", [{"role": "user", "content": "hi"}], None, None, False
+    )
+    assert answer == "answer"
+    assert route["queue_wait_ms"] >= 100
@@ -0,0 +1,133 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import agent_service, response_cache
+from app.services.runtime_cache import RuntimeDescriptor
+
+_RUNTIME = RuntimeDescriptor(
+    profile_id="p-1",
+    model_id="m-1",
+    model_name="deepseek-chat",
+    supports_vision=False,
+    provider_id="prov-1",
+    provider_name="deepseek",
+    base_url="https://llm.invalid/v1/chat/completions",
+    api_key="sk-test",
+)
+
+
+def _enable(monkeypatch, threshold: float = 0.0, max_entries: int = 16):
+    response_cache.clear()
+    monkeypatch.setattr(settings, "response_cache_enabled", True)
+    monkeypatch.setattr(settings, "response_cache_similarity_threshold", threshold)
+    monkeypatch.setattr(settings, "response_cache_max_entries", max_entries)
+
+
+def _ref(query: str, scope: str = "u-1", standalone: bool = True, context: str = ""):
+    return response_cache.make_ref(
+        scope=scope,
+        model_key="prov-1:deepseek-chat",
+        system_prompt="role",
+        messages=[{"role": "user", "content": query + context}],
+        params={},
+        standalone_query=query if standalone else None,
+        context=context,
+    )
+
+
+def test_cache_is_opt_in(monkeypatch):
+    monkeypatch.setattr(settings, "response_cache_enabled", False)
+    assert _ref("hello") is None
+
+
+def test_exact_and_similarity_hits_are_user_scoped(monkeypatch):
+    _enable(monkeypatch, threshold=0.6)
+    response_cache.store(_ref("what does high ALT mean"), "ALT answer", "")
+
+    assert response_cache.lookup(_ref("what does high ALT mean")).answer == "ALT answer"
+    assert response_cache.lookup(_ref("What does a high ALT mean?")) is not None
+    assert response_cache.lookup(_ref("what does high ALT mean", scope="u-2")) is None
+    assert response_cache.lookup(_ref("is my blood pressure normal")) is None
+    assert (
+        response_cache.lookup(_ref("What does a high ALT mean?", standalone=False))
+        is None
+    )
+
+
+def test_similarity_hits_require_the_same_retrieved_context(monkeypatch):
+    _enable(monkeypatch, threshold=0.6)
+    kb_a = "\n\n[KB] ALT above 40 U/L suggests liver stress."
+    response_cache.store(_ref("what does high ALT mean", context=kb_a), "A", "")
+
+    assert response_cache.lookup(_ref("What does a high ALT mean?", context=kb_a))
+    assert response_cache.lookup(_ref("What does a high ALT mean?")) is None
+    kb_b = "\n\n[KB] ALT is often raised after exercise."
+    assert (
+        response_cache.lookup(_ref("What does a high ALT mean?", context=kb_b)) is None
+    )
+
+
+def test_lru_and_ttl_eviction(monkeypatch):
+    _enable(monkeypatch, max_entries=2)
+    for query in ("a", "b", "c"):
+        response_cache.store(_ref(query), f"answer {query}", "")
+    assert response_cache.lookup(_ref("a")) is None
+    assert response_cache.lookup(_ref("c")) is not None
+
+    monkeypatch.setattr(settings, "response_cache_ttl_seconds", -1)
+    response_cache.store(_ref("d"), "answer d", "")
+    assert response_cache.lookup(_ref("d")) is None
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def test_agent_replays_cached_answer_as_stream(client: TestClient, monkeypatch):
+    _enable(monkeypatch)
+    calls: list[str] = []
+
+    async def fake_stream(runtime, system_prompt, messages, *args):
+        calls.append(messages[-1]["content"])
+        yield "message", "Uric acid 420 is "
+        yield "message", "slightly high."
+
+    monkeypatch.setattr(agent_service, "_resolve_runtime", lambda *args: _RUNTIME)
+    monkeypatch.setattr(agent_service, "_aiter_provider_stream", fake_stream)
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    answers = []
+    for _ in range(2):
+        session_id = client.post(
+            "/api/v1/chat/sessions", headers=headers, json={"title": "cache"}
+        ).json()["data"]["id"]
+        with client.stream(
+            "POST",
+            "/api/v1/agent/qa/stream",
+            headers=headers,
+            json={"session_id": session_id, "query": "尿酸 420 高吗"},
+        ) as resp:
+            events = [
+                json.loads(line[5:])
+                for line in resp.iter_lines()
+                if line.startswith("data:")
+            ]
+        assert [e["type"] for e in events][-1] == "done"
+        answers.append(events[-1]["assistant_answer"])
+
+    assert len(calls) == 1
+    assert answers == ["Uric acid 420 is slightly high."] * 2
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import role_service
+
+
+@pytest.fixture
+def role_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "role_library_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "role_library_refresh_seconds", 0.0)
+    (tmp_path / "nurse.md").write_text("# Nurse\nBe kind.", encoding="utf-8")
+    (tmp_path / "coach.md").write_text("Stay active.", encoding="utf-8")
+    role_service.reload_roles()
+    return tmp_path
+
+
+def _bootstrap_and_login(client: TestClient) -> str:
+    bootstrap_resp = client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={"username": "owner", "password": "OwnerPass123", "display_name": "Owner"},
+    )
+    assert bootstrap_resp.status_code == 200
+
+    login_resp = client.post(
+        "/api/v1/auth/login",
+        json={"username": "owner", "password": "OwnerPass123"},
+    )
+    assert login_resp.status_code == 200
+    return login_resp.json()["data"]["access_token"]
+
+
+def test_roles_are_served_from_memory(role_dir, monkeypatch):
+    items = role_service.list_roles()
+    assert [(item["id"], item["name"]) for item in items] == [
+        ("coach", "coach"),
+        ("nurse", "Nurse"),
+    ]
+    assert items[1]["prompt_hash"] == role_service.prompt_hash("# Nurse\nBe kind.")
+
+    def _no_reads(*args, **kwargs):
+        raise AssertionError("unchanged roles must not be re-read")
+
+    monkeypatch.setattr(role_service.Path, "read_text", _no_reads)
+    assert role_service.get_role_prompt("nurse") == "# Nurse\nBe kind."
+    assert len(role_service.list_roles()) == 2
+
+
+def test_changed_added_and_removed_files_are_picked_up(role_dir):
+    nurse = role_dir / "nurse.md"
+    old_hash = role_service.get_role("nurse").prompt_hash
+    nurse.write_text("# Night Nurse\nBe kind and calm.", encoding="utf-8")
+    stat = nurse.stat()
+    os.utime(nurse, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    (role_dir / "coach.md").unlink()
+    (role_dir / "pharmacist.md").write_text("# Pharmacist", encoding="utf-8")
+
+    role = role_service.get_role("nurse")
+    assert role.name == "Night Nurse"
+    assert role.prompt_hash != old_hash
+    assert [item["id"] for item in role_service.list_roles()] == [
+        "nurse",
+        "pharmacist",
+    ]
+    with pytest.raises(FileNotFoundError):
+        role_service.get_role_prompt("coach")
+
+
+def test_refresh_interval_defers_rescans(role_dir, monkeypatch):
+    monkeypatch.setattr(settings, "role_library_refresh_seconds", 3600.0)
+    role_service.list_roles()
+    (role_dir / "late.md").write_text("# Late", encoding="utf-8")
+    assert "late" not in {item["id"] for item in role_service.list_roles()}
+    role_service.reload_roles()
+    assert "late" in {item["id"] for item in role_service.list_roles()}
+
+
+def test_role_api_returns_prompt_hash(client: TestClient, role_dir):
+    token = _bootstrap_and_login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    resp = client.get("/api/v1/agent/roles/nurse", headers=headers)
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert data["prompt"] == "# Nurse\nBe kind."
+    assert data["prompt_hash"] == role_service.get_role("nurse").prompt_hash
+    missing = client.get("/api/v1/agent/roles/unknown", headers=headers)
+    assert missing.status_code == 404
@@ -0,0 +1,45 @@
+from app.core.config import settings
+from app.services import runtime_cache
+from app.services.runtime_cache import RuntimeDescriptor
+
+
+def _descriptor(model_name: str = "deepseek-chat") -> RuntimeDescriptor:
+    return RuntimeDescriptor(
+        profile_id="p-1",
+        model_id="m-1",
+        model_name=model_name,
+        supports_vision=False,
+        provider_id="prov-1",
+        provider_name="deepseek",
+        base_url="https://api.deepseek.com/chat/completions",
+        api_key="sk-test",
+        params={"temperature": 0.2},
+    )
+
+
+def test_cache_hit_and_user_invalidation():
+    runtime_cache.clear()
+    snapshot = runtime_cache.generation("u-1")
+    runtime_cache.put("u-1", "p-1", _descriptor(), snapshot)
+    runtime_cache.put("u-2", "p-1", _descriptor(), runtime_cache.generation("u-2"))
+    assert runtime_cache.get("u-1", "p-1").model_name == "deepseek-chat"
+    assert "sk-test" not in repr(runtime_cache.get("u-1", "p-1"))
+
+    runtime_cache.invalidate_user("u-1")
+    assert runtime_cache.get("u-1", "p-1") is None
+    assert runtime_cache.get("u-2", "p-1") is not None
+
+
+def test_put_after_concurrent_invalidation_is_ignored():
+    runtime_cache.clear()
+    snapshot = runtime_cache.generation("u-1")
+    runtime_cache.invalidate_user("u-1")
+    runtime_cache.put("u-1", None, _descriptor("stale"), snapshot)
+    assert runtime_cache.get("u-1", None) is None
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    runtime_cache.clear()
+    monkeypatch.setattr(settings, "runtime_cache_ttl_seconds", 0.0)
+    runtime_cache.put("u-1", "p-1", _descriptor(), runtime_cache.generation("u-1"))
+    assert runtime_cache.get("u-1", "p-1") is None
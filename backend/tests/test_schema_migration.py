@@ -71,3 +71,35 @@ def test_startup_migration_adds_user_id_to_desensitization_tables(tmp_path):
         pii_cols = conn.exec_driver_sql("PRAGMA table_info(pii_mapping_vault)").all()
         assert "user_id" in {row[1] for row in rule_cols}
         assert "user_id" in {row[1] for row in pii_cols}
+
+
+def test_startup_migration_adds_chat_history_index(tmp_path):
+    db_file = tmp_path / "migration_chat_index.sqlite3"
+    db_url = f"sqlite:///{db_file.as_posix()}"
+    engine = create_engine(db_url, future=True)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            """
+            CREATE TABLE chat_messages (
+                id VARCHAR(36) PRIMARY KEY,
+                session_id VARCHAR(36),
+                role VARCHAR(20),
+                content TEXT,
+                created_at DATETIME
+            )
+            """
+        )
+
+    run_startup_migrations(engine, db_url)
+
+    with engine.begin() as conn:
+        rows = conn.exec_driver_sql("PRAGMA index_list(chat_messages)").all()
+        names = {row[1] for row in rows}
+        assert "ix_chat_messages_session_created" in names
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT role, content FROM chat_messages "
+            "WHERE session_id = 's' ORDER BY created_at DESC LIMIT 20"
+        ).all()
+        assert "ix_chat_messages_session_created" in str(plan)
+        assert "TEMP B-TREE" not in str(plan)
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from app.services import agent_service, single_flight
+from app.services.runtime_cache import RuntimeDescriptor
+
+_RUNTIME = RuntimeDescriptor(
+    profile_id="p-1",
+    model_id="m-1",
+    model_name="deepseek-chat",
+    supports_vision=False,
+    provider_id="prov-1",
+    provider_name="deepseek",
+    base_url="https://llm.invalid/v1/chat/completions",
+    api_key="sk-test",
+)
+
+
+def test_concurrent_sync_calls_share_one_execution():
+    calls: list[int] = []
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: single_flight.run("k", slow), range(4)))
+    assert results == ["answer"] * 4
+    assert len(calls) == 1
+
+    # Finished calls are not reused.
+    assert single_flight.run("k", slow) == "answer"
+    assert len(calls) == 2
+
+
+def test_sync_error_is_shared_with_waiters():
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(single_flight.run, "err", failing)
+        started.wait()
+        follower = pool.submit(single_flight.run, "err", lambda: "unused")
+        for future in (leader, follower):
+            with pytest.raises(ValueError, match="upstream down"):
+                future.result()
+
+
+def test_stream_subscribers_fan_out_from_one_upstream():
+    opened: list[int] = []
+
+    async def upstream():
+        opened.append(1)
+        for chunk in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def collect():
+        return [item async for item in single_flight.subscribe("s", upstream)]
+
+    async def main():
+        first = asyncio.create_task(collect())
+        await asyncio.sleep(0.015)
+        # Joins mid-stream and replays what was already received.
+        second = asyncio.create_task(collect())
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(main()) == [["a", "b", "c"], ["a", "b", "c"]]
+    assert opened == [1]
+
+
+def test_upstream_is_cancelled_when_last_subscriber_leaves():
+    state = {"closed": False}
+
+    async def endless():
+        try:
+            while True:
+                yield "tick"
+                await asyncio.sleep(0)
+        finally:
+            state["closed"] = True
+
+    async def main():
+        first = single_flight.subscribe("c", endless)
+        second = single_flight.subscribe("c", endless)
+        await first.__anext__()
+        await second.__anext__()
+        await first.aclose()
+        await asyncio.sleep(0.01)
+        assert state["closed"] is False
+        await second.aclose()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert state["closed"] is True
+
+
+def test_identical_provider_streams_share_one_request(monkeypatch):
+    requests: list[dict] = []
+    body = (
+        'data: {"choices":[{"delta":{"content":"Hel"}}]}\n\n'
+        'data: {"choices":[{"delta":{"content":"lo"}}]}\n\n'
+        "data: [DONE]\n\n"
+    )
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        await asyncio.sleep(0.05)
+        return httpx.Response(
+            200, content=body, headers={"content-type": "text/event-stream"}
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(agent_service, "get_async_client", lambda url: client)
+
+    async def collect(query: str):
+        return [
+            delta
+            async for _, delta in agent_service._aiter_provider_stream(
+                _RUNTIME, "", [{"role": "user", "content": query}], None, None, False
+            )
+        ]
+
+    async def main():
+        return await asyncio.gather(collect("hi"), collect("hi"), collect("other"))
+
+    assert asyncio.run(main()) == [["Hel", "lo"]] * 3
+    assert len(requests) == 2
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import sse_writer
+
+
+async def _burst(items, delay: float = 0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def _collect(stream) -> list:
+    return [item async for item in stream]
+
+
+def test_coalesce_merges_bursts_and_splits_on_kind_change():
+    items = [("reasoning", "a"), ("reasoning", "b"), ("message", "c"), ("message", "d")]
+    merged = asyncio.run(_collect(sse_writer.coalesce(_burst(items), 1.0, 256)))
+    assert merged == [("reasoning", "ab"), ("message", "cd")]
+
+
+def test_coalesce_flushes_on_size_and_window():
+    items = [("message", "xx")] * 4
+    by_size = asyncio.run(_collect(sse_writer.coalesce(_burst(items), 1.0, 4)))
+    assert by_size == [("message", "xxxx"), ("message", "xxxx")]
+
+    slow = asyncio.run(
+        _collect(sse_writer.coalesce(_burst(items, delay=0.03), 0.01, 256))
+    )
+    assert "".join(delta for _, delta in slow) == "xxxxxxxx"
+    assert len(slow) > 1
+
+
+def test_coalesce_zero_window_passes_deltas_through():
+    items = [("message", "a"), ("message", "b")]
+    assert asyncio.run(_collect(sse_writer.coalesce(_burst(items), 0, 256))) == items
+
+
+def test_coalesce_hands_over_buffer_before_upstream_error():
+    async def failing():
+        yield "message", "partial"
+        raise RuntimeError("upstream dropped")
+
+    received: list = []
+
+    async def consume():
+        async for item in sse_writer.coalesce(failing(), 1.0, 256):
+            received.append(item)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
+    assert received == [("message", "partial")]
+
+
+def test_heartbeats_while_waiting_then_result():
+    async def slow_work():
+        await asyncio.sleep(0.05)
+        return "plan"
+
+    items = asyncio.run(_collect(sse_writer.with_heartbeats(slow_work(), 0.01)))
+    assert items[-1] == ("plan",)
+    assert items[:-1] and set(items[:-1]) == {sse_writer.HEARTBEAT}
+
+
+def test_abandoned_work_result_goes_to_callback():
+    abandoned: list = []
+
+    async def scenario():
+        async def slow_work():
+            await asyncio.sleep(0.03)
+            return "plan"
+
+        stream = sse_writer.with_heartbeats(
+            slow_work(), 0.005, on_abandon=abandoned.append
+        )
+        assert await stream.__anext__() == sse_writer.HEARTBEAT
+        await stream.aclose()
+        await asyncio.sleep(0.06)
+
+    asyncio.run(scenario())
+    assert abandoned == ["plan"]
+
+
+def test_event_is_compact_json():
+    frame = sse_writer.event({"type": "message", "delta": "尿酸"})
+    assert frame.endswith("\n\n")
+    assert json.loads(frame[5:]) == {"type": "message", "delta": "尿酸"}
+    assert " " not in frame[5:].strip()
@@ -0,0 +1,345 @@
+"""End-to-end chat load test against a running backend.
+
+Each virtual user logs in, creates a chat session and then runs ``--turns``
+turns of KB retrieval followed by an agent answer (streamed by default).
+Throughput and latency percentiles are reported per step.
+
+Point the backend at the bundled mock provider so no real quota is used::
+
+    python scripts/mock_llm_server.py --port 9100
+    python scripts/load_test_chat.py --users 20 --turns 5 \\
+        --mock-url http://127.0.0.1:9100
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import httpx
+
+_MOCK_PROFILE_NAME = "load-test-mock"
+_KB_NAME = "load-test-kb"
+_KB_DOCUMENTS = [
+    {
+        "title": "血压",
+        "content": "高血压患者应规律监测血压，按医嘱服用降压药并限制盐摄入。",
+    },
+    {
+        "title": "血糖",
+        "content": "糖尿病管理需要控制饮食、规律运动并定期检测空腹血糖。",
+    },
+    {
+        "title": "尿酸",
+        "content": "尿酸偏高时应减少高嘌呤食物与饮酒，多喝水，必要时就医。",
+    },
+]
+_QUERIES = [
+    "最近血压有点高，需要注意什么？",
+    "空腹血糖 6.8 正常吗？",
+    "尿酸偏高饮食上怎么调整？",
+    "How often should blood pressure be measured at home?",
+]
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    error_samples: dict[str, str] = field(default_factory=dict)
+
+    def ok(self, step: str, seconds: float) -> None:
+        self.latencies[step].append(seconds * 1000)
+
+    def fail(self, step: str, detail: str) -> None:
+        self.errors[step] += 1
+        self.error_samples.setdefault(step, detail[:200])
+
+
+class ApiError(Exception):
+    pass
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def _data(resp: httpx.Response) -> dict:
+    if resp.status_code >= 400:
+        raise ApiError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+    body = resp.json()
+    if body.get("code") not in (0, None):
+        raise ApiError(f"code {body.get('code')}: {body.get('message')}")
+    return body.get("data") or {}
+
+
+async def _login(client: httpx.AsyncClient, args: argparse.Namespace) -> dict:
+    resp = await client.post(
+        "/api/v1/auth/login",
+        json={"username": args.username, "password": args.password},
+    )
+    return {"Authorization": f"Bearer {_data(resp)['access_token']}"}
+
+
+async def _ensure_owner(client: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    # Succeeds on a fresh database; an already-initialized owner is fine.
+    await client.post(
+        "/api/v1/auth/bootstrap-owner",
+        json={
+            "username": args.username,
+            "password": args.password,
+            "display_name": args.username,
+        },
+    )
+
+
+async def _setup_mock_profile(
+    client: httpx.AsyncClient, headers: dict, args: argparse.Namespace
+) -> None:
+    root = args.mock_url.rstrip("/")
+    if args.mock_format == "gemini":
+        provider_name, base_url = "gemini", f"{root}/v1beta/models"
+    else:
+        provider_name, base_url = "openai", f"{root}/v1/chat/completions"
+
+    providers = _data(await client.get("/api/v1/model-providers", headers=headers))
+    provider = next(
+        (
+            item
+            for item in providers.get("items", [])
+            if item["provider_name"] == provider_name and item["base_url"] == base_url
+        ),
+        None,
+    )
+    if provider is None:
+        provider = _data(
+            await client.post(
+                "/api/v1/model-providers",
+                headers=headers,
+                json={
+                    "provider_name": provider_name,
+                    "base_url": base_url,
+                    "api_key": "mock-key",
+                    "enabled": True,
+                },
+            )
+        )
+    models = _data(
+        await client.post(
+            f"/api/v1/model-providers/{provider['id']}/refresh-models",
+            headers=headers,
+            json={"manual_models": [args.mock_model]},
+        )
+    )
+    model = next(
+        item
+        for item in models.get("items", [])
+        if item["model_type"] == "llm" and item["model_name"] == args.mock_model
+    )
+
+    profiles = _data(await client.get("/api/v1/runtime-profiles", headers=headers))
+    existing = next(
+        (
+            item
+            for item in profiles.get("items", [])
+            if item["name"] == _MOCK_PROFILE_NAME
+        ),
+        None,
+    )
+    body = {"llm_model_id": model["id"], "is_default": True}
+    if existing:
+        _data(
+            await client.patch(
+                f"/api/v1/runtime-profiles/{existing['id']}", headers=headers, json=body
+            )
+        )
+    else:
+        _data(
+            await client.post(
+                "/api/v1/runtime-profiles",
+                headers=headers,
+                json={"name": _MOCK_PROFILE_NAME, **body},
+            )
+        )
+
+
+async def _setup_kb(client: httpx.AsyncClient, headers: dict) -> str:
+    kbs = _data(await client.get("/api/v1/knowledge-bases", headers=headers))
+    kb = next((item for item in kbs.get("items", []) if item["name"] == _KB_NAME), None)
+    if kb is None:
+        kb = _data(
+            await client.post(
+                "/api/v1/knowledge-bases",
+                headers=headers,
+                json={"name": _KB_NAME, "chunk_size": 400, "chunk_overlap": 50},
+            )
+        )
+        _data(
+            await client.post(
+                f"/api/v1/knowledge-bases/{kb['id']}/build",
+                headers=headers,
+                json={"documents": _KB_DOCUMENTS},
+            )
+        )
+    return kb["id"]
+
+
+async def _timed(stats: Stats, step: str, coro):
+    started = time.perf_counter()
+    try:
+        result = await coro
+    except (ApiError, httpx.HTTPError, KeyError, ValueError) as exc:
+        stats.fail(step, f"{type(exc).__name__}: {exc}")
+        return None
+    stats.ok(step, time.perf_counter() - started)
+    return result
+
+
+async def _stream_answer(
+    client: httpx.AsyncClient, headers: dict, body: dict, stats: Stats
+) -> None:
+    started = time.perf_counter()
+    first_token = None
+    try:
+        async with client.stream(
+            "POST", "/api/v1/agent/qa/stream", headers=headers, json=body
+        ) as resp:
+            if resp.status_code >= 400:
+                raise ApiError(f"HTTP {resp.status_code}")
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event.get("type") == "message" and first_token is None:
+                    first_token = time.perf_counter()
+                elif event.get("type") == "error":
+                    raise ApiError(event.get("message") or "stream error")
+    except (ApiError, httpx.HTTPError, ValueError) as exc:
+        stats.fail("qa_stream", f"{type(exc).__name__}: {exc}")
+        return
+    if first_token is not None:
+        stats.ok("qa_stream_ttft", first_token - started)
+    stats.ok("qa_stream", time.perf_counter() - started)
+
+
+async def _virtual_user(
+    index: int,
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    kb_id: str | None,
+    stats: Stats,
+) -> None:
+    headers = await _timed(stats, "login", _login(client, args))
+    if headers is None:
+        return
+
+    async def _post(path: str, body: dict) -> dict:
+        return _data(await client.post(path, headers=headers, json=body))
+
+    session = await _timed(
+        stats,
+        "create_session",
+        _post("/api/v1/chat/sessions", {"title": f"load-test-{index}"}),
+    )
+    if session is None:
+        return
+
+    for turn in range(args.turns):
+        query = _QUERIES[(index + turn) % len(_QUERIES)]
+        if kb_id:
+            await _timed(
+                stats,
+                "retrieval",
+                _post(
+                    "/api/v1/retrieval/query",
+                    {"kb_id": kb_id, "query": query, "top_k": 3},
+                ),
+            )
+        body = {"session_id": session["id"], "query": query}
+        if kb_id:
+            body["kb_ids"] = [kb_id]
+        if args.mode == "stream" or (args.mode == "mixed" and turn % 2 == 0):
+            await _stream_answer(client, headers, body, stats)
+        else:
+            await _timed(stats, "qa", _post("/api/v1/agent/qa", body))
+
+
+def _report(stats: Stats, elapsed: float, args: argparse.Namespace) -> None:
+    print(
+        f"\nusers={args.users} turns={args.turns} mode={args.mode} "
+        f"elapsed={elapsed:.2f}s"
+    )
+    header = f"{'step':<16}{'ok':>7}{'err':>6}{'rps':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    steps = sorted(set(stats.latencies) | set(stats.errors))
+    for step in steps:
+        values = stats.latencies.get(step, [])
+        row = f"{step:<16}{len(values):>7}{stats.errors.get(step, 0):>6}"
+        rate = len(values) / elapsed if elapsed else 0.0
+        row += f"{rate:>9.2f}"
+        if values:
+            row += "".join(f"{_percentile(values, q):>9.0f}" for q in (0.5, 0.9, 0.99))
+            row += f"{max(values):>9.0f}"
+        print(row)
+    print("(latencies in ms)")
+    for step, detail in stats.error_samples.items():
+        print(f"first {step} error: {detail}")
+
+
+async def run(args: argparse.Namespace) -> int:
+    limits = httpx.Limits(max_connections=args.users + 4)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=timeout
+    ) as client:
+        await _ensure_owner(client, args)
+        headers = await _login(client, args)
+        if args.mock_url:
+            await _setup_mock_profile(client, headers, args)
+        kb_id = None if args.no_kb else await _setup_kb(client, headers)
+
+        stats = Stats()
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _virtual_user(index, client, args, kb_id, stats)
+                for index in range(args.users)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    _report(stats, elapsed, args)
+    return 1 if any(stats.errors.values()) and args.fail_on_error else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="owner")
+    parser.add_argument("--password", default="OwnerPass123")
+    parser.add_argument("--users", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="questions per session")
+    parser.add_argument("--mode", choices=["stream", "qa", "mixed"], default="stream")
+    parser.add_argument(
+        "--mock-url",
+        default=None,
+        help="configure the default runtime profile to use this mock provider",
+    )
+    parser.add_argument("--mock-format", choices=["openai", "gemini"], default="openai")
+    parser.add_argument("--mock-model", default="mock-chat")
+    parser.add_argument("--no-kb", action="store_true", help="skip KB retrieval")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--fail-on-error", action="store_true")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
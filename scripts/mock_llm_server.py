@@ -0,0 +1,306 @@
+"""Local mock LLM provider for load tests.
+
+Speaks the two wire formats the backend uses:
+
+- OpenAI compatible: ``POST /v1/chat/completions`` (JSON or ``stream=true`` SSE)
+  and ``GET /v1/models``.
+- Gemini: ``POST /v1beta/models/{model}:generateContent``,
+  ``POST /v1beta/models/{model}:streamGenerateContent?alt=sse`` and
+  ``GET /v1beta/models``.
+
+Configure a provider in the app with base URL
+``http://127.0.0.1:9100/v1/chat/completions`` (any provider name) or
+``http://127.0.0.1:9100/v1beta/models`` (provider name ``gemini``); any API key
+is accepted.
+
+Usage::
+
+    python scripts/mock_llm_server.py --port 9100 --ttft-ms 300 \\
+        --tokens-per-second 80 --answer-tokens 120 --error-rate 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_MODELS = ["mock-chat", "mock-reasoner"]
+
+
+@dataclass
+class MockConfig:
+    ttft_ms: float = 300.0
+    jitter_ms: float = 100.0
+    tokens_per_second: float = 60.0
+    answer_tokens: int = 120
+    reasoning_tokens: int = 24
+    error_rate: float = 0.0
+    error_status: int = 503
+    stream_error_rate: float = 0.0
+    seed: int | None = None
+
+
+config = MockConfig()
+rng = random.Random()
+app = FastAPI(title="Family Health mock LLM provider")
+
+
+def _last_user_text(texts: list[str]) -> str:
+    return next((text for text in reversed(texts) if text.strip()), "").strip()
+
+
+def _answer_tokens(prompt: str) -> list[str]:
+    topic = " ".join(prompt.split()[:8]) or "your question"
+    words = f"Mock answer about {topic}.".split()
+    filler = [
+        "Keep",
+        "tracking",
+        "symptoms",
+        "and",
+        "ask",
+        "a",
+        "doctor",
+        "if",
+        "worse.",
+    ]
+    while len(words) < config.answer_tokens:
+        words.append(filler[len(words) % len(filler)])
+    return [word + " " for word in words[: config.answer_tokens]]
+
+
+def _reasoning_tokens() -> list[str]:
+    return ["thinking "] * config.reasoning_tokens
+
+
+async def _first_token_delay() -> None:
+    jitter = rng.uniform(-config.jitter_ms, config.jitter_ms) if config.jitter_ms else 0
+    await asyncio.sleep(max(config.ttft_ms + jitter, 0) / 1000)
+
+
+async def _token_delay() -> None:
+    if config.tokens_per_second > 0:
+        await asyncio.sleep(1 / config.tokens_per_second)
+
+
+def _injected_error() -> JSONResponse | None:
+    if config.error_rate and rng.random() < config.error_rate:
+        return JSONResponse(
+            {"error": {"message": "injected failure", "code": config.error_status}},
+            status_code=config.error_status,
+        )
+    return None
+
+
+def _sse(obj: dict | str) -> str:
+    data = obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False)
+    return f"data: {data}\n\n"
+
+
+async def _timed(tokens: list[str]) -> AsyncIterator[str]:
+    await _first_token_delay()
+    for index, token in enumerate(tokens):
+        if index:
+            await _token_delay()
+        yield token
+
+
+def _wants_reasoning_openai(payload: dict) -> bool:
+    thinking = payload.get("thinking") or {}
+    return thinking.get("type") == "enabled" or "reasoner" in str(payload.get("model"))
+
+
+def _wants_reasoning_gemini(payload: dict) -> bool:
+    thinking = (payload.get("generationConfig") or {}).get("thinkingConfig") or {}
+    return bool(thinking.get("includeThoughts"))
+
+
+@app.get("/v1/models")
+async def openai_models():
+    return {
+        "object": "list",
+        "data": [{"id": name, "object": "model"} for name in _MODELS],
+    }
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    payload = await request.json()
+    if failure := _injected_error():
+        return failure
+    prompt = _last_user_text(
+        [
+            str(item.get("content") or "")
+            for item in payload.get("messages") or []
+            if item.get("role") == "user"
+        ]
+    )
+    answer = _answer_tokens(prompt)
+    reasoning = _reasoning_tokens() if _wants_reasoning_openai(payload) else []
+    model = payload.get("model") or _MODELS[0]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    if not payload.get("stream"):
+        await _first_token_delay()
+        if config.tokens_per_second > 0:
+            await asyncio.sleep(len(answer) / config.tokens_per_second)
+        message = {"role": "assistant", "content": "".join(answer).strip()}
+        if reasoning:
+            message["reasoning_content"] = "".join(reasoning).strip()
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"completion_tokens": len(answer)},
+        }
+
+    fail_at = _stream_failure_point(len(answer))
+
+    async def events() -> AsyncIterator[str]:
+        chunks = [("reasoning_content", t) for t in reasoning] + [
+            ("content", t) for t in answer
+        ]
+        index = 0
+        async for _ in _timed([t for _, t in chunks]):
+            if index == fail_at:
+                # Drop the connection mid-answer like a flaky upstream.
+                raise RuntimeError("injected stream failure")
+            key, token = chunks[index]
+            index += 1
+            yield _sse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {key: token}}],
+                }
+            )
+        yield _sse("[DONE]")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _stream_failure_point(length: int) -> int | None:
+    if config.stream_error_rate and rng.random() < config.stream_error_rate:
+        return rng.randint(1, max(length - 1, 1))
+    return None
+
+
+@app.get("/v1beta/models")
+async def gemini_models():
+    return {
+        "models": [
+            {
+                "name": f"models/{name}",
+                "supportedGenerationMethods": ["generateContent"],
+            }
+            for name in _MODELS
+        ]
+    }
+
+
+def _gemini_prompt(payload: dict) -> str:
+    texts = []
+    for item in payload.get("contents") or []:
+        if item.get("role") != "user":
+            continue
+        texts.extend(str(part.get("text") or "") for part in item.get("parts") or [])
+    return _last_user_text(texts)
+
+
+@app.post("/v1beta/models/{model_action}")
+async def gemini_generate(model_action: str, request: Request):
+    model, _, action = model_action.partition(":")
+    payload = await request.json()
+    if failure := _injected_error():
+        return failure
+    answer = _answer_tokens(_gemini_prompt(payload))
+    reasoning = _reasoning_tokens() if _wants_reasoning_gemini(payload) else []
+
+    if action == "generateContent":
+        await _first_token_delay()
+        if config.tokens_per_second > 0:
+            await asyncio.sleep(len(answer) / config.tokens_per_second)
+        parts = [{"text": "".join(answer).strip()}]
+        if reasoning:
+            parts.insert(0, {"text": "".join(reasoning).strip(), "thought": True})
+        return {
+            "candidates": [{"content": {"role": "model", "parts": parts}}],
+            "modelVersion": model,
+        }
+    if action != "streamGenerateContent":
+        return JSONResponse({"error": {"message": "unknown action"}}, status_code=404)
+
+    fail_at = _stream_failure_point(len(answer))
+
+    async def events() -> AsyncIterator[str]:
+        chunks = [(True, t) for t in reasoning] + [(False, t) for t in answer]
+        index = 0
+        async for _ in _timed([t for _, t in chunks]):
+            if index == fail_at:
+                raise RuntimeError("injected stream failure")
+            thought, token = chunks[index]
+            index += 1
+            part = {"text": token, "thought": True} if thought else {"text": token}
+            yield _sse(
+                {"candidates": [{"content": {"role": "model", "parts": [part]}}]}
+            )
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=config.ttft_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=config.tokens_per_second
+    )
+    parser.add_argument("--answer-tokens", type=int, default=config.answer_tokens)
+    parser.add_argument("--reasoning-tokens", type=int, default=config.reasoning_tokens)
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="share of requests failing with HTTP",
+    )
+    parser.add_argument("--error-status", type=int, default=config.error_status)
+    parser.add_argument(
+        "--stream-error-rate",
+        type=float,
+        default=0.0,
+        help="share of streams dropped mid-answer",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config.ttft_ms = args.ttft_ms
+    config.jitter_ms = args.jitter_ms
+    config.tokens_per_second = args.tokens_per_second
+    config.answer_tokens = max(args.answer_tokens, 1)
+    config.reasoning_tokens = max(args.reasoning_tokens, 0)
+    config.error_rate = args.error_rate
+    config.error_status = args.error_status
+    config.stream_error_rate = args.stream_error_rate
+    config.seed = args.seed
+    rng.seed(args.seed)
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()